@@ -10,7 +10,7 @@ import pyglet
 from pyglet import gl
 
 import kytten
-from kytten.widgets import Control
+from kytten.widgets import Control, ControlEntry
 
 class ImageRegionPlacer(Control):
     """
@@ -38,13 +38,13 @@ class ImageRegionPlacer(Control):
         self.is_dragging = False
         self.corner = None
 
-    def _get_controls(self):
+    def _collect_controls(self, controls):
         _, _, width, height = self.region
         if width < 20 or height < 20:
-            return [(self, self.x - 8, self.x + self.width + 8,
-                           self.y + self.height + 8, self.y - 8)]
+            controls.append(ControlEntry(self, self.x - 8, self.x + self.width + 8,
+                                               self.y + self.height + 8, self.y - 8))
         else:
-            return Control._get_controls(self)
+            Control._collect_controls(self, controls)
 
     def _get_limits_vertices(self):
         if self.limits is not None:
@@ -9,7 +9,7 @@ from __future__ import unicode_literals, print_function, absolute_import
 import pyglet
 from pyglet import gl
 import kytten
-from kytten.widgets import Control
+from kytten.widgets import Control, ControlEntry
 
 class Resizable(Control):
     """
@@ -27,12 +27,12 @@ class Resizable(Control):
         self.vertex_list = None
         self.is_dragging = False
 
-    def _get_controls(self):
+    def _collect_controls(self, controls):
         if self.width < 20 or self.height < 20:
-            return [(self, self.x, self.x + self.width + 8,
-                           self.y + self.height, self.y - 8)]
+            controls.append(ControlEntry(self, self.x, self.x + self.width + 8,
+                                               self.y + self.height, self.y - 8))
         else:
-            return Control._get_controls(self)
+            Control._collect_controls(self, controls)
 
     def _get_vertices(self):
         """
@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# examples/benchmark_batch_update.py
+# Copyrighted (C) 2014 by "Parashurama"
+'''
+Measure populating a grid of 1000 rows, reading a value of the dialog
+after each row: one add_row at a time (the previous behaviour, each read
+flushes a layout, so only 100 rows), inside Dialog.batch_update, and with
+add_rows.
+Exits with an error status unless the batched populates cost exactly one
+layout.
+'''
+from __future__ import absolute_import, unicode_literals, division, print_function
+import os
+import sys
+import time
+import pyglet
+
+ # allow import from parent folder (1 level up)
+sys.path.extend(['.','..'])
+import kytten
+
+ROWS = 1000
+UNBATCHED_ROWS = 100
+COLUMNS = 5
+
+layout_calls = [0]
+
+def count_layouts(do_layout):
+    def _do_layout(self):
+        layout_calls[0] += 1
+        return do_layout(self)
+    return _do_layout
+
+def make_rows(count):
+    return [[kytten.Label('{}'.format(i*COLUMNS+j)) for j in range(COLUMNS)] for i in range(count)]
+
+def run(theme, name, populate, count=ROWS):
+    grid = kytten.GridLayout([])
+    dialog = kytten.Dialog(grid, anchor=kytten.ANCHOR_CENTER, theme=theme)
+    dialog.on_update(0)
+    rows = make_rows(count)
+
+    layout_calls[0] = 0
+    start = time.time()
+    populate(dialog, grid, rows)
+    dialog.on_update(0)
+    elapsed = time.time() - start
+
+    dialog.teardown()
+    print("{:<16} {:>5} rows: {:.2f} ms, {} layouts".format(name, count, elapsed*1000, layout_calls[0]))
+    return layout_calls[0]
+
+def add_row(dialog, grid, rows):
+    for row in rows:
+        grid.add_row(row)
+        dialog.get_values()
+
+def batch_add_row(dialog, grid, rows):
+    with dialog.batch_update():
+        add_row(dialog, grid, rows)
+
+def add_rows(dialog, grid, rows):
+    grid.add_rows(rows)
+    dialog.get_values()
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    window = pyglet.window.Window(1280, 1024, caption='Benchmark Batch Update', visible=False)
+    kytten.SetWindow(window, isBuffered=False)
+
+    theme = kytten.GuiTheme(window=window, batch=kytten.KyttenManager,
+                            group=kytten.KyttenManager.foregroup, theme='theme')
+
+    kytten.Dialog.do_layout = count_layouts(kytten.Dialog.do_layout)
+
+    print("rows of {} labels".format(COLUMNS))
+    run(theme, 'add_row', add_row, UNBATCHED_ROWS)
+    batched = [run(theme, 'batch_update', batch_add_row),
+               run(theme, 'add_rows', add_rows)]
+
+    if batched != [1, 1]:
+        print("batched populates should cost a single layout")
+        sys.exit(1)
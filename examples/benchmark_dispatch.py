@@ -0,0 +1,60 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# examples/benchmark_dispatch.py
+# Copyrighted (C) 2014 by "Parashurama"
+'''
+Measure the cost of dispatching one event to a control, per event type,
+with the KyttenEventDispatcher handler tables and with the pyglet
+EventDispatcher lookup (the previous behaviour), with and without pushed
+handlers.
+'''
+from __future__ import absolute_import, unicode_literals, division, print_function
+import sys
+import time
+import pyglet
+
+ # allow import from parent folder (1 level up)
+sys.path.extend(['.','..'])
+import kytten
+
+EVENTS = 100000
+
+class BenchControl(kytten.widgets.Control):
+    def on_update(self, dt):
+        pass
+
+    def on_gain_highlight(self):
+        pass
+
+    def on_mouse_motion(self, x, y, dx, dy):
+        pass
+
+EVENT_ARGS = [
+    ('on_update', (1/60,)),
+    ('on_gain_highlight', ()),
+    ('on_mouse_motion', (10, 10, 1, 1)),
+    ('on_mouse_press', (10, 10, 1, 0)), # no handler
+]
+
+def time_dispatch(dispatch, control, event_type, args):
+    start = time.time()
+    for i in range(EVENTS):
+        dispatch(control, event_type, *args)
+    return (time.time() - start) / EVENTS
+
+def run(control, name):
+    print(name)
+    for event_type, args in EVENT_ARGS:
+        tables = time_dispatch(kytten.override.KyttenEventDispatcher.dispatch_event, control, event_type, args)
+        lookup = time_dispatch(pyglet.event.EventDispatcher.dispatch_event, control, event_type, args)
+        print("    {:<20} tables: {:.3f} us   pyglet: {:.3f} us".format(
+                                                event_type, tables*1e6, lookup*1e6))
+
+if __name__ == '__main__':
+    control = BenchControl()
+    print("{} events".format(EVENTS))
+    run(control, 'no pushed handlers')
+
+    control.push_handlers(on_update=lambda dt: None)
+    run(control, 'pushed handlers')
@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# examples/benchmark_hover.py
+# Copyrighted (C) 2014 by "Parashurama"
+'''
+Measure the cost of finding the hovered control in a dialog of 3000
+controls, with the dialog spatial index and with a linear scan of all
+the controls (the previous behaviour).
+'''
+from __future__ import absolute_import, unicode_literals, division, print_function
+import os
+import sys
+import time
+import random
+import pyglet
+
+ # allow import from parent folder (1 level up)
+sys.path.extend(['.','..'])
+import kytten
+
+GRID_SIZE = 55
+QUERIES = 2000
+
+def linear_scan(dialog, x, y):
+    for control in dialog.controls:
+        if dialog.hit_control(x, y, control):
+            return control
+
+def time_queries(find, dialog, points):
+    start = time.time()
+    for x, y in points:
+        find(dialog, x, y)
+    return (time.time() - start) / len(points)
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    window = pyglet.window.Window(1280, 1024, caption='Benchmark Hover', visible=False)
+    kytten.SetWindow(window, isBuffered=False)
+
+    theme = kytten.GuiTheme(window=window, batch=kytten.KyttenManager,
+                            group=kytten.KyttenManager.foregroup, theme='theme')
+
+    dialog = kytten.Dialog(kytten.GridLayout([[kytten.Checkbox() for j in range(GRID_SIZE)]
+                                                                 for i in range(GRID_SIZE)], padding=1),
+                           window=window, anchor=kytten.ANCHOR_CENTER, theme=theme)
+    # Controls and their areas are known once the dialog is laid out
+    dialog.on_update(0)
+
+    points = [(random.uniform(dialog.x, dialog.x + dialog.width),
+               random.uniform(dialog.y, dialog.y + dialog.height)) for i in range(QUERIES)]
+
+    grid = time_queries(kytten.Dialog.find_control, dialog, points)
+    linear = time_queries(linear_scan, dialog, points)
+
+    print("{} controls, {} queries".format(len(dialog.controls), QUERIES))
+    print("spatial index: {:.4f} ms   linear scan: {:.4f} ms".format(grid*1000, linear*1000))
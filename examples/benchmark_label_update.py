@@ -0,0 +1,67 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# examples/benchmark_label_update.py
+# Copyrighted (C) 2014 by "Parashurama"
+'''
+Measure the cost of updating a counter label in a HUD of 1000 labels,
+with the partial layout started from the label (the default) and with a
+full dialog layout (the previous behaviour), and count the labels laid
+out again per update.
+'''
+from __future__ import absolute_import, unicode_literals, division, print_function
+import os
+import sys
+import time
+import pyglet
+
+ # allow import from parent folder (1 level up)
+sys.path.extend(['.','..'])
+import kytten
+
+ROWS = 50
+COLUMNS = 20
+UPDATES = 200
+
+layout_calls = [0]
+
+def count_layouts(layout):
+    def _layout(self, x, y):
+        layout_calls[0] += 1
+        return layout(self, x, y)
+    return _layout
+
+def time_updates(dialog, counter, full):
+    layout_calls[0] = 0
+    start = time.time()
+    for i in range(UPDATES):
+        counter.set_text('Gold: {:>6}'.format(i))
+        if full:
+            dialog.set_needs_layout()
+        dialog.on_update(1/60)
+    return (time.time() - start) / UPDATES, layout_calls[0] / UPDATES
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    window = pyglet.window.Window(1280, 1024, caption='Benchmark Label Update', visible=False)
+    kytten.SetWindow(window, isBuffered=False)
+
+    theme = kytten.GuiTheme(window=window, batch=kytten.KyttenManager,
+                            group=kytten.KyttenManager.foregroup, theme='theme')
+
+    counter = kytten.Label('Gold: {:>6}'.format(0))
+    dialog = kytten.Dialog(kytten.VerticalLayout([kytten.HorizontalLayout([counter, kytten.Label('coins')]),
+                                                  kytten.GridLayout([[kytten.Label('{}'.format(i*COLUMNS+j))
+                                                                      for j in range(COLUMNS)] for i in range(ROWS)])]),
+                           anchor=kytten.ANCHOR_CENTER, theme=theme)
+    dialog.on_update(0)
+
+    kytten.Label.layout = count_layouts(kytten.Label.layout)
+
+    partial, partial_calls = time_updates(dialog, counter, False)
+    full, full_calls = time_updates(dialog, counter, True)
+
+    print("{} labels, {} updates".format(ROWS*COLUMNS + 2, UPDATES))
+    print("partial layout: {:.4f} ms ({:.0f} labels laid out)".format(partial*1000, partial_calls))
+    print("full layout:    {:.4f} ms ({:.0f} labels laid out)".format(full*1000, full_calls))
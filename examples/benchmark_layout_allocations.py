@@ -0,0 +1,79 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# examples/benchmark_layout_allocations.py
+# Copyrighted (C) 2014 by "Parashurama"
+'''
+Count the Python allocations of full layouts of an unchanged dialog of
+5000 widgets with tracemalloc (python 3.9+). Tracing starts before the
+warm-up layouts, so an object which merely replaces an equal one of the
+previous layout cancels out in the block counts. A steady relayout should
+keep nothing: exits with an error status when the blocks added per layout
+exceed MAX_BLOCKS. The transient peak of a layout is shown as well.
+'''
+from __future__ import absolute_import, unicode_literals, division, print_function
+import os
+import sys
+import time
+import tracemalloc
+import pyglet
+
+ # allow import from parent folder (1 level up)
+sys.path.extend(['.','..'])
+import kytten
+
+ROWS = 100
+COLUMNS = 50
+LAYOUTS = 10
+MAX_BLOCKS = 50
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    window = pyglet.window.Window(1280, 1024, caption='Benchmark Layout Allocations', visible=False)
+    kytten.SetWindow(window, isBuffered=False)
+
+    theme = kytten.GuiTheme(window=window, batch=kytten.KyttenManager,
+                            group=kytten.KyttenManager.foregroup, theme='theme')
+
+    dialog = kytten.Dialog(kytten.GridLayout([[kytten.Label('{}'.format(i*COLUMNS+j)) if j % 2 else
+                                               kytten.Button('{}'.format(i*COLUMNS+j))
+                                               for j in range(COLUMNS)] for i in range(ROWS)]),
+                           anchor=kytten.ANCHOR_CENTER, theme=theme)
+    dialog.on_update(0)
+
+    tracemalloc.start()
+    ignore_tracemalloc = tracemalloc.Filter(False, tracemalloc.__file__)
+    # Warm up: the first filtering compiles the filter pattern, the first
+    # layout after creation records sizes and rects
+    tracemalloc.take_snapshot().filter_traces([ignore_tracemalloc])
+    dialog.do_layout()
+    dialog.do_layout()
+
+    before = tracemalloc.take_snapshot().filter_traces([ignore_tracemalloc])
+    peak = 0
+    start = time.time()
+    for i in range(LAYOUTS):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        dialog.do_layout()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    elapsed = (time.time() - start) / LAYOUTS
+    after = tracemalloc.take_snapshot().filter_traces([ignore_tracemalloc])
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'lineno')
+    blocks = sum(stat.count_diff for stat in stats) / LAYOUTS
+    size = sum(stat.size_diff for stat in stats) / LAYOUTS
+
+    print("{} widgets, {} layouts".format(ROWS*COLUMNS, LAYOUTS))
+    print("full layout, traced: {:.4f} ms".format(elapsed*1000))
+    print("added per layout: {:.1f} blocks, {:.0f} bytes".format(blocks, size))
+    print("transient peak of a layout: {} bytes".format(peak))
+    for stat in stats[:10]:
+        if stat.count_diff:
+            print("    {}".format(stat))
+
+    if blocks > MAX_BLOCKS:
+        print("more than {} blocks added per layout".format(MAX_BLOCKS))
+        sys.exit(1)
@@ -0,0 +1,49 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# examples/benchmark_layout_geometry.py
+# Copyrighted (C) 2014 by "Parashurama"
+'''
+Measure full layouts of a dialog of 1000 widgets, and count the vertex
+writes applied after each layout: when nothing moved, every write is
+skipped.
+'''
+from __future__ import absolute_import, unicode_literals, division, print_function
+import os
+import sys
+import time
+import pyglet
+
+ # allow import from parent folder (1 level up)
+sys.path.extend(['.','..'])
+import kytten
+from kytten.theme import VertexWrites
+
+LAYOUTS = 50
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    window = pyglet.window.Window(1280, 1024, caption='Benchmark Layout Geometry', visible=False)
+    kytten.SetWindow(window, isBuffered=False)
+
+    theme = kytten.GuiTheme(window=window, batch=kytten.KyttenManager,
+                            group=kytten.KyttenManager.foregroup, theme='theme')
+
+    dialog = kytten.Dialog(kytten.GridLayout([[kytten.Button('{}'.format(i*20+j)) for j in range(20)]
+                                                                             for i in range(50)]),
+                           anchor=kytten.ANCHOR_CENTER, theme=theme)
+    dialog.on_update(0)
+
+    geometry = dialog.get_layout_geometry()
+
+    VertexWrites.reset_counts()
+    start = time.time()
+    for i in range(LAYOUTS):
+        dialog.do_layout()
+    elapsed = (time.time() - start) / LAYOUTS
+
+    print("{} widgets placed per layout".format(len(geometry)))
+    print("full layout: {:.4f} ms".format(elapsed*1000))
+    print("vertex writes per layout: {:.0f} written, {:.0f} skipped".format(
+                                VertexWrites.written / LAYOUTS, VertexWrites.skipped / LAYOUTS))
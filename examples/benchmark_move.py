@@ -0,0 +1,48 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# examples/benchmark_move.py
+# Copyrighted (C) 2014 by "Parashurama"
+'''
+Measure the cost of dragging a dialog around: one move_by and one gui
+update per frame, for an empty dialog and a dialog of 500 widgets.
+'''
+from __future__ import absolute_import, unicode_literals, division, print_function
+import os
+import sys
+import time
+import pyglet
+
+ # allow import from parent folder (1 level up)
+sys.path.extend(['.','..'])
+import kytten
+
+FRAMES = 200
+
+def run(theme, name, content):
+    manager = kytten.KyttenManager
+    dialog = kytten.Dialog(content, anchor=kytten.ANCHOR_BOTTOM_LEFT, offset=(10, 10), theme=theme)
+    manager._update_gui()
+
+    start = time.time()
+    for i in range(FRAMES):
+        dialog.move_by(1, 1 if i % 2 else -1)
+        manager._update_gui()
+    elapsed = (time.time() - start) / FRAMES
+
+    dialog.teardown()
+    print("{:<12} move + update: {:.4f} ms".format(name, elapsed*1000))
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    window = pyglet.window.Window(1280, 1024, caption='Benchmark Move', visible=False)
+    kytten.SetWindow(window, isBuffered=False)
+
+    theme = kytten.GuiTheme(window=window, batch=kytten.KyttenManager,
+                            group=kytten.KyttenManager.foregroup, theme='theme')
+
+    print("{} frames".format(FRAMES))
+    run(theme, 'empty', kytten.VerticalLayout([]))
+    run(theme, '500 widgets', kytten.GridLayout([[kytten.Label('{}'.format(i*20+j)) for j in range(20)]
+                                                                                  for i in range(25)]))
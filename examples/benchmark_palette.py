@@ -0,0 +1,80 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# examples/benchmark_palette.py
+# Copyrighted (C) 2014 by "Parashurama"
+'''
+Compare a 32x32 grid of slot images laid out with GridLayout (one vertex
+list per image) and PaletteLayout (images drawn from a shared vertex list).
+
+Reports the number of vertex lists allocated to build and lay out the
+dialog and the average time needed to draw the gui batch.
+'''
+from __future__ import absolute_import, unicode_literals, division, print_function
+import os
+import sys
+import time
+import pyglet
+
+ # allow import from parent folder (1 level up)
+sys.path.extend(['.','..'])
+import kytten
+
+GRID_SIZE = 32
+FRAMES = 200
+
+def count_allocations(batch):
+    '''
+    Wrap batch.add to count vertex list allocations.
+    '''
+    counter = [0]
+    batch_add = batch.add
+    def add(*args, **kwargs):
+        counter[0] += 1
+        return batch_add(*args, **kwargs)
+    batch.add = add
+    return counter
+
+def run(window, theme, layout_name, create_layout):
+    manager = kytten.KyttenManager
+    counter = count_allocations(manager)
+
+    dialog = kytten.Dialog(create_layout(), window=window, anchor=kytten.ANCHOR_CENTER, theme=theme)
+    # Graphic elements are created when the dialog is laid out
+    dialog.on_update(0)
+    allocations = counter[0]
+    del manager.add
+
+    window.switch_to()
+    start = time.time()
+    for i in range(FRAMES):
+        window.clear()
+        manager.draw()
+    pyglet.gl.glFinish()
+    elapsed = (time.time() - start) / FRAMES
+
+    dialog.teardown()
+    print("{:<12} vertex lists: {:>5}   draw: {:.3f} ms".format(layout_name, allocations, elapsed*1000))
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    window = pyglet.window.Window(1280, 1024, caption='Benchmark Palette', visible=False, vsync=False)
+    kytten.SetWindow(window, isBuffered=False)
+
+    theme = kytten.GuiTheme(window=window, batch=kytten.KyttenManager,
+                            group=kytten.KyttenManager.foregroup, theme='theme')
+
+    slot = kytten.LoadImage('images/slot.png')
+
+    def grid_layout():
+        return kytten.GridLayout([[kytten.Image(slot, size=(24, 24)) for j in range(GRID_SIZE)]
+                                                                     for i in range(GRID_SIZE)], padding=1)
+
+    def palette_layout():
+        return kytten.PaletteLayout([kytten.Image(slot, size=(24, 24)) for i in range(GRID_SIZE*GRID_SIZE)],
+                                    GRID_SIZE, padding=1)
+
+    print("{0}x{0} slot images, {1} frames".format(GRID_SIZE, FRAMES))
+    run(window, theme, 'GridLayout', grid_layout)
+    run(window, theme, 'PaletteLayout', palette_layout)
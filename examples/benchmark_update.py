@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# examples/benchmark_update.py
+# Copyrighted (C) 2014 by "Parashurama"
+'''
+Measure the per frame cost of Dialog.on_update for dialogs of growing size,
+with on_update dispatched only to subscribed controls (the default) and to
+every control of the dialog (the previous behaviour, emulated by
+subscribing all controls).
+'''
+from __future__ import absolute_import, unicode_literals, division, print_function
+import os
+import sys
+import time
+import pyglet
+
+ # allow import from parent folder (1 level up)
+sys.path.extend(['.','..'])
+import kytten
+
+CONTROL_COUNTS = (100, 500, 2000)
+FRAMES = 1000
+
+def time_updates(dialog):
+    start = time.time()
+    for i in range(FRAMES):
+        dialog.on_update(1/60)
+    return (time.time() - start) / FRAMES
+
+def run(window, theme, count):
+    dialog = kytten.Dialog(kytten.VerticalLayout([kytten.Button('Button {}'.format(i)) for i in range(count)]),
+                           window=window, anchor=kytten.ANCHOR_CENTER, theme=theme)
+    # First update lays the dialog out, keep it out of the timings
+    dialog.on_update(0)
+
+    subscribed = time_updates(dialog)
+
+    for control in dialog.controls:
+        dialog.add_update_subscriber(control)
+    everyone = time_updates(dialog)
+
+    dialog.teardown()
+    print("{:>5} controls   subscribed: {:.4f} ms   all controls: {:.4f} ms".format(
+                                                        count, subscribed*1000, everyone*1000))
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    window = pyglet.window.Window(640, 480, caption='Benchmark Update', visible=False)
+    kytten.SetWindow(window, isBuffered=False)
+
+    theme = kytten.GuiTheme(window=window, batch=kytten.KyttenManager,
+                            group=kytten.KyttenManager.foregroup, theme='theme')
+
+    print("{} frames".format(FRAMES))
+    for count in CONTROL_COUNTS:
+        run(window, theme, count)
@@ -0,0 +1,88 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# examples/benchmark_update_controls.py
+# Copyrighted (C) 2014 by "Parashurama"
+'''
+Count the Python allocations of DialogEventManager.update_controls on an
+unchanged tree of 5000 controls with tracemalloc (python 3.9+). No window
+nor theme is needed: the controls are placed by hand, as a layout would.
+An unchanged tree should keep its lookup structures and update
+subscriptions: exits with an error status when the blocks added per call
+exceed MAX_BLOCKS, or when a call needs more than MAX_PEAK bytes at once.
+'''
+from __future__ import absolute_import, unicode_literals, division, print_function
+import sys
+import time
+import tracemalloc
+
+ # allow import from parent folder (1 level up)
+sys.path.extend(['.','..'])
+from kytten.widgets import Control
+from kytten.dialog import DialogEventManager
+
+ROWS = 100
+COLUMNS = 50
+CALLS = 100
+MAX_BLOCKS = 5
+MAX_PEAK = 64*1024
+
+class ControlTree(DialogEventManager):
+    '''A grid of fixed controls, standing for the content of a dialog.'''
+    def __init__(self, rows, columns, size=20):
+        DialogEventManager.__init__(self)
+        self.content = []
+        for i in range(rows):
+            for j in range(columns):
+                control = Control(width=size, height=size)
+                control.x, control.y = j*size, i*size
+                # A few controls handle every update
+                if not j % 10:
+                    control.push_handlers(on_update=lambda dt: None)
+                self.content.append(control)
+
+    def _collect_controls(self, controls):
+        for control in self.content:
+            control._collect_controls(controls)
+
+if __name__ == '__main__':
+    tree = ControlTree(ROWS, COLUMNS)
+
+    tracemalloc.start()
+    ignore_tracemalloc = tracemalloc.Filter(False, tracemalloc.__file__)
+    # Warm up: the first filtering compiles the filter pattern, the first
+    # update builds the lookup structures
+    tracemalloc.take_snapshot().filter_traces([ignore_tracemalloc])
+    tree.update_controls()
+    tree.update_controls()
+
+    before = tracemalloc.take_snapshot().filter_traces([ignore_tracemalloc])
+    peak = 0
+    start = time.time()
+    for i in range(CALLS):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        tree.update_controls()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    elapsed = (time.time() - start) / CALLS
+    after = tracemalloc.take_snapshot().filter_traces([ignore_tracemalloc])
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'lineno')
+    blocks = sum(stat.count_diff for stat in stats) / CALLS
+    size = sum(stat.size_diff for stat in stats) / CALLS
+
+    print("{} controls, {} subscribed, {} calls".format(len(tree.controls), len(tree.update_subscribers), CALLS))
+    print("update_controls, traced: {:.4f} ms".format(elapsed*1000))
+    print("added per call: {:.1f} blocks, {:.0f} bytes".format(blocks, size))
+    print("transient peak of a call: {} bytes".format(peak))
+    for stat in stats[:10]:
+        if stat.count_diff:
+            print("    {}".format(stat))
+
+    if blocks > MAX_BLOCKS:
+        print("more than {} blocks added per call".format(MAX_BLOCKS))
+        sys.exit(1)
+    if peak > MAX_PEAK:
+        print("more than {} bytes needed by a call".format(MAX_PEAK))
+        sys.exit(1)
@@ -0,0 +1,66 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# examples/benchmark_virtual_menu.py
+# Copyrighted (C) 2014 by "Parashurama"
+'''
+Measure a scrolled menu of 20000 options, as a Menu (one MenuOption per
+option) and as a VirtualMenu (only the options visible exist): time of
+the first layout, time of a layout after scrolling, and number of
+MenuOptions created.
+'''
+from __future__ import absolute_import, unicode_literals, division, print_function
+import os
+import sys
+import time
+import pyglet
+
+ # allow import from parent folder (1 level up)
+sys.path.extend(['.','..'])
+import kytten
+
+OPTIONS = 20000
+SCROLLS = 50
+
+created = [0]
+
+def count_options(init):
+    def _init(self, *args, **kwargs):
+        created[0] += 1
+        return init(self, *args, **kwargs)
+    return _init
+
+def run(theme, name, menu_class):
+    options = ['Option {}'.format(i) for i in range(OPTIONS)]
+
+    created[0] = 0
+    start = time.time()
+    scrollable = kytten.Scrollable(menu_class(options=options), height=400)
+    dialog = kytten.Dialog(scrollable, anchor=kytten.ANCHOR_CENTER, theme=theme)
+    dialog.on_update(0)
+    first = time.time() - start
+
+    start = time.time()
+    for i in range(SCROLLS):
+        scrollable.vscrollbar.pos = (i + 1) / (SCROLLS + 1)
+        dialog.do_layout()
+    scroll = (time.time() - start) / SCROLLS
+
+    dialog.teardown()
+    print("{:<12} first layout: {:.1f} ms, layout after scroll: {:.2f} ms, {} options created".format(
+                                                        name, first*1000, scroll*1000, created[0]))
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    window = pyglet.window.Window(1280, 1024, caption='Benchmark Virtual Menu', visible=False)
+    kytten.SetWindow(window, isBuffered=False)
+
+    theme = kytten.GuiTheme(window=window, batch=kytten.KyttenManager,
+                            group=kytten.KyttenManager.foregroup, theme='theme')
+
+    kytten.menu.MenuOption.__init__ = count_options(kytten.menu.MenuOption.__init__)
+
+    print("{} options, {} scrolls".format(OPTIONS, SCROLLS))
+    run(theme, 'Menu', kytten.Menu)
+    run(theme, 'VirtualMenu', kytten.VirtualMenu)
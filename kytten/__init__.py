@@ -30,8 +30,8 @@ from .dialog import Dialog, PopupMessage, PopupConfirm, PropertyDialog, ToolTip,
 from .document import Document, RichText
 from .file_dialogs import FileLoadDialog, FileSaveDialog, DirectorySelectDialog
 from .frame import Frame, TitleFrame, GuiFrame, Wrapper, SectionHeader, FoldingSection, BubbleFrame
-from .layout import GridLayout, HorizontalLayout, VerticalLayout, FreeLayout, FreeForm, InteractiveLayout, PaletteLayout
-from .menu import Menu, Dropdown, MenuList
+from .layout import GridLayout, HorizontalLayout, VerticalLayout, VirtualList, FreeLayout, FreeForm, InteractiveLayout, PaletteLayout
+from .menu import Menu, VirtualMenu, Dropdown, MenuList
 from .scrollable import Scrollable
 from .slider import Slider
 from .text_input import Input, MultilineInput
@@ -42,18 +42,32 @@ from .base import GetObjectfromId, GetObjectfromName, ReferenceName, DisplayGrou
 from .base import InvalidWidgetNameError
 from .manager import GuiManager, PageManager
 from .selectable_image import Selectable
-from .images import LoadImage
+from .images import LoadImage, ImageCache
 from .tabbed_form import TabbedForm, TabEntry
 
 from .dialog import Dialog as GuiElement
 
-def SetWindow(window, manager=None, isBuffered=True):
+def SetWindow(window, manager=None, isBuffered=True, perDialogBuffers=False, dirtyRects=False, guiTickRate=None, renderer='fixed', bufferScale=1.0, routeEvents=False, coalesceMotion=False, layoutBudget=None):
+    '''
+    Set up kytten for a window.
+
+    See GuiManager for the isBuffered, perDialogBuffers, dirtyRects,
+    guiTickRate, bufferScale, routeEvents, coalesceMotion and layoutBudget
+    options.
+
+    @param renderer 'fixed' for the fixed-function OpenGL renderer, or
+                    'shader' to draw through a single shader program
+                    (needs a compatibility profile context).
+    '''
     global KyttenManager, KyttenRenderGUI
     from .theme import DEFAULT_EMPTY_THEME
+    from .renderer import CreateRenderer, SetRenderer
+
+    SetRenderer(CreateRenderer(renderer))
 
     if manager is not None and not isinstance(manager, GuiManager):
         raise TypeError('Invalid Gui Manager instance. Only GuiManager instance or subclass are supported.')
-    base.KyttenManager = manager is not None or GuiManager(window, isBuffered=isBuffered)
+    base.KyttenManager = manager if manager is not None else GuiManager(window, isBuffered=isBuffered, perDialogBuffers=perDialogBuffers, dirtyRects=dirtyRects, guiTickRate=guiTickRate, bufferScale=bufferScale, routeEvents=routeEvents, coalesceMotion=coalesceMotion, layoutBudget=layoutBudget)
 
     KyttenManager = base.KyttenManager
     KyttenRenderGUI = base.KyttenManager.Render
@@ -0,0 +1,193 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# kytten/atlas.py
+# Copyrighted (C) 2013 by "Parashurama"
+'''
+Runtime texture atlas, used to pack theme images in a few large textures
+so that all the chrome of a dialog can be drawn with a single texture bind.
+
+Each image is stored with a border of 'padding' pixels filled by repeating
+its edge pixels, so sampling exactly on (or slightly past) the region edge
+never picks texels of a neighbouring image.
+'''
+from __future__ import unicode_literals, print_function, absolute_import, division
+from .compat import *
+import pyglet
+
+def ExtrudeImage(image, padding):
+    '''
+    Returns a copy of image enlarged by padding pixels on every side,
+    the new pixels repeating the nearest edge pixel.
+
+    @param image Any pyglet image
+    @param padding Number of pixels to add on each side
+    '''
+    image_data = image.get_image_data()
+    width, height = image_data.width, image_data.height
+    pitch = width * 4
+    data = image_data.get_data('RGBA', pitch)
+
+    rows = []
+    for i in range(height):
+        row = data[i*pitch:(i+1)*pitch]
+        rows.append(row[:4] * padding + row + row[-4:] * padding)
+    rows = [rows[0]] * padding + rows + [rows[-1]] * padding
+
+    return pyglet.image.ImageData(width + 2*padding, height + 2*padding,
+                                  'RGBA', b''.join(rows))
+
+class ShelfPacker(object):
+    '''
+    Packs rectangles in a fixed size area, filling it row ("shelf") by row
+    from the bottom. Each shelf is as tall as the rectangle that opened it.
+    Freed rectangles leave gaps in their shelf that later allocations of
+    the same or a smaller height can reuse.
+    '''
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.shelves = [] # [y, height, used width, [[gap x, gap width], ...]]
+        self.top = 0
+
+    def alloc(self, width, height):
+        '''
+        Returns (x, y) of a free area of the given size, or None if
+        there is no more room.
+        '''
+        if width > self.width or height > self.height:
+            return None
+
+        best = best_gap = None
+        for shelf in self.shelves:
+            y, shelf_height, used, gaps = shelf
+            if height > shelf_height:
+                continue
+            if best is not None and shelf_height >= best[1]:
+                continue
+
+            for gap in gaps:
+                if gap[1] >= width:
+                    best, best_gap = shelf, gap
+                    break
+            else:
+                if used + width <= self.width:
+                    best, best_gap = shelf, None
+
+        if best is None:
+            if self.top + height > self.height:
+                return None
+            best = [self.top, height, 0, []]
+            self.shelves.append(best)
+            self.top += height
+
+        if best_gap is not None:
+            x = best_gap[0]
+            best_gap[0] += width
+            best_gap[1] -= width
+            if not best_gap[1]:
+                best[3].remove(best_gap)
+        else:
+            x = best[2]
+            best[2] += width
+        return x, best[0]
+
+    def free(self, x, y, width, height):
+        '''
+        Release an area returned by alloc.
+        '''
+        for shelf in self.shelves:
+            if shelf[0] == y:
+                break
+        else:
+            raise ValueError("No allocated area at ({}, {})".format(x, y))
+
+        gaps = shelf[3]
+        gaps.append([x, width])
+        gaps.sort()
+
+        # Merge adjacent gaps
+        merged = [gaps[0]]
+        for gap in gaps[1:]:
+            last = merged[-1]
+            if last[0] + last[1] == gap[0]:
+                last[1] += gap[1]
+            else:
+                merged.append(gap)
+
+        # Give back trailing gap to the shelf free space
+        last = merged[-1]
+        if last[0] + last[1] == shelf[2]:
+            shelf[2] = last[0]
+            merged.pop()
+        shelf[3] = merged
+
+        # Drop empty shelves at the top
+        while self.shelves and self.shelves[-1][2] == 0:
+            self.top = self.shelves.pop()[0]
+
+class AtlasPage(object):
+    '''
+    A single atlas texture with its packer.
+    '''
+    def __init__(self, width, height, padding=1):
+        self.texture = pyglet.image.Texture.create(width, height)
+        self.packer = ShelfPacker(width, height)
+        self.padding = padding
+
+    def add(self, image):
+        '''
+        Copy image into the atlas texture.
+
+        Returns the TextureRegion holding image, or None if the page is full.
+        '''
+        padding = self.padding
+        position = self.packer.alloc(image.width + 2*padding,
+                                     image.height + 2*padding)
+        if position is None:
+            return None
+
+        x, y = position
+        self.texture.blit_into(ExtrudeImage(image, padding), x, y, 0)
+        return self.texture.get_region(x + padding, y + padding,
+                                       image.width, image.height)
+
+    def remove(self, region):
+        '''
+        Release the area of a region returned by add. Its pixels are left
+        as is until another image takes the area.
+        '''
+        padding = self.padding
+        self.packer.free(region.x - padding, region.y - padding,
+                         region.width + 2*padding, region.height + 2*padding)
+
+class TextureAtlas(object):
+    '''
+    Set of atlas pages, a new page being created whenever an image doesn't
+    fit in the existing ones.
+    '''
+    def __init__(self, page_size=1024, padding=1):
+        self.page_size = page_size
+        self.padding = padding
+        self.pages = []
+
+    def add(self, image):
+        '''
+        Returns a TextureRegion holding image, or None if image is too
+        large to fit in an atlas page.
+
+        @param image Any pyglet image
+        '''
+        padding = self.padding
+        if image.width + 2*padding > self.page_size or \
+           image.height + 2*padding > self.page_size:
+            return None
+
+        for page in self.pages:
+            region = page.add(image)
+            if region is not None:
+                return region
+
+        page = AtlasPage(self.page_size, self.page_size, padding)
+        self.pages.append(page)
+        return page.add(image)
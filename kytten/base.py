@@ -7,7 +7,7 @@ from __future__ import unicode_literals, print_function, absolute_import, divisi
 
 import weakref
 
-FLAGS={'force_delete':False}
+FLAGS={'force_delete':False, 'incremental_layout':False, 'layout_geometry':None}
 
 class InvalidWidgetNameError(Exception):
     pass
@@ -126,4 +126,14 @@ class Virtual(object):
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
 
+class Placement(object):
+    '''
+    A bare area, used with GetRelativePoint by layouts. Layouts keep their
+    own Placement and update it, instead of creating one per layout.
+    '''
+    __slots__ = ('x', 'y', 'width', 'height')
+
+    def __init__(self, x=0, y=0, width=0, height=0):
+        self.x, self.y, self.width, self.height = x, y, width, height
+
 from .tools import yield_single_value, wrapper, minvalue, maxvalue
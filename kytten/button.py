@@ -18,6 +18,7 @@ class Button(Control):
     A simple text-labeled button.
     '''
     label = None
+    _font = None
     button = None
     highlight = None
     is_pressed = False
@@ -76,7 +77,7 @@ class Button(Control):
             self.highlight.update(self.x, self.y, self.width, self.height)
 
         x, y, width, height = self.button.get_content_region()
-        font = self.label.document.get_font()
+        font = self._font
         self.label.x = x + width//2 - self.label.content_width//2
         self.label.y = y + height//2 - font.ascent//2 - font.descent
 
@@ -178,9 +179,10 @@ class Button(Control):
                 font_size=dialog.theme[path]['font_size'],
                 color=dialog.theme[path]['text_color'],
                 batch=dialog.batch, group=dialog.fg_group)
+            self._font = self.label.document.get_font()
 
         # Treat the height of the label as ascent + descent
-        font = self.label.document.get_font()
+        font = self._font
         height = font.ascent - font.descent # descent is negative
         self.width, self.height = self.button.get_needed_size(
             self.label.content_width, height)
@@ -581,10 +583,8 @@ class DraggableImageButton(ImageButton):
 
             return pyglet.event.EVENT_HANDLED
 
-        X,Y = DRAGGABLE.get_offset()
         DRAGGABLE.set_focus(self)
-        DRAGGABLE.set_offset((X+dx,Y+dy))
-        DRAGGABLE.set_needs_layout()
+        DRAGGABLE.move_by(dx, dy)
 
         return pyglet.event.EVENT_HANDLED
 
@@ -592,7 +592,8 @@ class DraggableImageButton(ImageButton):
         if self._is_dragging:
 
             DRAGGABLE=GetObjectfromName('DRAGGABLE')
-            NEW_POSITION = DRAGGABLE.layout_validate_drop_widget(self, (int(self.x +self.width//2),int(self.y+self.height//2)))
+            TX,TY = DRAGGABLE.translation # not laid out yet at its dragged position
+            NEW_POSITION = DRAGGABLE.layout_validate_drop_widget(self, (int(self.x+TX +self.width//2),int(self.y+TY+self.height//2)))
             _discard_old_parent=False
             Widget=None
 
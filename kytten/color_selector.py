@@ -481,7 +481,8 @@ class ColorSelector(Control):
 
     def _delete_select_dialog(self):
         if self.select_dialog is not None:
-            self.select_dialog.window.remove_handlers(self.select_dialog)
+            if not self.select_dialog.routed_events:
+                self.select_dialog.window.remove_handlers(self.select_dialog)
             self.select_dialog.teardown()
             self.select_dialog = None
             self.wheel = None
@@ -619,7 +620,8 @@ class ColorSelector(Control):
             group=root.root_group.parent, theme=root.theme,
             movable=True, anchor=ANCHOR_CENTER,
             on_escape=on_escape)
-        root.window.push_handlers(self.select_dialog)
+        if not self.select_dialog.routed_events:
+            root.window.push_handlers(self.select_dialog)
 
     def size(self, dialog, scale):
         Control.size(self, dialog, scale)
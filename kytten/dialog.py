@@ -10,11 +10,11 @@ import pyglet
 import weakref
 import time
 import types
-import pyglet.gl as gl
 import pyglet.window.mouse as mouse
 
 
-from .widgets import Widget, Spacer, Control, Label, DialogAssert, LayoutAssert, FreeLayoutAssert, DragNDropLayoutType
+from .spatial import ControlGrid
+from .widgets import LayoutWidget, SizeWidget, Widget, Spacer, Control, Label, DialogAssert, LayoutAssert, FreeLayoutAssert, DragNDropLayoutType
 from .button import Button
 from .frame import Wrapper, Frame, SectionHeader, GuiFrame, TransparentFrame, TitleFrame, Frame
 from .layout import GetRelativePoint, ANCHOR_CENTER, HALIGN_LEFT, HALIGN_CENTER, VALIGN_TOP, VALIGN_CENTER
@@ -25,9 +25,10 @@ from .layout import ANCHOR_TOP_LEFT, ANCHOR_TOP, ANCHOR_TOP_RIGHT, \
 
 from .layout import VerticalLayout, HorizontalLayout, GridLayout, FreeLayout
 from .text_input import Input
-from .base import DereferenceName, ReferenceDialog, DereferenceDialog, GetActiveDialogs, ActionOnAllDialogs, internals, GetObjectfromName, Virtual, InvalidWidgetNameError
+from .base import FLAGS, DereferenceName, ReferenceDialog, DereferenceDialog, GetActiveDialogs, ActionOnAllDialogs, internals, GetObjectfromName, Placement, InvalidWidgetNameError
 from .tools import patch_instance_method
-from .theme import Theme
+from .theme import Theme, VertexWrites
+from .renderer import GetRenderer, StateCache
 
 event_dispatcher_events_override = set(['on_mouse_press','on_mouse_release','on_mouse_motion','on_mouse_drag','on_mouse_scroll',
                                     'on_key_press','on_key_release'])
@@ -39,6 +40,9 @@ ANCHOR_DEFAULT_FLAG_REF = {ANCHOR_TOP_LEFT:'NW',    ANCHOR_TOP:None,    ANCHOR_T
 DIALOG_TRANSPARENT_FRAME = 1<<1
 DIALOG_NO_CREATE_FRAME = 1<<2
 
+# Seconds without window resize before a repositioned dialog is laid out
+REPOSITION_SETTLE_DELAY = 0.25
+
 def SetMinMaxDialogOffsets(anchor, screen, g_width, g_height, m_width, m_height):
     width, height = screen.width, screen.height
     valign, halign = anchor
@@ -66,6 +70,16 @@ def SetMinMaxDialogOffsets(anchor, screen, g_width, g_height, m_width, m_height)
     return (min_x, min_y, max_x, max_y)
 
 
+def GetFocusOrder(entry):
+    '''
+    Sort key of a (control, left, right, top, bottom) entry in a dialog
+    focus chain: explicit tab indices first, then top to bottom and left
+    to right.
+    '''
+    control, left, right, top, bottom = entry
+    tab_index = control.tab_index
+    return (tab_index is None, tab_index or 0, -top, left)
+
 def get_default_anchor_flag(anchor):
     return ANCHOR_DEFAULT_FLAG_REF[anchor]
 
@@ -95,9 +109,13 @@ class DialogEventManager(Control):
         @param content The Widget which we wrap
         '''
         Control.__init__(self, name=name, noId=True)
+        self._control_entries = None
         self.controls = weakref.WeakSet()
         self.control_areas = {}
+        self.control_grid = ControlGrid()
         self.control_map = {}
+        self.focus_chain = []
+        self.focus_chain_index = {}
         self.hover = None
         self.focus = None
         self.wheel_hint = None
@@ -105,13 +123,26 @@ class DialogEventManager(Control):
         self.last_clicked_time =0.
         self.mouse_in = False
         self.drag_n_drop_layouts = []
+        self.dirty_rects = []
+        self.refresh_all = True
+        self.drawn_bounds = None
+        self.update_subscribers = weakref.WeakSet()
+        self.translation = (0, 0)
+        self.settle_time = None
 
     def get_value(self, name):
         widget = self.get_widget(name)
         if widget is not None:
             return widget.get_value()
 
+    def flush_layout(self):
+        '''
+        Make sure the dialog is laid out, even if its layout was postponed.
+        '''
+        pass
+
     def get_values(self):
+        self.flush_layout()
         retval = {}
         for widget in self.controls:
             if widget.is_input() and widget.name is not None:
@@ -119,27 +150,48 @@ class DialogEventManager(Control):
         return retval
 
     def get_widget(self, name):
+        self.flush_layout()
         return self.control_map.get(name)
 
     def hit_control(self, x, y, control):
-        left, right, top, bottom = self.control_areas[str(control)]
+        tx, ty = self.translation
+        x, y = x - tx, y - ty
+        left, right, top, bottom = self.control_areas[id(control)]
         if x >= left and x < right and y >= bottom and y < top:
             return control.hit_test(x, y)
         else:
             return False
 
+    def find_control(self, x, y):
+        '''
+        Returns the control under (x, y), or None.
+        '''
+        tx, ty = self.translation
+        x, y = x - tx, y - ty
+        for control in self.control_grid.query(x, y):
+            if control.hit_test(x, y):
+                return control
+
     def on_update(self, dt):
         '''
-        We update our layout only when it's time to construct another frame.
-        Since we may receive several resize events within this time, this
-        ensures we don't resize too often.
+        Dispatch on_update to the controls subscribed to updates. An idle
+        dialog has no subscriber, so this costs nothing.
 
         @param dialog The Dialog containing the controls
         @param dt Time passed since last update event (in seconds)
         '''
+        if self.update_subscribers:
+            for control in list(self.update_subscribers):
+                control.dispatch_event('on_update', dt)
+
+    def add_update_subscriber(self, control):
+        '''
+        Dispatch on_update events to control on each update.
+        '''
+        self.update_subscribers.add(control)
 
-        for control in self.controls:
-            control.dispatch_event('on_update', dt)
+    def remove_update_subscriber(self, control):
+        self.update_subscribers.discard(control)
 
     def set_focus(self, focus):
         '''
@@ -153,13 +205,14 @@ class DialogEventManager(Control):
 
         if self.focus is not None:
             self.focus.dispatch_event('on_lose_focus')
+            self.invalidate_control(self.focus)
 
         self.focus = focus
 
         if focus is not None:
             self.focus.dispatch_event('on_gain_focus')
 
-        return self.EventHandled()
+        return self.invalidate_control(self.focus)
 
     def set_hover(self, hover):
         '''
@@ -174,6 +227,7 @@ class DialogEventManager(Control):
         if self.hover is not None:
             self.hover.dispatch_event('on_lose_highlight')
             if self.hover.hover_flag : self.hover.dispatch_event('on_lose_hover')
+            self.invalidate_control(self.hover)
 
         pyglet.clock.unschedule(self.check_hover)
 
@@ -182,7 +236,7 @@ class DialogEventManager(Control):
             hover.dispatch_event('on_gain_highlight')
             pyglet.clock.schedule_once(self.check_hover, self.hover_delay, hover)
 
-        return self.EventHandled()
+        return self.invalidate_control(hover)
 
     def check_hover(self, dt, hover):
         if self.hover is hover and hover.visible and not hover.hover_disabled:
@@ -202,36 +256,141 @@ class DialogEventManager(Control):
 
     def teardown(self):
         Control.teardown(self)
+        self._control_entries = None
         self.controls = weakref.WeakSet()
         self.control_areas = {}
+        self.control_grid = ControlGrid()
         self.control_map = {}
+        self.focus_chain = []
+        self.focus_chain_index = {}
         self.focus = None
         self.hover = None
         self.wheel_hint = None
         self.wheel_target = None
 
+    def invalidate_controls(self):
+        '''
+        Rebuild the control lookup structures on the next layout even if
+        no control moved, e.g. when a TAB index changed.
+        '''
+        self._control_entries = None
+
     def update_controls(self):
         '''Update our list of controls which may respond to user input.'''
         controls = self._get_controls()
         if not controls: return
-        self.controls = weakref.WeakSet()
-        self.control_areas = {}
-        self.control_map = {}
-        for control, left, right, top, bottom in controls:
-            self.controls.add(control)
-            self.control_areas[str(control)] = (left, right, top, bottom)
-            if control.name is not None:
-                self.control_map[control.name] = control
 
-        if self.hover is not None and self.hover not in self.controls:
-            self.set_hover(None)
-        if self.focus is not None and self.focus not in self.controls:
-            self.set_focus(None)
+        # A relayout which moved no control leaves the lookup structures
+        # as they are.
+        if controls != self._control_entries:
+            self._control_entries = controls
+            self.controls = weakref.WeakSet()
+            self.control_areas = {}
+            self.control_grid = ControlGrid(controls)
+            self.control_map = {}
+            for control, left, right, top, bottom in controls:
+                self.controls.add(control)
+                self.control_areas[id(control)] = (left, right, top, bottom)
+                if control.name is not None:
+                    self.control_map[control.name] = control
+
+            focusable = sorted((entry for entry in controls if entry[0].is_focusable()), key=GetFocusOrder)
+            self.focus_chain = [entry[0] for entry in focusable]
+            self.focus_chain_index = dict((id(control), index) for index, control in enumerate(self.focus_chain))
+
+            # Keep subscriptions of controls still in the dialog, and
+            # subscribe controls which expect every update.  Between changes,
+            # subscriptions are only added and removed by the controls.
+            self.update_subscribers = weakref.WeakSet(
+                        [control for control in self.update_subscribers if control in self.controls] +
+                        [control for control in self.controls if control.wants_all_updates()])
+
+            if self.hover is not None and self.hover not in self.controls:
+                self.set_hover(None)
+            if self.focus is not None and self.focus not in self.controls:
+                self.set_focus(None)
 
     def EventHandled(self):
         self.to_refresh=True
+        self.refresh_all=True
         return pyglet.event.EVENT_HANDLED
 
+    def get_next_focus(self, direction=1):
+        '''
+        Returns the control following (or preceding, if direction is -1)
+        our focus in the focus chain, skipping disabled controls, or None.
+        '''
+        chain = self.focus_chain
+        if not chain:
+            return None
+
+        index = self.focus_chain_index.get(id(self.focus)) if self.focus is not None else None
+        if index is None:
+            index = -direction
+
+        for i in range(len(chain)):
+            index = (index + direction) % len(chain)
+            control = chain[index]
+            if not control.is_disabled():
+                return control
+
+    def invalidate_rect(self, x, y, width, height):
+        '''
+        Request a repaint of a screen rectangle only, instead of the whole
+        dialog.
+
+        @param x X coordinate of lower left corner
+        @param y Y coordinate of lower left corner
+        @param width Width of the rectangle
+        @param height Height of the rectangle
+        '''
+        self.to_refresh=True
+        self.dirty_rects.append((x, y, width, height))
+        return pyglet.event.EVENT_HANDLED
+
+    def invalidate_control(self, control):
+        '''
+        Request a repaint of the area covered by a control.  Falls back to
+        a full dialog repaint if the control area is unknown.
+        '''
+        if control is None:
+            return pyglet.event.EVENT_HANDLED
+
+        area = self.control_areas.get(id(control))
+        if area is None:
+            return self.EventHandled()
+
+        left, right, top, bottom = area
+        tx, ty = self.translation
+        return self.invalidate_rect(left+tx, bottom+ty, right-left, top-bottom)
+
+    def get_bounds(self):
+        '''
+        Returns our (x, y, width, height) on screen, including the
+        translation of a move not yet laid out.
+        '''
+        tx, ty = self.translation
+        return (self.x + tx, self.y + ty, self.width, self.height)
+
+    def get_dirty_rects(self):
+        '''
+        Returns the screen rectangles to repaint for this dialog.  Unless
+        only specific areas were invalidated, both the previously drawn
+        bounds and the current ones are returned.
+        '''
+        if self.refresh_all or not self.dirty_rects:
+            rects = [self.drawn_bounds] if self.drawn_bounds is not None else []
+            if self.visible:
+                rects.append(self.get_bounds())
+            return rects
+
+        return self.dirty_rects
+
+    def clear_dirty_rects(self):
+        self.drawn_bounds = self.get_bounds() if self.visible else None
+        self.refresh_all = False
+        del self.dirty_rects[:]
+
 internals.kytten_base_dialog_id = 0
 internals.kytten_floating_dialog_id= 1<<32
 internals.kytten_floating_dialogs=[]
@@ -258,6 +417,7 @@ class DialogGroup(pyglet.graphics.OrderedGroup):
         '''
         pyglet.graphics.OrderedGroup.__init__( self, GetNextDialogOrderId(dialog), parent )
         self.real_order = self.order
+        self.translation = (0, 0)
         self.dialog = weakref.proxy(dialog)
 
         if always_on_top and dialog:
@@ -305,16 +465,49 @@ class DialogGroup(pyglet.graphics.OrderedGroup):
 
     def set_state(self):
         '''
-        Ensure that blending is set.
+        Ensure that blending is set, and apply the translation of a dialog
+        being moved.
         '''
-        gl.glPushAttrib(gl.GL_ENABLE_BIT | gl.GL_CURRENT_BIT)
+        # Drawn outside of a gui frame, GL state may have changed since
+        # our last draw.
+        if not StateCache.in_frame:
+            StateCache.reset()
+
+        renderer = GetRenderer()
+        renderer.push_state()
+
+        tx, ty = self.translation = self.dialog.translation
+        if tx or ty:
+            renderer.push_offset(tx, ty)
 
     def unset_state(self):
         '''
         Restore previous blending state.
         '''
-        gl.glPopAttrib()
+        renderer = GetRenderer()
+        tx, ty = self.translation
+        if tx or ty:
+            renderer.pop_offset()
+        renderer.pop_state()
+
+
+class DialogBatchUpdate(object):
+    '''
+    Context manager returned by Dialog.batch_update.  Batches can be
+    nested; requests are applied when the outermost one ends.
+    '''
+    def __init__(self, dialog):
+        self.dialog = dialog
 
+    def __enter__(self):
+        self.dialog.batch_depth += 1
+        return self.dialog
+
+    def __exit__(self, *exc_info):
+        dialog = self.dialog
+        dialog.batch_depth -= 1
+        if not dialog.batch_depth:
+            dialog.end_batch_update()
 
 class Dialog(Wrapper, DialogEventManager, DialogAssert):
     '''
@@ -325,6 +518,17 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
     The Dialog is always repositioned in relationship to the window, and
     handles resize events accordingly.
     '''
+    render_target = None
+    # Set by a GuiManager delivering window events to the dialog itself
+    routed_events = False
+    needs_reposition = False
+    # Set by a GuiManager postponing our layout to a later update
+    defer_layout = False
+    # Number of batch_update blocks entered, and the requests they hold
+    batch_depth = 0
+    _batched_layout = False
+    _batched_refresh = False
+    _child_group = None
 
     def __init__(self, content=[], title=None, graphic=None, graphic_flag="repeat", theme=None, fixed_size=None, offset_modifier=None, flags=0, gui_style=None, *args, **kwargs):
 
@@ -464,6 +668,7 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
         self.fg_group = pyglet.graphics.OrderedGroup(2, self.root_group)
         self.highlight_group = pyglet.graphics.OrderedGroup(3, self.root_group)
         self.needs_layout = True
+        self.layout_widgets = []
         self.is_dragging = False
 
         if window is None:
@@ -471,7 +676,8 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
         else:
             width, height = window.get_size()
             self.screen = Widget(width=width, height=height)
-            window.push_handlers(self)
+            if not self.routed_events:
+                window.push_handlers(self)
             """
     def get_relative_size(self):
         _OFF_WIDTH = 0 ; _OFF_HEIGHT = 0
@@ -621,11 +827,15 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
         else:
             raise NotImplementedError('')
 
-    def set_children_offsets(self):
+    def set_children_offsets(self, reposition=False):
+        x, y, width, height = self.get_bounds()
         for child_dialog in self.child_dialogs:
             if not child_dialog.visible: continue
-            child_dialog.offset = child_dialog.basic_offset = self.translate_offset((self.x, self.y), self, child_dialog, self.screen, child_dialog.anchor)
-            child_dialog.needs_layout = True
+            child_dialog.offset = child_dialog.basic_offset = self.translate_offset((x, y), self, child_dialog, self.screen, child_dialog.anchor)
+            if reposition:
+                child_dialog.needs_reposition = True
+            else:
+                child_dialog.needs_layout = True
 
     def do_layout(self):
         '''
@@ -633,17 +843,131 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
         child Widgets, then laying ourself out relative to the parent window.
         '''
         if not self.screen: self.needs_layout = False ; return
+        del self.layout_widgets[:]
 
         # Determine size of all components
         self.size(self, 1.0) #scale = 1.0
-        EFFECTIVE_SIZE = (self.width,self.height)
-
-        EFFECTIVE_OFFSET=(0,0)
         if self.child_dialogs:
             for child_dialog in self.child_dialogs:
                 if not child_dialog.visible: continue
                 child_dialog.size(child_dialog, 1.0)#scale = 1.0
 
+        x, y = self.get_layout_position()
+
+        # delete drag_n_drop_layouts references
+        del self.drag_n_drop_layouts[:]
+
+        # Perform the actual layout now! Vertex writes are applied once
+        # everything is placed, only for the elements which moved.
+        with VertexWrites:
+            self.layout(x, y)
+        self.translation = (0, 0)
+        self.settle_time = None
+        self.update_controls()
+
+        if self.child_dialogs:
+            self.set_children_offsets()
+
+        self.needs_layout = False
+        self.needs_reposition = False
+
+    def get_layout_geometry(self):
+        '''
+        Lay out the dialog again, and return the (widget, x, y, width,
+        height) of every widget placed by a layout, parents first.
+        '''
+        geometry = FLAGS['layout_geometry'] = []
+        try:
+            self.do_layout()
+        finally:
+            FLAGS['layout_geometry'] = None
+        return geometry
+
+    def do_partial_layout(self):
+        '''
+        Size again only the widgets given to set_needs_layout, and their
+        parents as long as their size changes, then lay out again the
+        topmost widget reached; unchanged widgets below it keep their
+        layout.  Falls back to a full layout when a change reaches the
+        dialog content, or goes through a widget we can't size alone.
+        '''
+        widgets, self.layout_widgets = self.layout_widgets, []
+        if not self.screen: return
+
+        roots = []
+        FLAGS['incremental_layout'] = True
+        try:
+            for widget in widgets:
+                root = self._get_layout_root(widget)
+                if root is False:
+                    break
+                if root is not None and not any(root is other for other in roots):
+                    roots.append(root)
+            else:
+                tx, ty = self.translation
+                has_controls = False
+                with VertexWrites:
+                    for root in roots:
+                        LayoutWidget(root, root.x, root.y)
+                        self.invalidate_rect(root.x + tx, root.y + ty, root.width, root.height)
+                        has_controls = has_controls or bool(root._get_controls())
+
+                if has_controls:
+                    self.update_controls()
+                return
+        finally:
+            FLAGS['incremental_layout'] = False
+
+        self.do_layout()
+        self.EventHandled()
+
+    def _get_layout_root(self, widget):
+        '''
+        Size an invalidated widget, then its parents while their size
+        changes.  Returns the widget to lay out again, None if the widget
+        is not shown in the dialog, or False if a full layout is needed.
+        '''
+        # Only widgets still shown in our content are laid out
+        node = widget
+        try:
+            while node is not self:
+                if not node.visible:
+                    return None
+                if node._parent is None:
+                    return False
+                parent = node._parent._self()
+                is_child = parent._has_child(node)
+                if is_child is None:
+                    return False
+                elif not is_child:
+                    return None
+                node = parent
+        except ReferenceError:
+            return False
+
+        while widget is not self:
+            if widget.size_context is None:
+                return False
+
+            measured = widget.measured_size
+            widget.layout_dirty = True
+            SizeWidget(widget, *widget.size_context)
+            if widget.measured_size == measured and not widget.is_expandable():
+                return widget
+            widget = widget._parent._self()
+
+        return False
+
+    def get_layout_position(self):
+        '''
+        Returns the position of our lower left corner relative to the
+        window, from our anchor and offset and the current size of our
+        content and child dialogs.
+        '''
+        EFFECTIVE_SIZE = (self.width,self.height)
+
+        EFFECTIVE_OFFSET=(0,0)
+        if self.child_dialogs:
             EFFECTIVE_SIZE, EFFECTIVE_OFFSET = self.get_relative_size()
 
         self.child_group_size = (EFFECTIVE_SIZE[0]+EFFECTIVE_OFFSET[0], EFFECTIVE_SIZE[1]+EFFECTIVE_OFFSET[1])
@@ -655,7 +979,10 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
             g_width, g_height = self.child_group_size
             t_height=EFFECTIVE_SIZE[1] if (0 and self.anchor[1] == VALIGN_CENTER) else g_height
             t_width =EFFECTIVE_SIZE[0] if (0 and self.anchor[0] == HALIGN_CENTER) else g_width
-            child_group = Virtual(width=t_width, height=t_height)
+            child_group = self._child_group
+            if child_group is None:
+                child_group = self._child_group = Placement()
+            child_group.width, child_group.height = t_width, t_height
             x, y = GetRelativePoint(self.screen, self.anchor, child_group, None, (0, 0))
         else:
             x, y = GetRelativePoint(self.screen, self.anchor, self, None, (0, 0))
@@ -673,20 +1000,48 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
             offset_y = max(min(offset_y, max_offset_y), min_offset_y)
 
         self.offset = (offset_x, offset_y)
-        x += offset_x
-        y += offset_y
+        return x + offset_x, y + offset_y
 
-        # delete drag_n_drop_layouts references
-        del self.drag_n_drop_layouts[:]
+    def reposition(self):
+        '''
+        Move the dialog to its place in a resized window, keeping the
+        current size of its content. The move is applied as a translation
+        of the existing geometry, laid out once the window size settles.
+        '''
+        if not self.screen: self.needs_reposition = False ; return
 
-        # Perform the actual layout now!
-        self.layout(x, y)
-        self.update_controls()
+        self.update_offset()
+        x, y = self.get_layout_position()
+        translation = (x - self.x, y - self.y)
+        if translation != self.translation:
+            self.translation = translation
+            self.EventHandled()
 
+        self.settle_time = time.time() + REPOSITION_SETTLE_DELAY
         if self.child_dialogs:
-            self.set_children_offsets()
+            self.set_children_offsets(reposition=True)
 
-        self.needs_layout = False
+        self.needs_reposition = False
+
+    def apply_translation(self):
+        '''
+        Lay out our existing geometry at its translated position, without
+        sizing it again.
+        '''
+        tx, ty = self.translation
+        self.settle_time = None
+        if not (tx or ty) or not self.screen:
+            return
+
+        del self.drag_n_drop_layouts[:]
+        with VertexWrites:
+            self.layout(self.x + tx, self.y + ty)
+        self.translation = (0, 0)
+        self.update_controls()
+
+        if self.child_dialogs:
+            self.set_children_offsets(reposition=True)
+        self.EventHandled()
 
     def set_graphic(self, graphic, fixed_size=False):
 
@@ -721,6 +1076,10 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
         assert self.own_batch
         self.batch.draw()
 
+    def hit_test(self, x, y):
+        tx, ty = self.translation
+        return Wrapper.hit_test(self, x - tx, y - ty)
+
     def header_bar_hit_test(self, x, y):
         if self.content._header_bar is None:
             return True
@@ -735,7 +1094,8 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
         if   iy1 is None: iy1=self.height
         elif iy1<0:       iy1=self.height+iy1
 
-        dx = x-self.x ; dy = y-self.y
+        tx, ty = self.translation
+        dx = x-self.x-tx ; dy = y-self.y-ty
 
         return ( ix0 <= dx < ix1) and ( iy0 <= dy < iy1)
 
@@ -784,17 +1144,11 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
 
                                                     # MultilineInput
         if symbol == pyglet.window.key.TAB and not hasattr(self.focus, 'on_auto_complete'): #[pyglet.window.key.TAB, pyglet.window.key.ENTER]:
-            focusable = [x for x in self.controls if x.is_focusable() and not x.is_disabled()]
-            if not focusable:
-                return
             dir = -1 if modifiers & pyglet.window.key.MOD_SHIFT else 1
+            new_focus = self.get_next_focus(dir)
+            if new_focus is None:
+                return
 
-            if self.focus is not None and self.focus in focusable:
-                index = focusable.index(self.focus)
-            else:
-                index = 0 - dir
-
-            new_focus = focusable[(index + dir) % len(focusable)]
             self.set_focus(new_focus)
             new_focus.ensure_visible()
 
@@ -802,11 +1156,11 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
 
         elif self.focus is not None and symbol != pyglet.window.key.ESCAPE:
             if self.focus.dispatch_event("on_key_press", symbol, modifiers):
-                return self.EventHandled()
+                return self.invalidate_control(self.focus)
 
             if symbol == pyglet.window.key.ENTER:
                 if self.focus.dispatch_event("on_text", '\n'):
-                    return self.EventHandled()
+                    return self.invalidate_control(self.focus)
 
         if symbol == pyglet.window.key.ENTER:
             if self.on_enter is not None and not ( modifiers & pyglet.window.key.MOD_ALT or modifiers & pyglet.window.key.MOD_SHIFT):
@@ -840,17 +1194,14 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
 
         if self.focus is not None:
             self.focus.dispatch_event('on_mouse_drag', x, y, dx, dy, buttons, modifiers)
-            return self.EventHandled()
+            return self.invalidate_control(self.focus)
 
         if self.is_movable and self.is_dragging is True:
             if not buttons == 1: return
             if self.parent_dialog: return self.parent_dialog.on_mouse_drag(x, y, dx, dy, buttons, modifiers)
 
-            x, y = self.basic_offset
-            self.basic_offset = (int(x + dx), int(y + dy))
-            self.set_needs_layout()
-
-            return self.EventHandled()
+            self.move_by(dx, dy)
+            return pyglet.event.EVENT_HANDLED
 
     def on_mouse_press(self, x, y, button, modifiers):
         '''
@@ -916,11 +1267,14 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
         self.is_dragging = False
         if self.parent_dialog is not None:
             self.parent_dialog.is_dragging = False
+            self.parent_dialog.end_move()
+        self.end_move()
 
         if self.visible is False:
             return pyglet.event.EVENT_UNHANDLED
 
-        if not check_for_always_on_top_dialog("on_mouse_motion", x, y, 0, 0):
+        # A routing manager updates the hover itself
+        if not self.routed_events and not check_for_always_on_top_dialog("on_mouse_motion", x, y, 0, 0):
             self.on_mouse_motion(x, y, 0, 0)
 
         if self.focus is not None and self.focus.dispatch_event('on_mouse_release', x, y, button, modifiers):
@@ -944,19 +1298,17 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
             return pyglet.event.EVENT_UNHANDLED
 
         if self.hit_test(x, y) and self.mouse_in is False:
-            ActionOnAllDialogs(self, 'on_mouse_leave', x, y)
+            if not self.routed_events:
+                ActionOnAllDialogs(self, 'on_mouse_leave', x, y)
             self.dispatch_event('on_mouse_enter', x, y)
 
         if self.hover is not None and not self.hit_control(x, y, self.hover):
             self.hover.dispatch_event('on_mouse_motion', x, y, dx, dy)
 
-        new_hover = None
-        for control in self.controls:
-            if self.hit_control(x, y, control):
-                new_hover = control
-                break
+        new_hover = self.find_control(x, y)
 
-        ActionOnAllDialogs(self, 'set_hover', None)
+        if not self.routed_events:
+            ActionOnAllDialogs(self, 'set_hover', None)
 
         self.set_hover(new_hover)
         if self.hover is not None:
@@ -999,17 +1351,17 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
     def on_text(self, text):
         if not self.visible: return
         if self.focus is not None and text != '\r' and self.focus.dispatch_event("on_text", text):
-            return self.EventHandled()
+            return self.invalidate_control(self.focus)
 
     def on_text_motion(self, motion):
         if not self.visible: return
         if self.focus is not None and self.focus.dispatch_event("on_text_motion", motion):
-            return self.EventHandled()
+            return self.invalidate_control(self.focus)
 
     def on_text_motion_select(self, motion):
         if not self.visible: return
         if self.focus is not None and self.focus.dispatch_event("on_text_motion_select",motion):
-            return self.EventHandled()
+            return self.invalidate_control(self.focus)
 
     def on_mouse_enter(self, x, y):
         if self.hit_test(x, y) and self.on_mouse_enter_func is not None:
@@ -1030,7 +1382,8 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
         '''
         if self.screen.width != width or self.screen.height != height:
             self.screen.width, self.screen.height = width, height
-            self.needs_layout = True
+            # Content size doesn't depend on the window size
+            self.needs_reposition = True
 
         if self.on_resize_func is not None and self.visible:
             self.on_resize_func(width, height)
@@ -1044,19 +1397,40 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
 
         @param dt Time passed since last update event (in seconds)
         '''
+        self.update_layout()
+        DialogEventManager.on_update(self, dt)
+
+    def update_layout(self):
+        '''
+        Carry out the pending layout work, if any: a full or partial
+        layout, a reposition, or the translation applied once the window
+        size settled.
+
+        Returns True if some work was done.
+        '''
         if self.needs_layout:
+            if self.defer_layout:
+                return False
             self.do_layout()
-        DialogEventManager.on_update(self, dt)
+        elif self.layout_widgets:
+            self.do_partial_layout()
+        elif self.needs_reposition:
+            self.reposition()
+        elif self.settle_time is not None and time.time() >= self.settle_time:
+            self.apply_translation()
+        else:
+            return False
+        return True
 
     def pop_to_top(self):
         '''
         Pop our dialog group to the top, and force our batch to re-sort
         the groups.  Also, puts our event handler on top of the window's
-        event handler stack.
+        event handler stack, unless our events are routed by the manager.
         '''
         self.root_group.pop_to_top()
         self.batch._draw_list_dirty = True  # forces resorting groups
-        if self.window is not None:
+        if self.window is not None and not self.routed_events:
             self.window.remove_handlers(self)
             self.window.push_handlers(self)
 
@@ -1071,6 +1445,48 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
     def get_offset(self):
         return self.basic_offset
 
+    def _get_attached_dialogs(self):
+        dialogs = [self]
+        for child_dialog in self.child_dialogs:
+            if child_dialog.visible:
+                dialogs.extend(child_dialog._get_attached_dialogs())
+        return dialogs
+
+    def move_by(self, dx, dy):
+        '''
+        Move the dialog, and the dialogs attached to it, by (dx, dy). The
+        move is applied as a translation of the dialog groups, kept within
+        the window, so no widget is laid out again until end_move.
+        '''
+        dialogs = self._get_attached_dialogs()
+        bounds = [dialog.get_bounds() for dialog in dialogs]
+        x0 = min(x for x, y, width, height in bounds)
+        y0 = min(y for x, y, width, height in bounds)
+        x1 = max(x + width for x, y, width, height in bounds)
+        y1 = max(y + height for x, y, width, height in bounds)
+        dx = max(min(dx, self.screen.width - x1), -x0)
+        dy = max(min(dy, self.screen.height - y1), -y0)
+
+        x, y = self.basic_offset
+        self.basic_offset = (int(x + dx), int(y + dy))
+
+        # Dialogs with their own render target only need to be composited
+        # at their new position.
+        redraw = not getattr(self.batch, 'per_dialog_buffers', False)
+        for dialog in dialogs:
+            tx, ty = dialog.translation
+            dialog.translation = (tx + dx, ty + dy)
+            dialog.settle_time = None
+            if redraw:
+                dialog.EventHandled()
+
+    def end_move(self):
+        '''
+        Lay out the dialog at the position reached with move_by.
+        '''
+        if self.translation != (0, 0):
+            self.settle_time = time.time()
+
     def set_offset(self, offset):
         self.basic_offset = (int(offset[0]), int(offset[1]))
         self.offset = (int(offset[0]), int(offset[1]))
@@ -1078,7 +1494,9 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
 
     def size(self, dialog, scale):
         Wrapper.size(self, dialog, scale)
+        self.update_offset()
 
+    def update_offset(self):
         if self.offset_modifier is not None:
             x, y = self.basic_offset
             self.offset=(int(x+self.offset_modifier[0]*self.width),
@@ -1093,12 +1511,67 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
             self.focus.dispatch_event('on_lose_focus')
             self.focus=None
 
-    def set_needs_layout(self):
+    def flush_layout(self):
+        if self.batch_depth:
+            return
+        if self.needs_layout:
+            self.do_layout()
+        elif self.layout_widgets:
+            self.do_partial_layout()
+
+    def set_needs_layout(self, widget=None):
         '''
         True if we should redo the Dialog layout on our next update.
+
+        @param widget If set, only this widget changed and the layout is
+                      redone from it (see do_partial_layout)
         '''
-        self.needs_layout = True
-        self.EventHandled()
+        if self.batch_depth:
+            if widget is None:
+                self._batched_layout = True
+            elif not any(other is widget for other in self.layout_widgets):
+                self.layout_widgets.append(widget)
+        elif widget is None:
+            self.needs_layout = True
+            self.EventHandled()
+        else:
+            self.layout_widgets.append(widget)
+            self.to_refresh = True
+
+    def EventHandled(self):
+        if self.batch_depth:
+            self._batched_refresh = True
+            return pyglet.event.EVENT_HANDLED
+        return DialogEventManager.EventHandled(self)
+
+    def batch_update(self):
+        '''
+        Returns a context manager grouping changes to our widgets: the
+        layout and refresh requests made inside are held, and applied once
+        when the batch ends, so the changes cost a single layout:
+
+            with dialog.batch_update():
+                for row in rows:
+                    grid.add_row(row)
+
+        Layouts are not flushed inside a batch, e.g. get_widget won't find
+        controls added in the batch before it ends.
+        '''
+        return DialogBatchUpdate(self)
+
+    def end_batch_update(self):
+        '''
+        Apply the requests held by batch_update.
+        '''
+        layout, refresh = self._batched_layout, self._batched_refresh
+        self._batched_layout = self._batched_refresh = False
+
+        if layout:
+            self.set_needs_layout()
+        elif refresh:
+            self.EventHandled()
+        elif self.layout_widgets:
+            self.to_refresh = True
 
     def teardown(self):
         DialogEventManager.teardown(self)
@@ -1107,9 +1580,12 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
             self.content = None
 
         if self.window is not None:
-            self.window.remove_handlers(self)
+            if not self.routed_events:
+                self.window.remove_handlers(self)
             self.window = None
         self.batch._draw_list_dirty = True  # forces resorting groups
+        if hasattr(self.batch, 'RemoveDialog'):
+            self.batch.RemoveDialog(self)
 
         if self.always_on_top is True:
             internals.kytten_floating_dialogs.remove(self)
@@ -1118,6 +1594,13 @@ class Dialog(Wrapper, DialogEventManager, DialogAssert):
             self.screen.teardown()
             self.screen=None
 
+        if self.render_target is not None:
+            self.render_target.delete()
+            self.render_target=None
+
+        if self.drawn_bounds is not None and hasattr(self.batch, 'invalidate_rect'):
+            self.batch.invalidate_rect(*self.drawn_bounds)
+
         self.EventHandled()
         DereferenceDialog(self)
 
@@ -1233,6 +1716,9 @@ class ToolTip(Dialog):
         # would send us off the screen, constrain it.
         x = self.parent_widget.x + self.parent_widget.width//2-self.width//2
         y = self.parent_widget.y + self.parent_widget.height//2-self.height//2
+        if self.parent_widget.saved_dialog is not None:
+            tx, ty = self.parent_widget.saved_dialog.translation
+            x += tx ; y += ty
 
         #x, y = GetRelativePoint(self.screen, self.anchor,
         #                        self, None, (0, 0))
@@ -1255,17 +1741,27 @@ class ToolTip(Dialog):
         y += offset_y
 
         # Perform the actual layout now!
-        self.layout(x, y)
+        with VertexWrites:
+            self.layout(x, y)
+        self.translation = (0, 0)
+        self.settle_time = None
         self.update_controls()
 
         if self.child_dialogs:
             self.set_children_offsets()
 
         self.needs_layout = False
+        self.needs_reposition = False
         for child_dialog in self.child_dialogs:
             child_dialog.needs_layout=True
             child_dialog.on_update(0.0)
 
+    def reposition(self):
+        '''
+        Tooltips follow their widget, so they are always laid out again.
+        '''
+        self.do_layout()
+
     def on_mouse_drag(self,*args):
         pass
 
@@ -26,6 +26,9 @@ class Document(Control):
     content=None
     scrollbar=None
     needs_layout=False
+    # Updates are scheduled while a relayout is pending; the scrollbar
+    # schedules its own updates as a control of the dialog.
+    scheduled_updates=True
     set_document_style=False
     scrollbar_to_ensure_visible=None
     def __init__(self, document, formatted=False, width=1000, height=5000, name=None,
@@ -94,12 +97,10 @@ class Document(Control):
             terminator = runs[0][0]
         self.document.set_style(0, terminator, {attr: value})
 
-    def _get_controls(self):
-        controls = []
+    def _collect_controls(self, controls):
         if self.scrollbar:
-            controls += self.scrollbar._get_controls()
-        controls += Control._get_controls(self)
-        return controls
+            self.scrollbar._collect_controls(controls)
+        Control._collect_controls(self, controls)
 
     def delete(self):
         Control.delete(self)
@@ -157,18 +158,21 @@ class Document(Control):
 
     def on_update(self, dt):
         '''
-        On updates, we update the scrollbar and then set our view offset
-        if it has changed.
+        On updates, we update the scrollbar unless it receives them from
+        the dialog, and relayout the dialog if the text changed. Only
+        received when scheduled with schedule_update.
 
         @param dt Time passed since last update event (in seconds)
         '''
-        if self.scrollbar is not None:
+        if self.scrollbar is not None and self.scrollbar not in self.saved_dialog.update_subscribers:
             self.scrollbar.dispatch_event('on_update', dt)
 
         if self.needs_layout:
             self.needs_layout = False
             self.saved_dialog.set_needs_layout()
 
+        self.unschedule_update()
+
     def _force_refresh(self):
         '''
         Forces recreation of any graphic elements we have constructed.
@@ -274,6 +278,7 @@ class Document(Control):
                 self.document.insert_text(start, text)
 
             self.needs_layout = True
+            self.schedule_update()
 
     def append_text(self, text, formatted=False):
         '''
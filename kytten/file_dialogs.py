@@ -15,7 +15,7 @@ from .dialog import Dialog, DIALOG_NO_CREATE_FRAME
 from .frame import Frame, SectionHeader
 from .layout import VerticalLayout, HorizontalLayout
 from .layout import ANCHOR_CENTER, HALIGN_LEFT, VALIGN_BOTTOM, HALIGN_CENTER
-from .menu import Menu, Dropdown
+from .menu import Menu, VirtualMenu, Dropdown
 from .scrollable import Scrollable
 from .text_input import Input
 from .widgets import Label
@@ -43,7 +43,7 @@ class FileLoadDialog(Dialog):
     select_button=None
     cancel_button=None
     def __init__(self, path=os.getcwd(), extensions=[], title="Select File",
-                 width=540, height=300, on_select=None, **kwargs):
+                 width=540, height=300, on_select=None, virtual=False, **kwargs):
         self.path = path
         self.extensions = extensions
         self.title = title
@@ -66,8 +66,10 @@ class FileLoadDialog(Dialog):
                                  selected=self.parents[-1],
                                  align=VALIGN_BOTTOM,
                                  on_select=on_parent_menu_select)
-        self.menu = Menu(options=self.files, align=HALIGN_LEFT,
-                         on_select=on_menu_select)
+        # A VirtualMenu only creates the files shown, for large directories
+        menu_class = VirtualMenu if virtual else Menu
+        self.menu = menu_class(options=self.files, align=HALIGN_LEFT,
+                               on_select=on_menu_select)
         self.scrollable = Scrollable(
             VerticalLayout([self.dropdown, self.menu], align=HALIGN_LEFT),
             width=width, height=height)
@@ -196,7 +198,10 @@ class FileSaveDialog(FileLoadDialog):
             self.on_escape()
         else:
             self.delete()
-            self.window.remove_handlers(self)
+            if self.routed_events:
+                self.batch.RemoveDialog(self)
+            else:
+                self.window.remove_handlers(self)
 
     def _do_select(self):
         filename = self.text_input.get_text()
@@ -264,7 +269,10 @@ class DirectorySelectDialog(FileLoadDialog):
             self.on_escape(self)
         else:
             self.delete()
-            self.window.remove_handlers(self)
+            if self.routed_events:
+                self.batch.RemoveDialog(self)
+            else:
+                self.window.remove_handlers(self)
 
     def _do_open(self):
         filename = self.text_input.get_text()
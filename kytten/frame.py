@@ -15,11 +15,11 @@ from __future__ import unicode_literals, print_function, absolute_import, divisi
 from .compat import *
 import pyglet
 import weakref
-from .widgets import Widget, Control, Graphic, Label, Spacer
+from .widgets import SizeWidget, LayoutWidget, ControlEntry, Widget, Control, Graphic, Label, Spacer
 from .layout import HorizontalLayout, VerticalLayout, GetRelativePoint
 from .layout import VALIGN_BOTTOM, HALIGN_LEFT, HALIGN_CENTER, HALIGN_RIGHT
 from .layout import ANCHOR_CENTER
-from .base import DisplayGroup, Log, FLAGS
+from .base import DisplayGroup, Log, FLAGS, Placement
 from .theme import Repeat_NinePatchTextureGraphicElement, Stretch_NinePatchTextureGraphicElement, DefaultTextureGraphicElement
 
 class Wrapper(Widget):
@@ -48,9 +48,9 @@ class Wrapper(Widget):
 
         if self.content is not None: self.content._parent=weakref.proxy(self)
 
-    def _get_controls(self):
-        '''Returns Controls contained by the Wrapper.'''
-        if self.content: return self.content._get_controls()
+    def _collect_controls(self, controls):
+        '''Appends Controls contained by the Wrapper.'''
+        if self.content: self.content._collect_controls(controls)
 
     def set_content(self, content):
         FLAGS['force_delete'] = True
@@ -91,7 +91,7 @@ class Wrapper(Widget):
             x, y = GetRelativePoint(
                 self, self.anchor,
                 self.content, self.anchor, self.content_offset)
-            self.content.layout(x, y)
+            LayoutWidget(self.content, x, y)
 
     def set(self, dialog, content):
         '''
@@ -117,7 +117,7 @@ class Wrapper(Widget):
         Widget.size(self, dialog, scale)
 
         if self.content is not None:
-            self.content.size(dialog, scale)
+            SizeWidget(self.content, dialog, scale)
 
             self.width, self.height = self.content.width, self.content.height
         else:
@@ -146,6 +146,9 @@ class Wrapper(Widget):
 
     _show = Show
 
+    def _has_child(self, item):
+        return self.content is item
+
     def _rereference_obj(self, *args):
         self.content = self.hidden_content if self.hidden_content is not None else self.content
         self.hidden_content = None
@@ -190,6 +193,7 @@ class Frame(Wrapper):
     '''
     Frame draws an untitled frame which encloses the dialog's content.
     '''
+    _interior = None
     def __init__(self, content=None, path=['frame'], image_name='image',
                  is_expandable=False, anchor=ANCHOR_CENTER,
                  use_bg_group=False, color=None, group=None, name=None):
@@ -250,12 +254,13 @@ class Frame(Wrapper):
         # In some cases the frame graphic element may allocate more space for
         # the content than the content actually fills, due to repeating
         # texture constraints.  Always center the content.
-        x, y, width, height = self.frame.get_content_region()
-        interior = Widget(width, height, spacer=True)
-        interior.x, interior.y = x, y
+        interior = self._interior
+        if interior is None:
+            interior = self._interior = Placement()
+        interior.x, interior.y, interior.width, interior.height = self.frame.get_content_region()
         x, y = GetRelativePoint(interior, self.anchor,
                                 self.content, self.anchor, self.content_offset)
-        self.content.layout(x, y)
+        LayoutWidget(self.content, x, y)
 
     def size(self, dialog, scale):
         '''
@@ -399,16 +404,16 @@ class BubbleFrame(GuiFrame, Control):
         Control.__init__(self, **kwargs)
         self._controls_list=[]
 
-    def _get_controls(self):
-        '''Returns Controls contained by the Wrapper.'''
+    def _collect_controls(self, controls):
+        '''Keeps the Controls contained by the Wrapper, appends ourself.'''
         CONTROLS = self.content._get_controls() if self.content is not None else []
         self._controls_list = [ctrl[0] for ctrl in CONTROLS]
-        self.control_areas = dict( (str(ctrl[0]),(ctrl[1],ctrl[2], ctrl[3], ctrl[4])) for ctrl in CONTROLS )
+        self.control_areas = dict( (id(ctrl[0]),(ctrl[1],ctrl[2], ctrl[3], ctrl[4])) for ctrl in CONTROLS )
 
-        return Control._get_controls(self)
+        Control._collect_controls(self, controls)
 
     def hit_control(self, x, y, control):
-        left, right, top, bottom = self.control_areas[str(control)]
+        left, right, top, bottom = self.control_areas[id(control)]
         if x >= left and x < right and y >= bottom and y < top:
             return control.hit_test(x, y)
         else:
@@ -553,10 +558,10 @@ class FoldingSection(Control, VerticalLayout):
 
         VerticalLayout.__init__(self, content=layout, align=align)
 
-    def _get_controls(self):
-        return VerticalLayout._get_controls(self) + \
-               [(self, self.header.x, self.header.x + self.header.width,
-                       self.header.y + self.header.height, self.header.y)]
+    def _collect_controls(self, controls):
+        VerticalLayout._collect_controls(self, controls)
+        controls.append(ControlEntry(self, self.header.x, self.header.x + self.header.width,
+                                           self.header.y + self.header.height, self.header.y))
 
     def _get_image_path(self):
         if self.is_open:
@@ -6,7 +6,9 @@
 from __future__ import unicode_literals, print_function, absolute_import, division
 from .compat import *
 from ctypes import c_uint
+import math
 import pyglet.gl as gl
+from .renderer import GetRenderer, StateCache
 
 class GuiRenderContextClass(object):
     def __init__(self):
@@ -18,28 +20,19 @@ class GuiRenderContextClass(object):
         return self
 
     def __enter__(self):
-        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+        StateCache.begin_frame()
+        StateCache.blend_func(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
         gl.glEnable(gl.GL_TEXTURE_2D)
 
         gl.glEnable(gl.GL_BLEND)
         gl.glDisable(gl.GL_CULL_FACE)
         gl.glDisable(gl.GL_DEPTH_TEST)
 
-        gl.glMatrixMode(gl.GL_PROJECTION)
-        gl.glPushMatrix()
-        gl.glLoadIdentity()
-        gl.gluOrtho2D (0, self.frustum_width, 0, self.frustum_height)
-
-        gl.glMatrixMode (gl.GL_MODELVIEW)
-        gl.glPushMatrix()
-        gl.glLoadIdentity()
+        GetRenderer().begin(self.frustum_width, self.frustum_height)
 
     def __exit__(self,  type, value , traceback ):
-        gl.glMatrixMode(gl.GL_PROJECTION)
-        gl.glPopMatrix()
-
-        gl.glMatrixMode (gl.GL_MODELVIEW)
-        gl.glPopMatrix()
+        GetRenderer().end()
+        StateCache.end_frame()
 
         gl.glEnable(gl.GL_CULL_FACE)
         gl.glEnable(gl.GL_DEPTH_TEST)
@@ -50,8 +43,24 @@ class GuiRenderContextClass(object):
 GuiRenderContext = GuiRenderContextClass()
 
 class GuiInternalBuffer(object):
-    def __init__(self, width = 512, height = 512, screen_size=None ):
+    '''
+    Offscreen framebuffer the gui is rendered into.
+
+    The texture is allocated with some slack (its capacity) and only
+    reallocated when the requested size no longer fits, or is much smaller;
+    otherwise drawing goes to a sub-viewport of it. The buffer may also be
+    rendered at a resolution scale (e.g. 0.5 to save fill-rate, 2.0 for
+    HiDPI) and is then resampled with linear filtering when composited.
+    '''
+    position = (0, 0)
+    clip_region = None
+    # Capacity multiplier used when the texture must grow
+    growth_slack = 1.25
+
+    def __init__(self, width = 512, height = 512, screen_size=None, scale=1.0):
+        self.scale = scale
         self.render_target_size = width, height
+        self.pixel_size = self.capacity = self._get_pixel_size(width, height)
 
         # create the framebuffer
         self._buffer = (c_uint * 1)() ; gl.glGenFramebuffersEXT(1,self._buffer)
@@ -59,7 +68,7 @@ class GuiInternalBuffer(object):
 
         gl.glBindFramebufferEXT(gl.GL_FRAMEBUFFER_EXT, self._buffer)
 
-        self.rgb_texture = self._create_texture(texture_size=self.render_target_size)
+        self.rgb_texture = self._create_texture(texture_size=self.capacity, filter=self._get_filter())
 
         gl.glFramebufferTexture2DEXT(gl.GL_FRAMEBUFFER_EXT, gl.GL_COLOR_ATTACHMENT0_EXT, gl.GL_TEXTURE_2D, self.rgb_texture, 0)
 
@@ -69,13 +78,56 @@ class GuiInternalBuffer(object):
             return
         gl.glBindFramebufferEXT(gl.GL_FRAMEBUFFER_EXT, 0)
 
+    def set_clip_region(self, region):
+        '''
+        Restrict the next clear and drawing to a screen rectangle, leaving
+        the rest of the buffer untouched.
+
+        @param region (x, y, width, height) or None for the whole buffer
+        '''
+        self.clip_region = region
+
+    def _get_pixel_size(self, width, height):
+        return (max(int(math.ceil(width*self.scale)), 1),
+                max(int(math.ceil(height*self.scale)), 1))
+
+    def _get_filter(self):
+        return gl.GL_NEAREST if self.scale == 1.0 else gl.GL_LINEAR
+
+    def resize(self, texture_size):
+        '''
+        Set the gui area covered by the buffer.
+
+        @return True if the texture was reallocated.
+        '''
+        self.render_target_size = texture_size
+        pixel_width, pixel_height = self.pixel_size = self._get_pixel_size(*texture_size)
+        capacity_width, capacity_height = self.capacity
+
+        if pixel_width <= capacity_width and pixel_height <= capacity_height and \
+           pixel_width * pixel_height * 4 >= capacity_width * capacity_height:
+            return False
+
+        self.capacity = (int(pixel_width * self.growth_slack), int(pixel_height * self.growth_slack))
+        self.rgb_texture = self._create_texture(textureID=self.rgb_texture, texture_size=self.capacity, filter=self._get_filter())
+        return True
+
+    def set_scale(self, scale):
+        '''
+        Change the resolution scale, reallocating the texture.
+        '''
+        self.scale = scale
+        self.capacity = (0, 0)
+        self.resize(self.render_target_size)
+
     def recreate_texture(self, texture_size):
         #(width, height) = texture_size
-        self.rgb_texture = self._create_texture(textureID=self.rgb_texture, texture_size=texture_size)
         self.render_target_size = texture_size
+        self.pixel_size = self.capacity = self._get_pixel_size(*texture_size)
+        self.rgb_texture = self._create_texture(textureID=self.rgb_texture, texture_size=self.capacity, filter=self._get_filter())
 
     @staticmethod
-    def _create_texture(textureID=None, texture_size=None):
+    def _create_texture(textureID=None, texture_size=None, filter=gl.GL_NEAREST):
         # create a texture for Rendering Color
         if textureID is not None:
             rgb_texture = textureID
@@ -88,13 +140,14 @@ class GuiInternalBuffer(object):
         gl.glActiveTexture(gl.GL_TEXTURE0)
 
         gl.glBindTexture(gl.GL_TEXTURE_2D, rgb_texture)
+        StateCache.invalidate_texture()
 
         gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
         gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
 
         gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, width, height, 0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, None)
-        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
-        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, filter)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, filter)
 
         return rgb_texture
 
@@ -103,39 +156,41 @@ class GuiInternalBuffer(object):
 
         gl.glBindFramebufferEXT(gl.GL_FRAMEBUFFER_EXT, self._buffer)
 
-        gl.glPushAttrib(gl.GL_VIEWPORT_BIT)
-        gl.glViewport(0, 0, *self.render_target_size)
+        x, y = self.position
+        pixel_width, pixel_height = self.pixel_size
+
+        renderer = GetRenderer()
+        renderer.begin_target(x, y, pixel_width/self.scale, pixel_height/self.scale, self.scale)
+
+        if self.clip_region is not None:
+            renderer.push_clip(*self.clip_region)
 
-        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+        renderer.clear()
 
     # stop rendering to this framebuffer
     def deactivate(self, *args):
 
         gl.glBindFramebufferEXT(gl.GL_FRAMEBUFFER_EXT, 0)
-        gl.glPopAttrib()
+
+        renderer = GetRenderer()
+        if self.clip_region is not None:
+            renderer.pop_clip()
+        renderer.end_target()
 
     __enter__ = activate
     __exit__ = deactivate
 
     def render(self):
 
-        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, self.rgb_texture)
-        gl.glEnable(gl.GL_TEXTURE_2D)
-
-        width, height = self.render_target_size
+        StateCache.blend_func(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
 
-        gl.glColor4f(1.0,1.0,1.0,1.0)
+        x, y = self.position
+        pixel_width, pixel_height = self.pixel_size
+        capacity_width, capacity_height = self.capacity
 
-        gl.glBegin(gl.GL_QUADS)
-        gl.glTexCoord2f(0.0, 0.0) ; gl.glVertex3f(0, 0, 0)
-        gl.glTexCoord2f(1.0, 0.0) ; gl.glVertex3f(width, 0, 0)
-        gl.glTexCoord2f(1.0, 1.0) ; gl.glVertex3f(width , height, 0)
-        gl.glTexCoord2f(0.0, 1.0) ; gl.glVertex3f(0, height, 0)
-        gl.glEnd()
-
-        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
-        gl.glDisable(gl.GL_TEXTURE_2D)
+        GetRenderer().draw_texture(self.rgb_texture, x, y,
+                                   pixel_width/self.scale, pixel_height/self.scale,
+                                   pixel_width/capacity_width, pixel_height/capacity_height)
 
     def delete(self):
         '''
@@ -144,3 +199,27 @@ class GuiInternalBuffer(object):
         gl.glDeleteFramebuffersEXT(1, [self._buffer])
         gl.glDeleteTextures(1, [self.rgb_texture])
         self._buffer = None
+
+class GuiDialogBuffer(GuiInternalBuffer):
+    '''
+    Offscreen render target caching the image of a single Dialog.
+    The target only covers the dialog bounds and is composited back
+    at the dialog position by GuiManager.
+    '''
+    def __init__(self, x, y, width, height, scale=1.0):
+        self.position = x, y
+        GuiInternalBuffer.__init__(self, max(width, 1), max(height, 1), scale=scale)
+
+    def set_bounds(self, x, y, width, height):
+        '''
+        Move and resize the target to the given screen rectangle.
+
+        @return True if the target was resized and its content is stale.
+        '''
+        self.position = x, y
+        size = (max(width, 1), max(height, 1))
+
+        if size != self.render_target_size:
+            self.resize(size)
+            return True
+        return False
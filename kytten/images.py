@@ -9,6 +9,9 @@ from .compat import *
 import pyglet
 import json
 import os
+import weakref
+from collections import OrderedDict
+from .atlas import AtlasPage
 
 def  LoadImage(filepath, *args, **kwargs):
     """
@@ -26,8 +29,26 @@ def  LoadImage(filepath, *args, **kwargs):
         - content_padding : minimum internal padding around content. [left, right, top, bottom]
         - border_padding : used for the 9-patches formatting. [left, right, top, bottom]
     """
-    image = pyglet.image.load(filepath, *args, **kwargs).get_texture()
+    return _make_texture(pyglet.image.load(filepath, *args, **kwargs), filepath)
 
+def _make_texture(source, filepath):
+    # Texture of an image loaded from filepath, with kytten attributes
+    image = source.get_texture()
+    _set_image_attributes(image, _load_image_info(filepath))
+    return image
+
+def _load_image_info(filepath):
+    # Parse image info if present to override image attributes
+    try:                 # strip extension
+        info_file= open(os.path.splitext(filepath)[0]+'.info', 'rb')
+    except IOError:
+        return {}
+    else:
+        image_attributes = json.loads(info_file.read().decode("utf-8"))
+        info_file.close()
+        return image_attributes
+
+def _set_image_attributes(image, image_attributes):
     s0,t0,_, s1,t0,_, s1, t1, _, s0, t1, _ =  image.tex_coords
 
     #bottom-left, top-right opengl texture coordinates wich is different from pyglet texture 'tex_coords' (12 float tuple)
@@ -38,14 +59,122 @@ def  LoadImage(filepath, *args, **kwargs):
     image.content_padding=(0,0,0,0)
     image.header_bar=(0,0,None,None)
 
-    # Parse image info if present to override image attributes
-    try:                 # strip extension
-        info_file= open(os.path.splitext(filepath)[0]+'.info', 'rb')
-    except IOError:
-        pass
-    else:
-        image_attributes = json.loads(info_file.read().decode("utf-8"))
-        for attribute, value in image_attributes.items():
-            setattr(image,attribute,value)
-    return image
+    for attribute, value in image_attributes.items():
+        setattr(image,attribute,value)
+
+class CachedImage(object):
+    '''
+    Image packed in an ImageCache page. Exposes the same attributes as
+    images returned by LoadImage (id, target, width, height, tex_coords,
+    texcoords, size, border_padding, content_padding, header_bar), id
+    being the one of the shared page texture.
+    '''
+    def __init__(self, region, image_attributes):
+        self.id = region.id
+        self.target = region.target
+        self.width = region.width
+        self.height = region.height
+        self.tex_coords = region.tex_coords
+        _set_image_attributes(self, image_attributes)
+
+    def get_texture(self, *args, **kwargs):
+        return self
+
+class ImageCache(object):
+    '''
+    Opt-in alternative to LoadImage, packing small images in a few shared
+    texture pages so widgets showing them are drawn with a single texture
+    bind per page.
+
+    When all pages are full, the least recently loaded images that are no
+    longer used anywhere are evicted to make room. If nothing can be
+    evicted, or the image is larger than max_image_size, it gets its own
+    texture as with LoadImage.
+
+    Usage:
+        cache = kytten.ImageCache()
+        icon = cache.load('images/sword.png')
+    '''
+    def __init__(self, page_size=512, max_pages=4, max_image_size=128, padding=1):
+        '''
+        @param page_size Width and height of texture pages
+        @param max_pages Maximum number of texture pages
+        @param max_image_size Images larger than this in any dimension are
+                              not packed
+        @param padding Number of edge pixels repeated around each image
+        '''
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.max_image_size = min(max_image_size, page_size - 2*padding)
+        self.padding = padding
+        self.pages = []
+
+        # filepath -> (page, region, image attributes), least recently used first
+        self._slots = OrderedDict()
+        # filepath -> CachedImage still referenced by the application
+        self._images = weakref.WeakValueDictionary()
+
+    def load(self, filepath, *args, **kwargs):
+        '''
+        Returns the image at filepath, loading and packing it if needed.
+        Extra arguments are passed to pyglet.image.load.
+        '''
+        image = self._images.get(filepath)
+        if image is not None:
+            self._touch(filepath)
+            return image
+
+        slot = self._slots.get(filepath)
+        if slot is not None:
+            self._touch(filepath)
+        else:
+            source = pyglet.image.load(filepath, *args, **kwargs)
+            # Images we cannot pack get their own texture, as with LoadImage
+            if source.width > self.max_image_size or source.height > self.max_image_size:
+                return _make_texture(source, filepath)
+
+            slot = self._pack(source)
+            if slot is None:
+                return _make_texture(source, filepath)
+
+            slot = self._slots[filepath] = slot + (_load_image_info(filepath),)
+
+        page, region, image_attributes = slot
+        image = self._images[filepath] = CachedImage(region, image_attributes)
+        return image
+
+    def evict(self, filepath):
+        '''
+        Drop an image from the cache. Its area may be reused by the next
+        loaded images, so it must not be displayed anymore.
+        '''
+        self._images.pop(filepath, None)
+        page, region, _ = self._slots.pop(filepath)
+        page.remove(region)
+
+    def _touch(self, filepath):
+        self._slots[filepath] = self._slots.pop(filepath)
+
+    def _pack(self, source):
+        for page in self.pages:
+            region = page.add(source)
+            if region is not None:
+                return page, region
+
+        if len(self.pages) < self.max_pages:
+            page = AtlasPage(self.page_size, self.page_size, self.padding)
+            self.pages.append(page)
+            return page, page.add(source)
+
+        for filepath in list(self._slots):
+            if filepath in self._images:
+                continue
+
+            page = self._slots[filepath][0]
+            self.evict(filepath)
+            region = page.add(source)
+            if region is not None:
+                return page, region
+
+        return None
 
@@ -0,0 +1,253 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# kytten/latency.py
+# Copyrighted (C) 2013 by "Parashurama"
+'''
+Input latency tracing, enabled with GuiManager.enable_latency_tracing.
+
+Input events are stamped when the window dispatches them. At the next gui
+update, events are attributed to the dialogs they invalidated (to_refresh
+or needs_layout set since the event); events invalidating nothing have no
+visible effect and are only counted as dropped. Each attributed event then
+goes through three phases, all measured from the event itself:
+    - 'update' : the gui update which picked up its effect started
+    - 'layout' : its dialogs are laid out
+    - 'draw'   : one of its dialogs was drawn by GuiManager.Render (draw
+                 calls issued, the buffer swap is not included)
+Times are collected in histograms, per event type and for all events.
+'''
+from __future__ import unicode_literals, print_function, absolute_import, division
+from .compat import *
+import time
+import weakref
+from bisect import bisect_left
+from collections import deque
+
+TRACED_EVENTS = frozenset(['on_mouse_press', 'on_mouse_release', 'on_mouse_motion', 'on_mouse_drag',
+                           'on_mouse_scroll', 'on_key_press', 'on_key_release',
+                           'on_text', 'on_text_motion', 'on_text_motion_select'])
+
+PHASES = ('update', 'layout', 'draw')
+
+# Upper bounds of histogram bins, in milliseconds
+HISTOGRAM_BINS = (1, 2, 4, 8, 12, 16, 25, 33, 50, 66, 100, 200, 500, 1000)
+
+class LatencyHistogram(object):
+    '''
+    Counts of latencies in fixed bins, plus an overflow bin for latencies
+    above the last bound.
+    '''
+    def __init__(self, bins=HISTOGRAM_BINS):
+        '''
+        @param bins Increasing upper bounds of the bins in milliseconds
+        '''
+        self.bins = tuple(bins)
+        self.reset()
+
+    def reset(self):
+        self.counts = [0]*(len(self.bins)+1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(self.bins, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        '''
+        Returns the upper bound of the bin containing the given percentile
+        (the maximum latency for the overflow bin), 0 if empty.
+        '''
+        if not self.count:
+            return 0.0
+
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                break
+        return self.bins[index] if index < len(self.bins) else self.max
+
+    def format(self, width=40):
+        '''
+        Returns the histogram as text, one line per bin.
+        '''
+        largest = max(self.counts) or 1
+        lines = []
+        for index, count in enumerate(self.counts):
+            if index < len(self.bins):
+                label = "<= {:>4} ms".format(self.bins[index])
+            else:
+                label = " > {:>4} ms".format(self.bins[-1])
+            lines.append("{} {:>6} {}".format(label, count, '#'*int(count*width/largest)))
+        return '\n'.join(lines)
+
+class LatencyRecord(object):
+    '''
+    One traced input event. Phase times are in seconds since the event,
+    None until reached.
+    '''
+    __slots__ = ('event_type', 'time', 'dialogs', 'dialog', 'control', 'update', 'layout', 'draw')
+
+    def __init__(self, event_type, time):
+        self.event_type = event_type
+        self.time = time
+        self.dialogs = ()
+        self.dialog = None
+        self.control = None
+        self.update = self.layout = self.draw = None
+
+class LatencyTracer(object):
+    '''
+    Follows input events until the frame showing their effect is drawn.
+    '''
+    def __init__(self, bins=HISTOGRAM_BINS, history=120, callback=None):
+        '''
+        @param bins Histogram bins upper bounds in milliseconds
+        @param history Number of finished records kept in recent
+        @param callback Optional function called with each finished record
+        '''
+        self.bins = bins
+        self.histograms = {}
+        self.recent = deque(maxlen=history)
+        self.callbacks = []
+        self.dropped = 0
+        self._pending = []
+        self._in_flight = []
+        self._states = None
+
+        if callback is not None:
+            self.add_callback(callback)
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self.callbacks.remove(callback)
+
+    def get_histogram(self, phase='draw', event_type=None):
+        '''
+        Returns the histogram of a phase for an event type, or for all
+        events if event_type is None.
+        '''
+        key = (event_type, phase)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram(self.bins)
+        return histogram
+
+    def get_summary(self):
+        '''
+        Returns {event_type: {phase: (count, mean, p50, p95, max)}} in
+        milliseconds, with all events under None.
+        '''
+        summary = {}
+        for (event_type, phase), histogram in self.histograms.items():
+            summary.setdefault(event_type, {})[phase] = (histogram.count, histogram.mean,
+                                                         histogram.percentile(50),
+                                                         histogram.percentile(95), histogram.max)
+        return summary
+
+    def reset(self):
+        self.histograms.clear()
+        self.recent.clear()
+        self.dropped = 0
+
+    def _add(self, record, phase, now):
+        elapsed = now - record.time
+        setattr(record, phase, elapsed)
+        self.get_histogram(phase).add(elapsed*1000)
+        self.get_histogram(phase, record.event_type).add(elapsed*1000)
+
+    def _get_states(self, dialogs):
+        return dict((id(dialog), (dialog.to_refresh, dialog.needs_layout)) for dialog in dialogs)
+
+    def stamp(self, event_type, dialogs):
+        '''
+        Record an input event received by the window.
+        '''
+        if not self._pending:
+            self._states = self._get_states(dialogs)
+        self._pending.append(LatencyRecord(event_type, time.time()))
+
+    def attribute(self, dialogs):
+        '''
+        Attribute the events received since last gui update to the dialogs
+        they invalidated. Called once pending input is delivered.
+        '''
+        pending = self._pending
+        if not pending:
+            return
+
+        states = self._states
+        consumers = []
+        for dialog in dialogs:
+            to_refresh, needs_layout = states.get(id(dialog), (False, False))
+            if (dialog.to_refresh and not to_refresh) or (dialog.needs_layout and not needs_layout):
+                consumers.append(dialog)
+
+        self._pending = []
+        self._states = None
+        if not consumers:
+            self.dropped += len(pending)
+            return
+
+        now = time.time()
+        dialog = consumers[0]
+        control = dialog.focus if dialog.focus is not None else dialog.hover
+        dialog_name = dialog.name or repr(dialog)
+        control_name = (control.name or repr(control)) if control is not None else None
+
+        refs = tuple(weakref.ref(dialog) for dialog in consumers)
+        for record in pending:
+            record.dialogs = refs
+            record.dialog = dialog_name
+            record.control = control_name
+            self._add(record, 'update', now)
+        self._in_flight.extend(pending)
+
+    def laid_out(self):
+        '''
+        Called at the end of a gui update: events whose dialogs don't need
+        a layout anymore reach the 'layout' phase.
+        '''
+        now = None
+        for record in self._in_flight:
+            if record.layout is None:
+                dialogs = [ref() for ref in record.dialogs]
+                if not any(dialog is not None and dialog.needs_layout for dialog in dialogs):
+                    now = now or time.time()
+                    self._add(record, 'layout', now)
+
+    def drawn(self, dialog=None):
+        '''
+        Called after drawing a dialog, or every dialog if dialog is None.
+        Events laid out and waiting for it are finished.
+        '''
+        in_flight = self._in_flight
+        if not in_flight:
+            return
+
+        now = time.time()
+        waiting = []
+        for record in in_flight:
+            dialogs = [ref() for ref in record.dialogs]
+            dialogs = [d for d in dialogs if d is not None]
+            if record.layout is not None and (dialog is None or not dialogs or
+                                              any(d is dialog for d in dialogs)):
+                self._add(record, 'draw', now)
+                self.recent.append(record)
+                for callback in self.callbacks:
+                    callback(record)
+            else:
+                waiting.append(record)
+        self._in_flight = waiting
@@ -18,11 +18,11 @@ import pyglet
 import weakref
 from pyglet import gl
 
-from .widgets import Widget, Control, Spacer, Graphic, Image, ProxyImage, Label, LayoutAssert, FreeLayoutAssert, DragNDropLayoutType
+from .widgets import SizeWidget, LayoutWidget, Widget, Control, Spacer, Graphic, Image, ProxyImage, Label, LayoutAssert, FreeLayoutAssert, ScrollableAssert, DragNDropLayoutType
 from .button import ImageButton
-from .base import ReferenceName, Log, GetObjectfromName, CVars, FLAGS
+from .base import ReferenceName, Log, GetObjectfromName, CVars, FLAGS, Placement
 from .override import KyttenEventDispatcher
-from .theme import DefaultTextureGraphicElement
+from .theme import DefaultTextureGraphicElement, SharedQuadList
 
 # GUI layout constants
 
@@ -65,7 +65,8 @@ def GetRelativePoint(parent, parent_anchor, child, child_anchor, offset):
     else: # HALIGN_RIGHT
         x = parent.x + parent.width
 
-    valign, halign = child_anchor or (valign, halign)
+    if child_anchor:
+        valign, halign = child_anchor
     offset_x, offset_y = offset
 
     if valign == VALIGN_TOP:
@@ -116,14 +117,12 @@ class VerticalLayout(Widget,LayoutAssert):
 
         self.expandable = []
 
-    def _get_controls(self):
+    def _collect_controls(self, controls):
         '''
-        Returns Controls within the layout.
+        Appends Controls within the layout.
         '''
-        controls = []
         for item in self.content:
-            controls += item._get_controls()
-        return controls
+            item._collect_controls(controls)
 
     def add(self, item, position=None):
         '''
@@ -140,8 +139,27 @@ class VerticalLayout(Widget,LayoutAssert):
             self.content.insert(position, ITEM)
             self.content_cache.insert(position, ITEM)
 
-        if self.saved_dialog is not None:
-            self.saved_dialog.set_needs_layout()
+        self.invalidate_layout()
+
+    def extend(self, items, position=None):
+        '''
+        Adds several Widgets to the layout, with a single layout request.
+
+        @param items The Widgets to be added
+        @param position Index of the first Widget added, or None to append
+        '''
+        items = [item or Spacer() for item in items]
+        for item in items:
+            item._parent=weakref.proxy(self)
+
+        if position is None:
+            self.content.extend(items)
+            self.content_cache.extend(items)
+        else:
+            self.content[position:position] = items
+            self.content_cache[position:position] = items
+
+        self.invalidate_layout()
 
     def Show(self):
 
@@ -167,6 +185,9 @@ class VerticalLayout(Widget,LayoutAssert):
 
     _hide = Hide
 
+    def _has_child(self, item):
+        return any(x is item for x in self.content)
+
     def _destroy_obj(self, item):
 
         try:self.content.remove(item)
@@ -231,8 +252,7 @@ class VerticalLayout(Widget,LayoutAssert):
             item = self.content_cache[position]
 
         item.delete()
-        if self.saved_dialog is not None:
-            self.saved_dialog.set_needs_layout()
+        self.invalidate_layout()
 
         index=self.content_cache.index(item)
 
@@ -264,17 +284,17 @@ class VerticalLayout(Widget,LayoutAssert):
         top = y + self.height
         if self.align == HALIGN_RIGHT:
             for item in self.content:
-                item.layout(x + self.width - item.width,
-                                top - item.height)
+                LayoutWidget(item, x + self.width - item.width,
+                                   top - item.height)
                 top -= item.height + self.padding
         elif self.align == HALIGN_CENTER:
             for item in self.content:
-                item.layout(x + self.width//2 - item.width//2,
-                                top - item.height)
+                LayoutWidget(item, x + self.width//2 - item.width//2,
+                                   top - item.height)
                 top -= item.height + self.padding
         else: # HALIGN_LEFT
             for item in self.content:
-                item.layout(x, top - item.height)
+                LayoutWidget(item, x, top - item.height)
                 top -= item.height + self.padding
 
     def set_content(self, content):
@@ -313,13 +333,17 @@ class VerticalLayout(Widget,LayoutAssert):
 
         width = self.minwidth
 
+        # Reuse the expandable list, layouts are sized on every layout
+        expandable = self.expandable
+        del expandable[:]
         for item in self.content:
-            item.size(dialog, scale)
+            SizeWidget(item, dialog, scale)
 
             height += item.height + self.padding
             width = max(width, item.width)
+            if item.is_expandable(1):
+                expandable.append(item)
         self.width, self.height = width, height                     #HEIGHT
-        self.expandable = [x for x in self.content if x.is_expandable(1)]
 
     def clear(self):
         for item in self.content_cache[:]:
@@ -387,15 +411,15 @@ class HorizontalLayout(VerticalLayout):
         left = x
         if self.align == VALIGN_TOP:
             for item in self.content:
-                item.layout(left, y + self.height - item.height)
+                LayoutWidget(item, left, y + self.height - item.height)
                 left += item.width + self.padding
         elif self.align == VALIGN_CENTER:
             for item in self.content:
-                item.layout(left, y + self.height//2 - item.height//2)
+                LayoutWidget(item, left, y + self.height//2 - item.height//2)
                 left += item.width + self.padding
         else: # VALIGN_BOTTOM
             for item in self.content:
-                item.layout(left, y)
+                LayoutWidget(item, left, y)
                 left += item.width + self.padding
 
     def size(self, dialog, scale):
@@ -412,12 +436,225 @@ class HorizontalLayout(VerticalLayout):
             width = 0
         else:
             width = -self.padding
+        expandable = self.expandable
+        del expandable[:]
         for item in self.content:
-            item.size(dialog, scale)
+            SizeWidget(item, dialog, scale)
             height = max(height, item.height)
             width += item.width + self.padding
+            if item.is_expandable(0):
+                expandable.append(item)
         self.width, self.height = width, height                     #width
-        self.expandable = [x for x in self.content if x.is_expandable(0)]
+
+class VirtualList(Widget, LayoutAssert):
+    '''
+    VirtualList is a vertical list of rows of the same height, for lists
+    too long to create a Widget per row.  Only the rows visible through
+    its Scrollable parent, plus a few overscan rows above and below, exist
+    as Widgets: they are created by a factory, bound to the index of the
+    row they show by a binder, and bound again to other rows as the list
+    is scrolled.  Outside of a Scrollable, every row exists.
+    '''
+    def __init__(self, count=0, factory=None, binder=None, row_height=None,
+                 minwidth=0, padding=0, align=HALIGN_LEFT, overscan=4, name=None, group=None):
+        '''
+        Creates a new VirtualList.
+
+        @param count Number of rows
+        @param factory Function returning a new row Widget
+        @param binder Function called with a row Widget and the index of
+                      the row it shows.  It updates the Widget in place,
+                      the row is sized and laid out by the list.
+        @param row_height Height of the rows, or None to use the height of
+                          the first row sized
+        @param minwidth Minimum width; the list is as wide as the widest
+                        row sized so far
+        @param padding This amount of padding is inserted between rows
+        @param align Horizontal alignment of the rows
+        @param overscan Number of rows kept above and below the visible
+                        ones
+        '''
+        Widget.__init__(self, name=name, group=group)
+        self.count = count
+        self.factory = factory
+        self.binder = binder
+        self.row_height = row_height
+        self.minwidth = minwidth
+        self.padding = padding
+        self.align = align
+        self.overscan = overscan
+
+        self.rows = {}          # index of the row shown: Widget
+        self.unbound_rows = []  # Widgets to bind again on next layout
+        self.free_rows = []     # Widgets without graphics, ready for reuse
+        self.visible_range = (0, 0)
+        self.row_width = 0
+        self._row_estimate = None
+        self._row_context = None
+
+    def _collect_controls(self, controls):
+        '''
+        Appends Controls within the rows shown.
+        '''
+        for index in range(*self.visible_range):
+            row = self.rows.get(index)
+            if row is not None:
+                row._collect_controls(controls)
+
+    def _has_child(self, item):
+        return any(row is item for row in self.rows.values())
+
+    def _bind_rows(self, first, last):
+        '''
+        Makes the rows from first to last exist, binding the Widgets of
+        rows out of the range to them first.
+        '''
+        rows = self.rows
+        released, self.unbound_rows = self.unbound_rows, []
+        for index in [index for index in rows if index < first or index >= last]:
+            released.append(rows.pop(index))
+
+        for index in range(first, last):
+            if index not in rows:
+                if released:
+                    row = released.pop()
+                elif self.free_rows:
+                    row = self.free_rows.pop()
+                else:
+                    row = self.factory()
+                    row._parent=weakref.proxy(self)
+                self.binder(row, index)
+                rows[index] = row
+
+        for row in released:
+            row.delete()
+            self.free_rows.append(row)
+
+    def delete(self):
+        '''Deletes all graphic elements of the rows.'''
+        for row in self.rows.values():
+            row.delete()
+        for row in self.unbound_rows:
+            row.delete()
+
+        Widget.delete(self)
+
+    def get_row_height(self):
+        '''
+        Returns the height of the rows, estimated from the first row sized
+        if not given.
+        '''
+        if self.row_height is not None:
+            return self.row_height
+        return self._row_estimate or 0
+
+    def get_visible_range(self):
+        '''
+        Returns the (first, last + 1) indexes of the rows visible through
+        our Scrollable parent, with overscan.
+        '''
+        count = self.count
+        scrollable = self.scrollable_parent
+        stride = self.get_row_height() + self.padding
+        if not isinstance(scrollable, ScrollableAssert) or stride <= 0:
+            return 0, count
+
+        view_bottom = scrollable.content_y / scrollable.scale
+        view_top = (scrollable.content_y + scrollable.ct_view_height) / scrollable.scale
+        top = self.y + self.height
+
+        first = min(max(int((top - view_top) // stride) - self.overscan, 0), count)
+        last = max(min(int((top - view_bottom) // stride) + 1 + self.overscan, count), first)
+        return first, last
+
+    def layout(self, x, y):
+        '''
+        Binds the rows now visible, and lays them out from top to bottom.
+
+        @param x X coordinate of the lower left corner
+        @param y Y coordinate of the lower left corner
+        '''
+        Widget.layout(self, x, y)
+        if self._row_context is None:
+            return
+
+        first, last = self.visible_range = self.get_visible_range()
+        self._bind_rows(first, last)
+
+        dialog, scale = self._row_context
+        stride = self.get_row_height() + self.padding
+        top = y + self.height - first * stride
+        row_width = self.row_width
+        for index in range(first, last):
+            row = self.rows[index]
+            SizeWidget(row, dialog, scale)
+            # Rows wider than us widen the list from the next layout
+            self.row_width = max(self.row_width, row.width)
+            if row.is_expandable() and row.width < self.width:
+                row.expand(self.width, row.height)
+
+            if self.align == HALIGN_RIGHT:
+                LayoutWidget(row, x + self.width - row.width, top - row.height)
+            elif self.align == HALIGN_CENTER:
+                LayoutWidget(row, x + self.width//2 - row.width//2, top - row.height)
+            else: # HALIGN_LEFT
+                LayoutWidget(row, x, top - row.height)
+            top -= stride
+
+        if self.row_width > row_width and self.saved_dialog is not None:
+            self.saved_dialog.set_needs_layout()
+
+    def refresh(self):
+        '''
+        Binds the rows shown again, after their data changed.
+        '''
+        self.unbound_rows.extend(self.rows.values())
+        self.rows.clear()
+
+        if self.saved_dialog is not None:
+            self.saved_dialog.set_needs_layout()
+
+    def set_count(self, count):
+        '''
+        Sets a new number of rows; the rows shown are bound again.
+
+        @param count Number of rows
+        '''
+        self.count = count
+        self.refresh()
+
+    def size(self, dialog, scale):
+        '''
+        Calculates size of the list from the number of rows; rows are sized
+        when laid out.
+
+        @param dialog The Dialog which contains the list
+        '''
+        if dialog is None:
+            return
+        Widget.size(self, dialog, scale)
+        self._row_context = (dialog, scale)
+
+        if self.row_height is None and self._row_estimate is None and self.count:
+            if not self.rows:
+                self._bind_rows(0, 1)
+            row = self.rows[min(self.rows)]
+            SizeWidget(row, dialog, scale)
+            self._row_estimate = row.height
+            self.row_width = max(self.row_width, row.width)
+
+        self.width = max(self.minwidth, self.row_width)
+        self.height = self.count * self.get_row_height() + max(self.count - 1, 0) * self.padding
+
+    def teardown(self):
+        for row in list(self.rows.values()) + self.unbound_rows + self.free_rows:
+            row.teardown()
+        self.rows.clear()
+        del self.unbound_rows[:]
+        del self.free_rows[:]
+        self.factory = self.binder = None
+        self._row_context = None
+        Widget.teardown(self)
 
 class GridLayout(Widget, LayoutAssert):
     '''
@@ -430,6 +667,7 @@ class GridLayout(Widget, LayoutAssert):
     that Widgets are centered within cells.
     '''
     offset = (0,0)
+    _placement = None
     def __init__(self, content=[[]], anchor=ANCHOR_TOP_LEFT, padding=5, separator=None, name=None, group=None):
         '''
         Defines a new GridLayout.
@@ -461,16 +699,24 @@ class GridLayout(Widget, LayoutAssert):
                     item._parent=weakref.proxy(self)
                     self._item_ref[item] = (i, j)
 
-    def _get_controls(self):
+    def _collect_controls(self, controls):
         '''
-        Returns Controls within the layout.
+        Appends Controls within the layout.
         '''
-        controls = []
         for row in self.content:
             for cell in row:
                 if cell is not None:
-                    controls += cell._get_controls()
-        return controls
+                    cell._collect_controls(controls)
+
+    def _has_child(self, item):
+        if item not in self._item_ref:
+            return False
+
+        row_id, index = self._item_ref[item]
+        try:
+            return self.content[row_id][index] is item or None
+        except IndexError:
+            return None
 
     def _destroy_obj(self, item):
         '''
@@ -582,6 +828,24 @@ class GridLayout(Widget, LayoutAssert):
 
         @param row An array of widgets, or None for cells without widgets
         '''
+        self._add_row(row)
+
+        if self.saved_dialog is not None:
+            self.saved_dialog.set_needs_layout()
+
+    def add_rows(self, rows):
+        '''
+        Adds several rows to the layout, with a single layout request.
+
+        @param rows An array of rows, as given to add_row
+        '''
+        for row in rows:
+            self._add_row(row)
+
+        if self.saved_dialog is not None:
+            self.saved_dialog.set_needs_layout()
+
+    def _add_row(self, row):
         assert isinstance(row, (tuple,list))
         row_id = len(self.content_cache)
         self.content.append(list(row))
@@ -591,9 +855,7 @@ class GridLayout(Widget, LayoutAssert):
         for column_id, cell in enumerate(row):
             if cell is not None:
                 self._item_ref[cell] = (row_id,column_id)
-
-        if self.saved_dialog is not None:
-            self.saved_dialog.set_needs_layout()
+                cell._parent=weakref.proxy(self)
 
     def get(self, column, row):
         '''
@@ -614,7 +876,9 @@ class GridLayout(Widget, LayoutAssert):
         '''
         Widget.layout(self, x, y)
 
-        placement = Widget()
+        placement = self._placement
+        if placement is None:
+            placement = self._placement = Placement()
         placement.y = y + self.height
         for row_index, row in enumerate(self.content):
             placement.x = x
@@ -626,7 +890,7 @@ class GridLayout(Widget, LayoutAssert):
                 if cell is not None:
                     if cell.is_expandable():
                         cell.expand(placement.width, placement.height)
-                    cell.layout(*GetRelativePoint(placement, cell.anchor or self.anchor, cell, cell.anchor, self.offset))
+                    LayoutWidget(cell, *GetRelativePoint(placement, cell.anchor or self.anchor, cell, cell.anchor, self.offset))
                 placement.x += placement.width
 
         sy = y + self.height
@@ -634,8 +898,6 @@ class GridLayout(Widget, LayoutAssert):
             sy-= self.max_heights[row_index]
             sep.update(x, sy-self.separator.height//2, self.width, self.separator.height)
 
-        placement.teardown()
-
     def set(self, column_id, row_id, item):
         '''
         Sets the content of a cell within the grid.
@@ -691,7 +953,7 @@ class GridLayout(Widget, LayoutAssert):
 
             for col_index, cell in enumerate(row):
                 if cell is not None:
-                    cell.size(dialog, scale)
+                    SizeWidget(cell, dialog, scale)
                     width, height = cell.width, cell.height
                 else:
                     width = height = 0
@@ -729,7 +991,37 @@ class GridLayout(Widget, LayoutAssert):
         Widget.teardown(self)
 
 
-class PaletteLayout(GridLayout):
+class SharedImageLayoutType(object):
+    '''
+    Mixin for layouts holding many Image widgets (slots, palettes): their
+    direct Image and ProxyImage children are drawn from one vertex list
+    per texture, updated in place on layout, instead of one vertex list
+    each.
+    '''
+    _shared_quads = None
+
+    def _get_shared_quads(self, texture, dialog):
+        if self._shared_quads is None:
+            self._shared_quads = {}
+
+        key = (texture.id, texture.target)
+        quads = self._shared_quads.get(key)
+        if quads is None:
+            quads = self._shared_quads[key] = SharedQuadList(texture, dialog.batch, dialog.bg_group)
+        return quads
+
+    def _flush_shared_quads(self):
+        if self._shared_quads is not None:
+            for quads in self._shared_quads.values():
+                quads.flush()
+
+    def _delete_shared_quads(self):
+        if self._shared_quads is not None:
+            for quads in self._shared_quads.values():
+                quads.delete()
+            self._shared_quads = None
+
+class PaletteLayout(GridLayout, SharedImageLayoutType):
     def __init__(self, content, width, *args, **kwargs):
 
         grid_content = [ content[i:i + width] for i in range(0, len(content), width) ]
@@ -745,6 +1037,14 @@ class PaletteLayout(GridLayout):
             else:
                 self.set(len(ROW), len(self.content_cache)-1, widget)
 
+    def layout(self, x, y):
+        GridLayout.layout(self, x, y)
+        self._flush_shared_quads()
+
+    def delete(self):
+        GridLayout.delete(self)
+        self._delete_shared_quads()
+
 
 
 class FreeLayout(Spacer, FreeLayoutAssert):
@@ -781,12 +1081,10 @@ class FreeLayout(Spacer, FreeLayoutAssert):
         for anchor, offset_x, offset_y, widget in self.content:
             widget._parent=weakref.proxy(self)
 
-    def _get_controls(self):
-        '''Returns controls within the FreeLayout'''
-        controls = []
+    def _collect_controls(self, controls):
+        '''Appends controls within the FreeLayout'''
         for anchor, x, y, item in self.content:
-            controls += item._get_controls()
-        return controls
+            item._collect_controls(controls)
 
     def set(self, widget, position=None ):
         if isinstance(widget, tuple):
@@ -842,6 +1140,22 @@ class FreeLayout(Spacer, FreeLayoutAssert):
         if self.saved_dialog is not None:
             self.saved_dialog.set_needs_layout()
 
+    def add_many(self, content):
+        '''
+        Adds several Widgets to the FreeLayout, with a single layout request.
+
+        @param content A list of placement/Widget tuples, as given to the
+                       FreeLayout constructor
+        '''
+        content = [tuple(WIDGET) for WIDGET in content]
+        for anchor, x, y, widget in content:
+            widget._parent=weakref.proxy(self)
+
+        self.content.extend( content )
+        self.content_cache.extend( content )
+        if self.saved_dialog is not None:
+            self.saved_dialog.set_needs_layout()
+
     def layout(self, x, y):
         '''
         Lays out Widgets within the FreeLayout.  We make no attempt to
@@ -979,7 +1293,7 @@ class FreeForm(FreeLayout, DragNDropLayoutType):
         return self.content_cache[position][3]
 
 
-class InteractiveLayout(HorizontalLayout, DragNDropLayoutType):
+class InteractiveLayout(HorizontalLayout, DragNDropLayoutType, SharedImageLayoutType):
     def __init__(self, content=[], *args, **kwargs):
 
         image = kwargs.pop('default_slot')
@@ -1068,11 +1382,16 @@ class InteractiveLayout(HorizontalLayout, DragNDropLayoutType):
         HorizontalLayout.teardown(self)
         self.default_slot=None
 
+    def delete(self):
+        HorizontalLayout.delete(self)
+        self._delete_shared_quads()
+
     def layout(self, x, y):
 
         if self.saved_dialog is not None:
             self.saved_dialog.drag_n_drop_layouts.append(self)
         HorizontalLayout.layout(self, x, y)
+        self._flush_shared_quads()
 
     def validate_drop_widget(self, widget, pos):
         x,y=pos
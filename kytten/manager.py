@@ -6,28 +6,133 @@
 from __future__ import unicode_literals, print_function, absolute_import, division
 from .compat import *
 import weakref
+import time
 import pyglet
-from .glcontext import GuiInternalBuffer, GuiRenderContext
+import pyglet.gl as gl
+from .glcontext import GuiInternalBuffer, GuiDialogBuffer, GuiRenderContext
 from .base import internals, GetActiveDialogs, GetObjectfromName
 from .dialog import PatchWindowsEventHandler
+from .renderer import GetRenderer, StateCache, TEXTURE_NONE
+from .profiler import GuiProfiler
+from .latency import LatencyTracer, HISTOGRAM_BINS, TRACED_EVENTS
+from .tools import patch_instance_method
+
+def DrawGroupTree(batch, group):
+    '''
+    Draw only the vertex lists of a batch belonging to group or to one
+    of its children, in the same order the batch itself would use.
+
+    @param batch The Batch holding the vertex lists
+    @param group The root of the group tree to draw
+    '''
+    group.set_state()
+
+    domain_map = batch.group_map.get(group)
+    if domain_map:
+        for (formats, mode, indexed), domain in list(domain_map.items()):
+            if not domain._is_empty():
+                domain.draw(mode)
+
+    children = batch.group_children.get(group)
+    if children:
+        for child in sorted(children):
+            DrawGroupTree(batch, child)
+
+    group.unset_state()
+
+def GetDialogZOrder(dialog):
+    '''
+    Sort key placing dialogs in drawing order (bottom-most first).
+    '''
+    parent = dialog.root_group.parent
+    return (getattr(parent, 'order', 0), dialog.root_group.real_order)
+
+def GetLayoutPriority(dialog):
+    '''
+    Sort key placing dialogs in layout order (visible and top-most last).
+    '''
+    return (dialog.visible is True, GetDialogZOrder(dialog))
 
 class GuiManager(pyglet.graphics.Batch):
-    def __init__(self, window, isBuffered=True):
+    def __init__(self, window, isBuffered=True, perDialogBuffers=False, dirtyRects=False, guiTickRate=None, bufferScale=1.0, routeEvents=False, coalesceMotion=False, layoutBudget=None):
+        '''
+        Creates the Batch managing all kytten dialogs of a window.
+
+        @param window The window in which dialogs are drawn
+        @param isBuffered If True, the gui is rendered in an offscreen
+                          buffer and only redrawn when a dialog changed.
+        @param perDialogBuffers If True (and buffered), every dialog owns
+                                its own offscreen target; only dialogs
+                                needing a refresh are redrawn, and the
+                                frame is composited from the cached
+                                targets in z-order.
+        @param dirtyRects If True (and buffered), only the screen areas
+                          invalidated by dialogs are cleared and redrawn
+                          in the buffer, inside a scissor rectangle.
+        @param guiTickRate If set (and buffered), dialogs are updated, laid
+                           out and redrawn at most guiTickRate times per
+                           second; frames in between only blit the cached
+                           buffer.  Input events are still handled as
+                           soon as they are received.
+        @param bufferScale Resolution of offscreen buffers relative to the
+                           window (e.g. 0.5 on low-end hardware, 2.0 for
+                           HiDPI); buffers are resampled when composited.
+        @param routeEvents If True, the manager is the only window handler
+                           for its dialogs: mouse events are delivered to
+                           the topmost dialogs under the cursor only, and
+                           hover changes between dialogs are tracked here.
+                           Off by default: each dialog then handles the
+                           window events itself.
+        @param coalesceMotion If True (and routing events), consecutive
+                              mouse motion or drag events are merged and
+                              delivered once per gui update, with summed
+                              dx/dy. Other events flush the pending motion
+                              first, so events are never reordered.
+        @param layoutBudget If set, time in milliseconds given to dialog
+                            layouts per gui update. Dialogs waiting for a
+                            layout are processed visible and top-most
+                            first; the others are laid out in later
+                            updates (see flush_layouts).
+        '''
         pyglet.graphics.Batch.__init__(self)
         self.parent_window=window
         self.is_buffered=isBuffered
+        self.per_dialog_buffers=perDialogBuffers
+        self.use_dirty_rects=dirtyRects
+        self.debug_dirty_rects=False
+        self.gui_tick_rate=guiTickRate
+        self.buffer_scale=bufferScale
         self.force_refresh=False
+        self.profiler=None
+        self.latency_tracer=None
+        self._trace_dispatch=None
+        self.route_events=routeEvents
+        self.coalesce_motion=coalesceMotion
+        self.layout_budget=layoutBudget
+        self.motion_events_received=0
+        self.motion_events_delivered=0
+        self._pending_motion = None
+        self._last_update_time = None
+        self._dirty_rects = []
+        self._last_dirty_rects = []
 
         self.backgroup = pyglet.graphics.OrderedGroup(0)
         self.foregroup = pyglet.graphics.OrderedGroup(1)
-        self._buffer   = GuiInternalBuffer(window.width,window.height)
+        self._buffer   = GuiInternalBuffer(window.width,window.height, scale=bufferScale)
         self._dialogs  = weakref.WeakSet()
+        self._dialog_order = None
+        self._dialog_order_key = None
+        self._hover_dialog = None
         self._window_size = (window.width,window.height)
 
         def on_main_window_resize(width, height):
-            self._buffer.recreate_texture((width, height))
+            # The buffer itself is resized on next Render, so that
+            # resize events received in between are coalesced.
             self._window_size = (width, height)
-            for dialog in self._dialogs:
+            self.force_refresh = True
+            for dialog in list(self._dialogs):
+                if dialog.routed_events:
+                    dialog.on_resize(width, height)
                 dialog.to_refresh=True
                 if dialog.screen is not None:
                     dialog.screen.width = width
@@ -35,51 +140,586 @@ class GuiManager(pyglet.graphics.Batch):
 
         window.push_handlers(on_resize=on_main_window_resize)
 
-        PatchWindowsEventHandler(window)
+        if routeEvents:
+            window.push_handlers(on_mouse_motion=self.on_mouse_motion,
+                                 on_mouse_press=self.on_mouse_press,
+                                 on_mouse_release=self.on_mouse_release,
+                                 on_mouse_drag=self.on_mouse_drag,
+                                 on_mouse_scroll=self.on_mouse_scroll,
+                                 on_mouse_leave=self.on_mouse_leave,
+                                 on_key_press=self.on_key_press,
+                                 on_key_release=self.on_key_release,
+                                 on_text=self.on_text,
+                                 on_text_motion=self.on_text_motion,
+                                 on_text_motion_select=self.on_text_motion_select)
+        else:
+            PatchWindowsEventHandler(window)
 
     def AddDialog(self,dialog):
         self._dialogs.add(dialog)
+        self._dialog_order = None
+        if self.route_events:
+            dialog.routed_events = True
+
+    def RemoveDialog(self, dialog):
+        self._dialogs.discard(dialog)
+        self._dialog_order = None
+        if self._hover_dialog is dialog:
+            self._hover_dialog = None
+
+    def invalidate_rect(self, x, y, width, height):
+        '''
+        Request a repaint of a screen rectangle on next render, for areas
+        not owned by any live dialog (e.g. a dialog being torn down).
+        '''
+        self._dirty_rects.append((x, y, width, height))
+
+    def get_state_changes(self):
+        '''
+        Return (issued, skipped) GL state changes of the last gui frame,
+        as counted by the renderer state cache.
+        '''
+        return StateCache.last_frame
+
+    def enable_profiling(self, window_size=120, callback=None):
+        '''
+        Start recording per frame timings and counters (see kytten.profiler).
+        Profiling hooks are only installed while enabled, so there is no
+        overhead otherwise.
+
+        @param window_size Number of frames summarized by the profiler
+        @param callback Optional function called with each frame record
+        @return The GuiProfiler instance
+        '''
+        if self.profiler is None:
+            profiler = self.profiler = GuiProfiler(window_size, callback)
+
+            self._update_gui = profiler.timed('update', self._update_gui)
+            self._layout_dialog = self._layout_dialog_profiled
+            self._update_dialog = self._update_dialog_profiled
+            self.draw = profiler.timed('draw', self.draw)
+            self._draw_dialog = profiler.timed('draw', self._draw_dialog)
+            self._composite = profiler.timed('composite', self._composite)
+            self._update_draw_list = profiler.counted('resorts', self._update_draw_list)
+            self.add = self._count_vertex_lists(self.add)
+            self.add_indexed = self._count_vertex_lists(self.add_indexed)
+
+        elif callback is not None:
+            self.profiler.add_callback(callback)
+
+        return self.profiler
+
+    def disable_profiling(self):
+        '''
+        Stop profiling and remove profiling hooks.
+        '''
+        for name in ('_update_gui', '_layout_dialog', '_update_dialog', 'draw', '_draw_dialog', '_composite',
+                     '_update_draw_list', 'add', 'add_indexed'):
+            self.__dict__.pop(name, None)
+        self.profiler = None
+
+    def enable_latency_tracing(self, bins=HISTOGRAM_BINS, history=120, callback=None):
+        '''
+        Start measuring the delay between input events and the gui redraw
+        showing their effect (see kytten.latency).
+
+        @param bins Histogram bins upper bounds in milliseconds
+        @param history Number of finished events kept by the tracer
+        @param callback Optional function called with each finished event
+        @return The LatencyTracer instance
+        '''
+        if self.latency_tracer is None:
+            tracer = self.latency_tracer = LatencyTracer(bins, history, callback)
+            dialogs = self._dialogs
+
+            def trace_dispatch(window, event_type, *args):
+                if event_type in TRACED_EVENTS:
+                    tracer.stamp(event_type, dialogs)
+
+            # Stamp events before any handler of the window sees them
+            self._trace_dispatch = patch_instance_method(self.parent_window, "dispatch_event")(trace_dispatch)
+
+        elif callback is not None:
+            self.latency_tracer.add_callback(callback)
+
+        return self.latency_tracer
+
+    def disable_latency_tracing(self):
+        '''
+        Stop latency tracing and remove the window hook.
+        '''
+        if self.latency_tracer is not None:
+            stack = self.parent_window._methods_stack["dispatch_event"]
+            stack[:] = [func for func in stack if getattr(func, '__func__', None) is not self._trace_dispatch]
+            self._trace_dispatch = None
+            self.latency_tracer = None
+
+    def _count_vertex_lists(self, add):
+        profiler = self.profiler
+        def _add(*args, **kwargs):
+            vertex_list = add(*args, **kwargs)
+            profiler.count('vertex_lists_created')
+            vertex_list.delete = profiler.counted('vertex_lists_deleted', vertex_list.delete)
+            return vertex_list
+        return _add
 
     def Render(self, kytten_buffered=True):
+        if self.profiler is not None:
+            self.profiler.begin_frame()
+            self._render(kytten_buffered)
+            self.profiler.end_frame()
+        else:
+            self._render(kytten_buffered)
+
+    def _render(self, kytten_buffered):
+
+        if self._buffer.render_target_size != self._window_size:
+            self._buffer.resize(self._window_size)
 
         if   self.is_buffered and kytten_buffered is True :
-            self._render_buffered()
+            if not self._is_gui_tick():
+                self._render_cached()
+            elif self.per_dialog_buffers:
+                self._render_dialog_buffers()
+            else:
+                self._render_buffered()
         elif kytten_buffered == 'bypass':
-            self._render_from_buffer()
+            if self.per_dialog_buffers:
+                self._render_from_dialog_buffers()
+            else:
+                self._render_from_buffer()
         else:
             self._render_unbuffered()
 
     def _render_buffered(self):
         with GuiRenderContext(*self._window_size):
-            if self._update_gui() or self.force_refresh is True:
+            if self._update_gui() or self.force_refresh is True or self._dirty_rects:
 
-                self.force_refresh=False
-                with self._buffer:
-                    self.draw()
+                if self.use_dirty_rects and not self.force_refresh:
+                    region = self._get_dirty_region()
+                else:
+                    region = None
+                    self._last_dirty_rects = [(0, 0)+self._window_size]
 
-                for dialog in self._dialogs: dialog.to_refresh=False
+                self.force_refresh=False
 
-            self._buffer.render()
+                if region is None or region[2] > 0 and region[3] > 0:
+                    self._buffer.set_clip_region(region)
+                    with self._buffer:
+                        self.draw()
+                    if self.latency_tracer is not None:
+                        self.latency_tracer.drawn()
+
+                for dialog in self._dialogs:
+                    dialog.to_refresh=False
+                    dialog.clear_dirty_rects()
+                del self._dirty_rects[:]
+
+            self._composite(self._buffer)
+
+            if self.debug_dirty_rects:
+                self._draw_dirty_rects()
+
+    def _get_dirty_region(self):
+        '''
+        Collects the rectangles invalidated since last repaint and returns
+        their bounding box, clipped to the window.
+        '''
+        rects = list(self._dirty_rects)
+        for dialog in self._dialogs:
+            if dialog.to_refresh:
+                rects.extend(dialog.get_dirty_rects())
+
+        self._last_dirty_rects = rects
+        if not rects:
+            return (0, 0, 0, 0)
+
+        width, height = self._window_size
+        x0 = max(min(x for x, y, w, h in rects), 0)
+        y0 = max(min(y for x, y, w, h in rects), 0)
+        x1 = min(max(x+w for x, y, w, h in rects), width)
+        y1 = min(max(y+h for x, y, w, h in rects), height)
+
+        return (int(x0), int(y0), int(max(x1-x0, 0)), int(max(y1-y0, 0)))
+
+    def _draw_dirty_rects(self):
+        '''
+        Debug helper: outline the areas repainted by the last gui redraw.
+        '''
+        gl.glDisable(gl.GL_TEXTURE_2D)
+        GetRenderer().set_texture_mode(TEXTURE_NONE)
+        gl.glColor4f(1.0, 0.0, 0.0, 1.0)
+
+        for x, y, width, height in self._last_dirty_rects:
+            gl.glBegin(gl.GL_LINE_LOOP)
+            gl.glVertex2f(x+0.5, y+0.5)
+            gl.glVertex2f(x+width-0.5, y+0.5)
+            gl.glVertex2f(x+width-0.5, y+height-0.5)
+            gl.glVertex2f(x+0.5, y+height-0.5)
+            gl.glEnd()
+
+        gl.glColor4f(1.0, 1.0, 1.0, 1.0)
 
     def _render_unbuffered(self):
         with GuiRenderContext(*self._window_size):
             self._update_gui()
-            for dialog in self._dialogs: dialog.to_refresh=False
+            for dialog in self._dialogs:
+                dialog.to_refresh=False
+                dialog.clear_dirty_rects()
+            del self._dirty_rects[:]
             self.draw()
+            if self.latency_tracer is not None:
+                self.latency_tracer.drawn()
 
     def _render_from_buffer(self):
         with GuiRenderContext(*self._window_size):
             self.force_refresh= True
-            self._buffer.render()
+            self._composite(self._buffer)
+
+    def _render_dialog_buffers(self):
+        with GuiRenderContext(*self._window_size):
+            self._update_gui()
+            force_refresh, self.force_refresh = self.force_refresh, False
+
+            for dialog in self._get_ordered_dialogs():
+                if dialog.visible and dialog.width > 0 and dialog.height > 0:
+                    target = dialog.render_target
+
+                    if target is None:
+                        target = dialog.render_target = GuiDialogBuffer(*dialog.get_bounds(), scale=self.buffer_scale)
+                        lost = True
+                    else:
+                        lost = target.set_bounds(*dialog.get_bounds())
+
+                    if lost or force_refresh or dialog.to_refresh:
+                        with target:
+                            self._draw_dialog(dialog)
+                        if self.latency_tracer is not None:
+                            self.latency_tracer.drawn(dialog)
+
+                    self._composite(target)
+
+                dialog.to_refresh=False
+                dialog.clear_dirty_rects()
+            del self._dirty_rects[:]
+
+    def _draw_dialog(self, dialog):
+        DrawGroupTree(self, dialog.root_group)
+
+    def _composite(self, target):
+        target.render()
+
+    def _render_from_dialog_buffers(self):
+        with GuiRenderContext(*self._window_size):
+            self.force_refresh= True
+            self._composite_dialog_buffers()
+
+    def _composite_dialog_buffers(self):
+        for dialog in self._get_ordered_dialogs():
+            if dialog.visible and dialog.render_target is not None:
+                self._composite(dialog.render_target)
+
+    def _render_cached(self):
+        '''
+        Draw last gui frame again, without updating any dialog.
+        '''
+        with GuiRenderContext(*self._window_size):
+            if self.per_dialog_buffers:
+                self._composite_dialog_buffers()
+            else:
+                self._composite(self._buffer)
+
+                if self.debug_dirty_rects:
+                    self._draw_dirty_rects()
+
+    def _is_gui_tick(self):
+        '''
+        True if enough time elapsed since last gui update for a new one,
+        according to gui_tick_rate.
+        '''
+        if not self.gui_tick_rate or self.force_refresh or self._last_update_time is None:
+            return True
+
+        return time.time() - self._last_update_time >= 1.0/self.gui_tick_rate
+
+    def _get_ordered_dialogs(self):
+        '''
+        Returns dialogs in drawing order (bottom-most first). The order is
+        cached until a dialog is added, removed or popped to top.
+        '''
+        key = (internals.kytten_base_dialog_id, internals.kytten_floating_dialog_id)
+        if self._dialog_order is None or self._dialog_order_key != key:
+            self._dialog_order = [weakref.ref(dialog) for dialog in sorted(self._dialogs, key=GetDialogZOrder)]
+            self._dialog_order_key = key
+
+        dialogs = [ref() for ref in self._dialog_order]
+        return [dialog for dialog in dialogs if dialog is not None]
+
+    def _get_dialogs_top_down(self):
+        return reversed(self._get_ordered_dialogs())
+
+    def _dispatch_top_down(self, event_type, *args):
+        '''
+        Deliver a window event to visible dialogs from top to bottom, until
+        one of them handles it.
+        '''
+        for dialog in self._get_dialogs_top_down():
+            if dialog.visible and getattr(dialog, event_type)(*args):
+                return pyglet.event.EVENT_HANDLED
+
+    def _dispatch_at(self, event_type, x, y, *args):
+        '''
+        Deliver a mouse event to the visible dialogs under (x, y) from top
+        to bottom, until one of them handles it.
+
+        Returns the dialog which handled the event, or None.
+        '''
+        for dialog in self._get_dialogs_top_down():
+            if dialog.visible and dialog.hit_test(x, y) and getattr(dialog, event_type)(x, y, *args):
+                return dialog
+
+    def _set_hover_dialog(self, dialog, x, y):
+        hover_dialog = self._hover_dialog
+        if hover_dialog is dialog:
+            return
+
+        self._hover_dialog = dialog
+        if hover_dialog is not None:
+            hover_dialog.set_hover(None)
+            hover_dialog.dispatch_event('on_mouse_leave', x, y)
+
+    def get_motion_counts(self):
+        '''
+        Return (received, delivered) mouse motion and drag events since
+        the manager creation; both are equal unless coalesceMotion is set.
+        '''
+        return self.motion_events_received, self.motion_events_delivered
+
+    def _queue_motion(self, event_type, x, y, dx, dy, *args):
+        '''
+        Merge a motion or drag event with the pending one if they are of
+        the same kind, or flush the pending event and queue this one.
+        '''
+        pending = self._pending_motion
+        if pending is not None:
+            if pending[0] == event_type and pending[5:] == args:
+                self._pending_motion = (event_type, x, y, pending[3] + dx, pending[4] + dy) + args
+                return
+            self.flush_input()
+
+        self._pending_motion = (event_type, x, y, dx, dy) + args
+
+    def flush_input(self):
+        '''
+        Deliver the pending coalesced motion or drag event, if any.
+        '''
+        pending, self._pending_motion = self._pending_motion, None
+        if pending is not None:
+            self.motion_events_delivered += 1
+            if pending[0] == 'on_mouse_motion':
+                self._dispatch_mouse_motion(*pending[1:])
+            else:
+                self._dispatch_mouse_drag(*pending[1:])
+
+    def _dispatch_mouse_motion(self, x, y, dx, dy):
+        dialog = self._dispatch_at('on_mouse_motion', x, y, dx, dy)
+        self._set_hover_dialog(dialog, x, y)
+        if dialog is not None:
+            return pyglet.event.EVENT_HANDLED
+
+    def _dispatch_mouse_drag(self, x, y, dx, dy, buttons, modifiers):
+        # Only dialogs with a focus or being moved act on drag events
+        for dialog in self._get_dialogs_top_down():
+            if dialog.visible and (dialog.focus is not None or dialog.is_dragging) and \
+                dialog.on_mouse_drag(x, y, dx, dy, buttons, modifiers):
+                return pyglet.event.EVENT_HANDLED
+
+    def _claims_motion(self, x, y):
+        '''
+        Whether a queued motion event at (x, y) will be consumed by a
+        dialog once delivered, so the window handlers below must not see it.
+        '''
+        for dialog in self._get_dialogs_top_down():
+            if dialog.visible and dialog.hit_test(x, y):
+                return True
+        return False
+
+    def _claims_drag(self, buttons):
+        '''
+        Whether a queued drag event will be consumed by a dialog once
+        delivered: a dialog has a focus, or is being moved.
+        '''
+        for dialog in self._get_dialogs_top_down():
+            if dialog.visible and (dialog.focus is not None or
+                                   (dialog.is_movable and dialog.is_dragging and buttons == 1)):
+                return True
+        return False
+
+    def on_mouse_motion(self, x, y, dx, dy):
+        self.motion_events_received += 1
+        if self.coalesce_motion:
+            self._queue_motion('on_mouse_motion', x, y, dx, dy)
+            if self._claims_motion(x, y):
+                return pyglet.event.EVENT_HANDLED
+            return
+
+        self.motion_events_delivered += 1
+        return self._dispatch_mouse_motion(x, y, dx, dy)
+
+    def on_mouse_drag(self, x, y, dx, dy, buttons, modifiers):
+        self.motion_events_received += 1
+        if self.coalesce_motion:
+            self._queue_motion('on_mouse_drag', x, y, dx, dy, buttons, modifiers)
+            if self._claims_drag(buttons):
+                return pyglet.event.EVENT_HANDLED
+            return
+
+        self.motion_events_delivered += 1
+        return self._dispatch_mouse_drag(x, y, dx, dy, buttons, modifiers)
+
+    def on_mouse_press(self, x, y, button, modifiers):
+        self.flush_input()
+        for dialog in self._get_dialogs_top_down():
+            if dialog.visible and dialog.hit_test(x, y):
+                if dialog.on_mouse_press(x, y, button, modifiers):
+                    return pyglet.event.EVENT_HANDLED
+
+            # Clicking outside a dialog clears its focus
+            elif dialog.focus is not None:
+                dialog.set_focus(None)
+
+    def _refresh_hover(self, x, y):
+        '''
+        Update the hover after a release: drag events do not track it, so
+        the cursor may have moved to another dialog or control meanwhile.
+        '''
+        for dialog in self._get_dialogs_top_down():
+            if dialog.visible and dialog.hit_test(x, y):
+                break
+        else:
+            dialog = None
+
+        if dialog is not self._hover_dialog or \
+            (dialog is not None and dialog.hover is not dialog.find_control(x, y)):
+            self._dispatch_mouse_motion(x, y, 0, 0)
+
+    def on_mouse_release(self, x, y, button, modifiers):
+        self.flush_input()
+        self._refresh_hover(x, y)
+
+        for dialog in self._get_dialogs_top_down():
+            if (dialog.focus is not None or dialog.is_dragging) and \
+                dialog.on_mouse_release(x, y, button, modifiers):
+                return pyglet.event.EVENT_HANDLED
+
+    def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
+        self.flush_input()
+        if self._dispatch_at('on_mouse_scroll', x, y, scroll_x, scroll_y) is not None:
+            return pyglet.event.EVENT_HANDLED
+
+    def on_mouse_leave(self, x, y):
+        self.flush_input()
+        self._set_hover_dialog(None, x, y)
+
+    def on_key_press(self, symbol, modifiers):
+        self.flush_input()
+        return self._dispatch_top_down('on_key_press', symbol, modifiers)
+
+    def on_key_release(self, symbol, modifiers):
+        self.flush_input()
+        return self._dispatch_top_down('on_key_release', symbol, modifiers)
+
+    def on_text(self, text):
+        self.flush_input()
+        return self._dispatch_top_down('on_text', text)
+
+    def on_text_motion(self, motion):
+        self.flush_input()
+        return self._dispatch_top_down('on_text_motion', motion)
+
+    def on_text_motion_select(self, motion):
+        self.flush_input()
+        return self._dispatch_top_down('on_text_motion_select', motion)
 
     def _update_gui(self):
+        self.flush_input()
+
+        tracer = self.latency_tracer
+        if tracer is not None:
+            tracer.attribute(self._dialogs)
+
+        now = time.time()
+        dt = now - self._last_update_time if self._last_update_time is not None else 0.0
+        self._last_update_time = now
+
+        deferred = self._process_layouts()
+        for dialog in deferred:
+            dialog.defer_layout = True
+
         to_refresh=False
-        for dialog in self._dialogs:
-            dialog.on_update(0.016)
+        # Dialogs may be torn down (and removed) while updating
+        for dialog in list(self._dialogs):
+            self._update_dialog(dialog, dt)
             if dialog.to_refresh: to_refresh=True
 
+        for dialog in deferred:
+            dialog.defer_layout = False
+
+        if tracer is not None:
+            tracer.laid_out()
+
         return to_refresh
 
+    def _process_layouts(self):
+        '''
+        Lay out the dialogs waiting for it, visible and top-most first,
+        within layout_budget milliseconds; at least one dialog is laid out
+        on each call.
+
+        Returns the dialogs deferred to a later update.
+        '''
+        pending = [dialog for dialog in self._dialogs if dialog.needs_layout]
+        if not pending:
+            return []
+
+        pending.sort(key=GetLayoutPriority, reverse=True)
+        budget = self.layout_budget
+        start = time.time()
+
+        for index, dialog in enumerate(pending):
+            if budget is not None and index and (time.time() - start)*1000 >= budget:
+                return pending[index:]
+            if dialog.needs_layout:
+                self._layout_dialog(dialog)
+        return []
+
+    def _layout_dialog(self, dialog):
+        dialog.do_layout()
+
+    def _layout_dialog_profiled(self, dialog):
+        start = time.time()
+        dialog.do_layout()
+        self.profiler.add_layout_time(dialog, time.time() - start)
+
+    def _update_dialog(self, dialog, dt):
+        dialog.on_update(dt)
+
+    def _update_dialog_profiled(self, dialog, dt):
+        # Partial layouts and repositions are done by the dialog update
+        start = time.time()
+        if dialog.update_layout():
+            self.profiler.add_layout_time(dialog, time.time() - start)
+        dialog.on_update(dt)
+
+    def flush_layouts(self):
+        '''
+        Lay out all dialogs waiting for it now, regardless of the layout
+        budget.
+        '''
+        for dialog in sorted(self._dialogs, key=GetLayoutPriority, reverse=True):
+            if dialog.needs_layout:
+                self._layout_dialog(dialog)
+
 
 
 class PageManager:
@@ -12,7 +12,7 @@ import pyglet.window.key as key
 from .widgets import Widget, Control
 from .dialog import Dialog, DIALOG_NO_CREATE_FRAME
 from .frame import Frame
-from .layout import GetRelativePoint, VerticalLayout
+from .layout import GetRelativePoint, VerticalLayout, VirtualList
 from .layout import ANCHOR_CENTER, ANCHOR_TOP_LEFT, ANCHOR_BOTTOM_LEFT
 from .layout import HALIGN_CENTER
 from .layout import VALIGN_TOP, VALIGN_CENTER, VALIGN_BOTTOM
@@ -190,6 +190,19 @@ class MenuOption(Control):
         if self.saved_dialog is not None:
             self.saved_dialog.set_needs_layout()
 
+    def bind(self, text, rid, disabled=False, selected=False):
+        '''
+        Show another choice of the menu (used by VirtualMenu); the option
+        is sized and laid out again by the menu, no layout is requested.
+        '''
+        text = tostring(text)
+        if text != self.text or selected != self.is_selected or disabled != self.disabled_flag:
+            self.delete()
+        self.text = text
+        self.rid = rid
+        self.is_selected = selected
+        self.disabled_flag = disabled
+
     def teardown(self):
         self.menu = None
         Control.teardown(self)
@@ -370,13 +383,126 @@ class MenuList(Menu, KyttenEventDispatcher):
 MenuList.register_event_type('on_key_press')
 
 
+class VirtualMenu(VirtualList):
+    '''
+    VirtualMenu is a Menu for long lists of options: only the MenuOptions
+    visible through its Scrollable parent exist, and they are bound to
+    other options as the menu is scrolled.
+    '''
+    def __init__(self, options=[], align=HALIGN_CENTER, padding=4, minwidth=0, overscan=4, name=None, on_select=None):
+        VirtualList.__init__(self, factory=self._make_option, binder=self._bind_option,
+                             minwidth=minwidth, padding=padding, align=align, overscan=overscan, name=name)
+        self.is_multiline = False
+        self.label_width = 0
+        self.on_select =  self._wrap_method(on_select)
+        self.selected_index = None
+
+        self._set_options(options)
+
+    def _make_option(self):
+        return MenuOption(anchor=(VALIGN_CENTER, self.align), menu=self)
+
+    def _bind_option(self, option, index):
+        disabled = index in self._disabled
+        option.bind(self._options[index], index, disabled=disabled,
+                    selected=(index == self.selected_index and not disabled))
+
+    def _set_options(self, options):
+        self._options = []
+        self._disabled = set()
+        # First index of each option, as Menu.select finds them
+        self._options_index = {}
+        self._text_width = 0
+        self._measured_count = 0
+
+        self._add_options(options)
+
+    def _add_options(self, options):
+        for index, option in enumerate(options, len(self._options)):
+            if option.startswith('-'):
+                self._disabled.add(index)
+                option = option[1:]
+            self._options.append(option)
+            self._options_index.setdefault(option, index)
+
+        self.set_count(len(self._options))
+
+    def AddChoices(self, choices):
+        self._add_options(choices)
+
+    def get_value(self):
+        if self.selected_index is not None:
+            return self._options[self.selected_index]
+        else:
+            return None
+
+    def is_input(self):
+        return True
+
+    def select(self, text=None, index=None, no_trigger=False):
+        if text is not None:
+            index = self._options_index.get(text)
+            if index is None:
+                return
+        elif index is not None:
+            text = self._options[index]
+        else:
+            raise ValueError('Must set either text or index to select')
+
+        self.unselect_choice()
+        self.selected_index = index
+
+        menu_option = self.rows.get(index)
+        if menu_option is not None:
+            menu_option.select()
+
+        if self.on_select is not None and no_trigger is False:
+            self.on_select(text, index)
+
+    def unselect_choice(self):
+        if self.selected_index is not None:
+            menu_option = self.rows.get(self.selected_index)
+            if menu_option is not None:
+                menu_option.unselect()
+            self.selected_index = None
+
+    def set_options(self, options):
+        self.selected_index = None
+        self._set_options(options)
+
+    def size(self, dialog, scale):
+        VirtualList.size(self, dialog, scale)
+        if dialog is None or not self.rows:
+            return
+
+        # As wide as the widest option; each option is measured once
+        if self._measured_count < len(self._options):
+            option = self.rows[min(self.rows)]
+            if option.label is not None:
+                font = option.label.document.get_font()
+                for text in self._options[self._measured_count:]:
+                    width = sum(glyph.advance for glyph in font.get_glyphs(text))
+                    if width > self._text_width:
+                        self._text_width = width
+                self._measured_count = len(self._options)
+        self.width = max(self.width, self._text_width)
+
+    def Hide(self):
+        VirtualList.Hide(self)
+        self.unselect_choice()
+
+    def teardown(self):
+        self.on_select = None
+        VirtualList.teardown(self)
+
+
 class Dropdown(Control):
     field = None
     label = None
     pulldown_menu = None
     def __init__(self, options=[], selected=None, fixed_width=0,
                  max_height=400, align=VALIGN_TOP, on_select=None,
-                 disabled=False, name=None):
+                 disabled=False, name=None, virtual=False):
         assert options
         assert (selected in options) if selected else True
         Control.__init__(self, disabled=disabled, name=name)
@@ -388,6 +514,8 @@ class Dropdown(Control):
         self.fixed_width = fixed_width
         self.max_height = max_height
         self.align = align
+        # Pull down a VirtualMenu, for long lists of options
+        self.virtual = virtual
 
     def _delete_pulldown_menu(self):
         if self.pulldown_menu is not None:
@@ -484,9 +612,10 @@ class Dropdown(Control):
             y = self.y + self.height + 1
 
         # Now to setup the dialog
+        menu_class = VirtualMenu if self.virtual else Menu
         self.pulldown_menu = Dialog(
             Frame(
-                Scrollable(Menu(options=self.options, on_select=on_select),
+                Scrollable(menu_class(options=self.options, on_select=on_select),
                            height=self.max_height),
                 path=['dropdown', 'pulldown']
             ),
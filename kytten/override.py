@@ -9,17 +9,67 @@ from __future__ import unicode_literals, print_function, absolute_import, divisi
 import pyglet
 import pyglet.gl as gl
 from pyglet.text import runlist
-from types import MethodType
+from types import MethodType, FunctionType
 
 from .tools import tostring, patch_instance_method
+from .renderer import GetRenderer, StateCache, TEXTURE_NONE, TEXTURE_ALPHA
 
 KYTTEN_LAYOUT_GROUPS = {}
 KYTTEN_LAYOUT_GROUP_REFCOUNTS = {}
 
 _Line = pyglet.text.layout._Line
 
+EVENT_HANDLED = pyglet.event.EVENT_HANDLED
+EVENT_UNHANDLED = pyglet.event.EVENT_UNHANDLED
+
 class KyttenEventDispatcher(pyglet.event.EventDispatcher):
 
+    def dispatch_event(self, event_type, *args):
+        '''
+        Same as pyglet.event.EventDispatcher.dispatch_event, but the event
+        method of the class is taken from a per class table of unbound
+        functions instead of being searched for (hasattr, getattr and a
+        bound method) on each dispatch, and the event type is only checked
+        against event_types the first time the class dispatches it.
+        Pushed handlers, then methods set on the instance itself (e.g. by
+        patch_instance_method) still take precedence, and a TypeError is
+        reported as pyglet does.
+        '''
+        invoked = False
+        if self._event_stack:
+            for frame in list(self._event_stack):
+                handler = frame.get(event_type)
+                if handler is not None:
+                    invoked = True
+                    try:
+                        if handler(*args):
+                            return EVENT_HANDLED
+                    except TypeError as exception:
+                        RaiseDispatchException(self, event_type, args, handler, exception)
+
+        handler = self.__dict__.get(event_type)
+        if handler is None:
+            method = _EVENT_HANDLER_TABLES[type(self)][event_type]
+            if method is None:
+                return EVENT_UNHANDLED if invoked else False
+
+            if method is not _BOUND_HANDLER:
+                try:
+                    if method(self, *args):
+                        return EVENT_HANDLED
+                except TypeError as exception:
+                    RaiseDispatchException(self, event_type, args, getattr(self, event_type), exception)
+                return EVENT_UNHANDLED
+
+            handler = getattr(self, event_type)
+
+        try:
+            if handler(*args):
+                return EVENT_HANDLED
+        except TypeError as exception:
+            RaiseDispatchException(self, event_type, args, handler, exception)
+        return EVENT_UNHANDLED
+
     def remove_handler(self, name, handler):
         # See 'remove_handler' method of pyglet.event.EventDispatcher
 
@@ -31,60 +81,137 @@ class KyttenEventDispatcher(pyglet.event.EventDispatcher):
             except KeyError:
                 pass
 
+# Table value of event methods which are not plain functions (static or
+# class methods, callable objects): they are looked up on the instance.
+_BOUND_HANDLER = object()
+
+class EventHandlerTable(dict):
+    '''
+    The unbound event methods of a KyttenEventDispatcher class by event
+    type (None when the class has no method for it), filled in as events
+    are dispatched.
+    '''
+    __slots__ = ('cls',)
+
+    def __init__(self, cls):
+        dict.__init__(self)
+        self.cls = cls
+
+    def __missing__(self, event_type):
+        cls = self.cls
+        assert event_type in cls.event_types, "%r not found in %r.event_types == %r" % (event_type, cls, cls.event_types)
+
+        handler = None
+        for klass in cls.__mro__:
+            if event_type in klass.__dict__:
+                handler = klass.__dict__[event_type]
+                if not isinstance(handler, FunctionType):
+                    handler = _BOUND_HANDLER if callable(getattr(cls, event_type)) else None
+                break
+
+        self[event_type] = handler
+        return handler
+
+class _EventHandlerTables(dict):
+    def __missing__(self, cls):
+        table = self[cls] = EventHandlerTable(cls)
+        return table
+
+_EVENT_HANDLER_TABLES = _EventHandlerTables()
+
+def GetEventHandlerTable(cls):
+    return _EVENT_HANDLER_TABLES[cls]
+
+_raise_dispatch_exception = pyglet.event.EventDispatcher._raise_dispatch_exception
+# pyglet 1.4+ passes the exception along, earlier versions re-raise it
+_RAISE_WITH_EXCEPTION = getattr(_raise_dispatch_exception, '__func__', _raise_dispatch_exception).__code__.co_argcount > 4
+
+def RaiseDispatchException(dispatcher, event_type, args, handler, exception):
+    '''
+    Report a TypeError raised by an event handler the way pyglet does: a
+    handler with the wrong signature gets an explanatory message, other
+    errors are raised again. Must be called from the except clause.
+    '''
+    if _RAISE_WITH_EXCEPTION:
+        dispatcher._raise_dispatch_exception(event_type, args, handler, exception)
+    else:
+        dispatcher._raise_dispatch_exception(event_type, args, handler)
+
 class TextLayoutGroup_KYTTEN_OVERRIDE(pyglet.graphics.Group):
     def set_state(self):
-        gl.glPushAttrib(gl.GL_ENABLE_BIT | gl.GL_CURRENT_BIT)
-        gl.glEnable(gl.GL_BLEND)
-        gl.glBlendFuncSeparate(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA, gl.GL_ONE, gl.GL_ONE_MINUS_SRC_ALPHA)
+        renderer = GetRenderer()
+        renderer.push_state()
+        renderer.enable_blend()
+        StateCache.blend_func_separate(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA, gl.GL_ONE, gl.GL_ONE_MINUS_SRC_ALPHA)
         # To Allow Normal Rendering when Buffering with FrameBufferObject
         # Without this option : problem with alpha blending when rendering buffered GUI textures
         #Also in context.glContext
 
     def unset_state(self):
-        gl.glPopAttrib()
+        GetRenderer().pop_state()
 
 
 class ScrollableTextLayoutGroup_KYTTEN_OVERRIDE(pyglet.text.layout.ScrollableTextLayoutGroup):
 
     def set_state(self):
-        gl.glPushAttrib(gl.GL_ENABLE_BIT | gl.GL_TRANSFORM_BIT | gl.GL_CURRENT_BIT)
-        gl.glEnable(gl.GL_BLEND)
-        gl.glBlendFuncSeparate(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA, gl.GL_ONE, gl.GL_ONE_MINUS_SRC_ALPHA)
+        renderer = GetRenderer()
+        renderer.push_state()
+        renderer.enable_blend()
+        StateCache.blend_func_separate(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA, gl.GL_ONE, gl.GL_ONE_MINUS_SRC_ALPHA)
         # To Allow Normal Rendering when Buffering with FrameBufferObject
         # Without this option : problem with alpha blending when rendering buffered GUI textures
         #Also in context.glContext
 
-        # Disable clipping planes to check culling.
-        gl.glEnable(gl.GL_CLIP_PLANE0)
-        gl.glEnable(gl.GL_CLIP_PLANE1)
-        gl.glEnable(gl.GL_CLIP_PLANE2)
-        gl.glEnable(gl.GL_CLIP_PLANE3)
-        # Left
-        gl.glClipPlane(gl.GL_CLIP_PLANE0, (gl.GLdouble * 4)(
-                    1, 0, 0, -(self._clip_x - 1)))
-        # Top
-        gl.glClipPlane(gl.GL_CLIP_PLANE1, (gl.GLdouble * 4)(
-                    0, -1, 0, self._clip_y))
-        # Right
-        gl.glClipPlane(gl.GL_CLIP_PLANE2, (gl.GLdouble * 4)(
-                    -1, 0, 0, self._clip_x + self._clip_width + 1))
-        # Bottom
-        gl.glClipPlane(gl.GL_CLIP_PLANE3, (gl.GLdouble * 4)(
-                    0, 1, 0, -(self._clip_y - self._clip_height)))
-        gl.glTranslatef(self.translate_x, self.translate_y, 0)
+        # Clip to the visible area of the layout (one pixel wider on the sides).
+        renderer.push_clip(self._clip_x - 1, self._clip_y - self._clip_height,
+                           self._clip_width + 2, self._clip_height, local=True)
+        renderer.push_transform(self.translate_x, self.translate_y)
+
+    def unset_state(self):
+        renderer = GetRenderer()
+        renderer.pop_transform()
+        renderer.pop_clip()
+        renderer.pop_state()
+
+class TextLayoutBackgroundGroup_KYTTEN_OVERRIDE(pyglet.graphics.OrderedGroup):
+    '''
+    Text background (selection highlight) is drawn untextured.
+    '''
+    def set_state(self):
+        GetRenderer().set_texture_mode(TEXTURE_NONE)
+
+class TextLayoutForegroundGroup_KYTTEN_OVERRIDE(pyglet.text.layout.TextLayoutForegroundGroup):
+    '''
+    Glyph textures only hold coverage in their alpha channel.
+    '''
+    def set_state(self):
+        pyglet.text.layout.TextLayoutForegroundGroup.set_state(self)
+        GetRenderer().set_texture_mode(TEXTURE_ALPHA)
+
+    def unset_state(self):
+        # Glyph textures are bound by pyglet's own texture groups.
+        StateCache.invalidate_texture()
+        GetRenderer().set_texture_mode(TEXTURE_NONE)
+        pyglet.text.layout.TextLayoutForegroundGroup.unset_state(self)
+
+class TextLayoutForegroundDecorationGroup_KYTTEN_OVERRIDE(pyglet.text.layout.TextLayoutForegroundDecorationGroup):
+    '''
+    Underlines and carets are drawn untextured.
+    '''
+    def set_state(self):
+        pyglet.text.layout.TextLayoutForegroundDecorationGroup.set_state(self)
+        GetRenderer().set_texture_mode(TEXTURE_NONE)
+
+def _create_layout_groups(top_group):
+    return (top_group,
+            TextLayoutBackgroundGroup_KYTTEN_OVERRIDE(0, top_group),
+            TextLayoutForegroundGroup_KYTTEN_OVERRIDE(1, top_group),
+            TextLayoutForegroundDecorationGroup_KYTTEN_OVERRIDE(2, top_group))
 
 
 def GetKyttenLayoutGroups(group):
     if not group in  KYTTEN_LAYOUT_GROUPS:
-        top_group = TextLayoutGroup_KYTTEN_OVERRIDE(group)
-        background_group = pyglet.graphics.OrderedGroup(0, top_group)
-        foreground_group = pyglet.text.layout.TextLayoutForegroundGroup(1, top_group)
-        foreground_decoration_group = pyglet.text.layout.TextLayoutForegroundDecorationGroup(2, top_group)
-
-        KYTTEN_LAYOUT_GROUPS[group] = (top_group,
-                                       background_group,
-                                       foreground_group,
-                                       foreground_decoration_group)
+        KYTTEN_LAYOUT_GROUPS[group] = _create_layout_groups(TextLayoutGroup_KYTTEN_OVERRIDE(group))
         KYTTEN_LAYOUT_GROUP_REFCOUNTS[group] = 0
     KYTTEN_LAYOUT_GROUP_REFCOUNTS[group] += 1
     return KYTTEN_LAYOUT_GROUPS[group]
@@ -100,10 +227,10 @@ pyglet_IncrementalTextLayout = pyglet.text.layout.IncrementalTextLayout
 class KyttenIncrementalTextLayout(pyglet_IncrementalTextLayout):
     def _init_groups(self, group):
         # Scrollable layout never shares group because of translation.
-        self.top_group = ScrollableTextLayoutGroup_KYTTEN_OVERRIDE(group)
-        self.background_group = pyglet.graphics.OrderedGroup(0, self.top_group)
-        self.foreground_group = pyglet.text.layout.TextLayoutForegroundGroup(1, self.top_group)
-        self.foreground_decoration_group =  pyglet.text.layout.TextLayoutForegroundDecorationGroup(2, self.top_group)
+        (self.top_group,
+         self.background_group,
+         self.foreground_group,
+         self.foreground_decoration_group) = _create_layout_groups(ScrollableTextLayoutGroup_KYTTEN_OVERRIDE(group))
 
     def _update(self):
         if not self._update_enabled:
@@ -175,6 +302,10 @@ class KyttenLabel(pyglet.text.Label):
     text = property(pyglet.text.Label._get_text, _set_text)
 
     def _set_y(self, y):
+        # Moving the label rewrites its vertices, a relayout mostly sets
+        # the same position again.
+        if y == self._y:
+            return
         if self._boxes:
             self._y = y
             self._update()
@@ -187,6 +318,8 @@ class KyttenLabel(pyglet.text.Label):
     y = property(pyglet.text.Label._get_y, _set_y)
 
     def _set_x(self, x):
+        if x == self._x:
+            return
         if self._boxes:
             self._x = x
             self._update()
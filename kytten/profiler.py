@@ -0,0 +1,119 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# kytten/profiler.py
+# Copyrighted (C) 2013 by "Parashurama"
+'''
+Per frame profiling of the gui, enabled with GuiManager.enable_profiling.
+
+Every frame rendered by GuiManager.Render produces a dictionary with:
+    - 'total'     : whole Render call
+    - 'update'    : dialogs update (includes 'layout')
+    - 'layout'    : dialogs layout, full or partial, and repositions after
+                    a window resize; also detailed per dialog in 'layouts'
+                    as a list of (dialog name, seconds)
+    - 'draw'      : batch drawing (into the gui buffer if buffered)
+    - 'composite' : gui buffers rendering on screen
+    - 'vertex_lists_created', 'vertex_lists_deleted' : vertex list counts
+    - 'resorts'   : number of times the batch re-sorted its groups
+Times are in seconds.
+'''
+from __future__ import unicode_literals, print_function, absolute_import, division
+from .compat import *
+import time
+from collections import deque
+
+PHASES = ('total', 'update', 'layout', 'draw', 'composite')
+COUNTERS = ('vertex_lists_created', 'vertex_lists_deleted', 'resorts')
+
+class GuiProfiler(object):
+    '''
+    Collects frame records over a rolling window and passes each finished
+    frame to the registered callbacks.
+    '''
+    def __init__(self, window_size=120, callback=None):
+        '''
+        @param window_size Number of frames kept for get_summary
+        @param callback Optional function called with each frame record
+        '''
+        self.frames = deque(maxlen=window_size)
+        self.callbacks = []
+        self._frame = None
+        self._frame_start = 0.0
+
+        if callback is not None:
+            self.add_callback(callback)
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self.callbacks.remove(callback)
+
+    def begin_frame(self):
+        frame = self._frame = dict.fromkeys(PHASES, 0.0)
+        frame.update(dict.fromkeys(COUNTERS, 0))
+        frame['layouts'] = []
+        self._frame_start = time.time()
+
+    def end_frame(self):
+        frame, self._frame = self._frame, None
+        frame['total'] = time.time() - self._frame_start
+        self.frames.append(frame)
+
+        for callback in self.callbacks:
+            callback(frame)
+
+    def add_time(self, phase, elapsed):
+        if self._frame is not None:
+            self._frame[phase] += elapsed
+
+    def add_layout_time(self, dialog, elapsed):
+        if self._frame is not None:
+            self._frame['layout'] += elapsed
+            self._frame['layouts'].append((dialog.name or repr(dialog), elapsed))
+
+    def count(self, counter, n=1):
+        if self._frame is not None:
+            self._frame[counter] += n
+
+    def timed(self, phase, func):
+        '''
+        Returns func wrapped to add its running time to phase.
+        '''
+        def _timed(*args, **kwargs):
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add_time(phase, time.time() - start)
+        return _timed
+
+    def counted(self, counter, func):
+        '''
+        Returns func wrapped to increment counter on each call.
+        '''
+        def _counted(*args, **kwargs):
+            self.count(counter)
+            return func(*args, **kwargs)
+        return _counted
+
+    @property
+    def last_frame(self):
+        return self.frames[-1] if self.frames else None
+
+    def get_summary(self):
+        '''
+        Returns {name: (mean, max)} for every phase and counter over the
+        frames of the rolling window, and the number of frames under
+        'frames'.
+        '''
+        frames = self.frames
+        summary = {'frames': len(frames)}
+        for key in PHASES + COUNTERS:
+            values = [frame[key] for frame in frames] or [0]
+            summary[key] = (sum(values) / len(values), max(values))
+        return summary
+
+    def reset(self):
+        self.frames.clear()
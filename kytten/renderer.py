@@ -0,0 +1,605 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# kytten/renderer.py
+# Copyrighted (C) 2013 by "Parashurama"
+'''
+Rendering backends used by kytten groups and gui buffers.
+
+Groups never touch transform, clipping or texturing state directly; they
+go through the current renderer instead:
+
+FixedFunctionRenderer -- the default, uses glPushAttrib, glScissor,
+                         glClipPlane and the matrix stacks.
+ShaderRenderer        -- keeps all that state on the python side and
+                         feeds it to a small shader program as uniforms
+                         (projection, translation, scale, clip rect,
+                         tint), avoiding attribute stack round trips.
+                         Vertices still come from pyglet batches as
+                         client-side arrays, read through the GLSL 1.20
+                         built-ins: it needs a compatibility context,
+                         not a core profile one.
+
+The renderer is selected with the 'renderer' argument of SetWindow.
+'''
+from __future__ import unicode_literals, print_function, absolute_import, division
+from .compat import *
+import ctypes as c
+import math
+import pyglet
+import pyglet.gl as gl
+
+TEXTURE_NONE = 0
+TEXTURE_RGBA = 1
+TEXTURE_ALPHA = 2
+
+class GLStateCache(object):
+    '''
+    Shadow copy of the GL state set by kytten groups (blend function,
+    bound texture, texture filtering), used to skip redundant calls.
+    It is reset at the start of every gui frame since other code may
+    change GL state in between, and counts issued and skipped state
+    changes per frame.  Outside of a gui frame (a dialog drawing its own
+    batch), dialog groups reset it before drawing.
+    '''
+    def __init__(self):
+        self.state_changes = 0
+        self.skipped = 0
+        self.last_frame = (0, 0)
+        self.in_frame = False
+        self.reset()
+
+    def reset(self):
+        self._blend = None
+        self._texture = None
+        self._filters = {}
+
+    def begin_frame(self):
+        self.reset()
+        self.state_changes = 0
+        self.skipped = 0
+        self.in_frame = True
+
+    def end_frame(self):
+        self.last_frame = (self.state_changes, self.skipped)
+        self.in_frame = False
+
+    def blend_func_separate(self, src_rgb, dst_rgb, src_alpha, dst_alpha):
+        blend = (src_rgb, dst_rgb, src_alpha, dst_alpha)
+        if self._blend == blend:
+            self.skipped += 1
+            return
+
+        self._blend = blend
+        self.state_changes += 1
+        gl.glBlendFuncSeparate(src_rgb, dst_rgb, src_alpha, dst_alpha)
+
+    def blend_func(self, src, dst):
+        self.blend_func_separate(src, dst, src, dst)
+
+    def bind_texture(self, target, texture_id):
+        texture = (target, texture_id)
+        if self._texture == texture:
+            self.skipped += 1
+            return
+
+        self._texture = texture
+        self.state_changes += 1
+        gl.glBindTexture(target, texture_id)
+
+    def invalidate_texture(self):
+        '''
+        Call after binding a texture without going through the cache.
+        '''
+        self._texture = None
+
+    def texture_filter(self, texture_id, filter):
+        '''
+        Set min and mag filters of the currently bound texture.
+        '''
+        if self._filters.get(texture_id) == filter:
+            self.skipped += 1
+            return
+
+        self._filters[texture_id] = filter
+        self.state_changes += 1
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, filter)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, filter)
+
+StateCache = GLStateCache()
+
+def GetRenderer():
+    return _renderer
+
+def SetRenderer(renderer):
+    global _renderer
+    _renderer = renderer
+
+class FixedFunctionRenderer(object):
+    '''
+    Renderer using the OpenGL fixed-function pipeline.
+    '''
+    name = 'fixed'
+
+    def __init__(self):
+        self._origin = (0, 0)
+        self._pixel_scale = 1.0
+        self._scissor = None
+        self._clip_stack = []
+        self._offset_stack = []
+        self._target_stack = []
+
+    def begin(self, width, height):
+        '''
+        Start drawing the gui on a surface of the given size.
+        '''
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPushMatrix()
+        gl.glLoadIdentity()
+        gl.gluOrtho2D (0, width, 0, height)
+
+        gl.glMatrixMode (gl.GL_MODELVIEW)
+        gl.glPushMatrix()
+        gl.glLoadIdentity()
+
+        self._origin = (0, 0)
+        self._pixel_scale = 1.0
+        self._scissor = None
+
+    def end(self):
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPopMatrix()
+
+        gl.glMatrixMode (gl.GL_MODELVIEW)
+        gl.glPopMatrix()
+
+    def begin_target(self, x, y, width, height, scale=1.0):
+        '''
+        Redirect drawing of the gui area (x, y, width, height) to the
+        lower left (width*scale, height*scale) pixels of the currently
+        bound framebuffer.
+        '''
+        gl.glPushAttrib(gl.GL_VIEWPORT_BIT)
+        gl.glViewport(0, 0, int(round(width*scale)), int(round(height*scale)))
+
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPushMatrix()
+        gl.glLoadIdentity()
+        gl.gluOrtho2D(x, x+width, y, y+height)
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+
+        self._target_stack.append((self._origin, self._pixel_scale, self._scissor))
+        self._origin = (x, y)
+        self._pixel_scale = scale
+        self._scissor = None
+
+    def end_target(self):
+        gl.glMatrixMode(gl.GL_PROJECTION)
+        gl.glPopMatrix()
+        gl.glMatrixMode(gl.GL_MODELVIEW)
+        gl.glPopAttrib()
+
+        self._origin, self._pixel_scale, self._scissor = self._target_stack.pop()
+
+    def push_state(self):
+        '''
+        Save enable and current color state, restored by pop_state.
+        '''
+        gl.glPushAttrib(gl.GL_ENABLE_BIT | gl.GL_CURRENT_BIT)
+
+    def pop_state(self):
+        gl.glPopAttrib()
+
+    def enable_blend(self):
+        '''
+        Enable blending until the enclosing pop_state.
+        '''
+        gl.glEnable(gl.GL_BLEND)
+
+    def clear(self):
+        '''
+        Clear the color buffer within the current clipping region.
+        '''
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+
+    def push_transform(self, tx, ty, scale=1.0):
+        '''
+        Translate, then scale, everything drawn until pop_transform.
+        '''
+        gl.glPushMatrix()
+        gl.glTranslatef(tx, ty, 0)
+        if scale != 1.0:
+            gl.glScalef(scale, scale, 1.0)
+
+    def pop_transform(self):
+        gl.glPopMatrix()
+
+    def push_offset(self, tx, ty):
+        '''
+        Move gui coordinates by (tx, ty) until pop_offset: unlike
+        push_transform, rectangles given to push_clip are moved as well.
+        '''
+        gl.glPushMatrix()
+        gl.glTranslatef(tx, ty, 0)
+
+        self._offset_stack.append(self._origin)
+        ox, oy = self._origin
+        self._origin = (ox - tx, oy - ty)
+
+    def pop_offset(self):
+        gl.glPopMatrix()
+        self._origin = self._offset_stack.pop()
+
+    def push_clip(self, x, y, width, height, local=False):
+        '''
+        Restrict drawing to a rectangle, intersected with the current
+        clipping region.
+
+        @param local If True the rectangle is given in the current
+                     (transformed) coordinates, else in gui coordinates.
+        '''
+        if local:
+            gl.glPushAttrib(gl.GL_ENABLE_BIT | gl.GL_TRANSFORM_BIT)
+            gl.glEnable(gl.GL_CLIP_PLANE0)
+            gl.glEnable(gl.GL_CLIP_PLANE1)
+            gl.glEnable(gl.GL_CLIP_PLANE2)
+            gl.glEnable(gl.GL_CLIP_PLANE3)
+            # Left
+            gl.glClipPlane(gl.GL_CLIP_PLANE0, (gl.GLdouble * 4)(
+                        1, 0, 0, -x))
+            # Top
+            gl.glClipPlane(gl.GL_CLIP_PLANE1, (gl.GLdouble * 4)(
+                        0, -1, 0, y+height))
+            # Right
+            gl.glClipPlane(gl.GL_CLIP_PLANE2, (gl.GLdouble * 4)(
+                        -1, 0, 0, x+width))
+            # Bottom
+            gl.glClipPlane(gl.GL_CLIP_PLANE3, (gl.GLdouble * 4)(
+                        0, 1, 0, -y))
+            self._clip_stack.append((True, None))
+        else:
+            ox, oy = self._origin
+            s = self._pixel_scale
+            x0, y0 = int(math.floor((x-ox)*s)), int(math.floor((y-oy)*s))
+            x1, y1 = int(math.ceil((x+width-ox)*s)), int(math.ceil((y+height-oy)*s))
+
+            if self._scissor is not None:
+                sx0, sy0, sx1, sy1 = self._scissor
+                x0, y0, x1, y1 = max(x0, sx0), max(y0, sy0), min(x1, sx1), min(y1, sy1)
+
+            gl.glPushAttrib(gl.GL_ENABLE_BIT | gl.GL_SCISSOR_BIT)
+            gl.glEnable(gl.GL_SCISSOR_TEST)
+            gl.glScissor(x0, y0, max(x1-x0, 0), max(y1-y0, 0))
+
+            self._clip_stack.append((False, self._scissor))
+            self._scissor = (x0, y0, x1, y1)
+
+    def pop_clip(self):
+        local, scissor = self._clip_stack.pop()
+        if not local:
+            self._scissor = scissor
+        gl.glPopAttrib()
+
+    def set_texture_mode(self, mode):
+        '''
+        Texturing is driven by GL_TEXTURE_2D enable state here.
+        '''
+        pass
+
+    def set_tint(self, r, g, b, a):
+        gl.glColor4f(r, g, b, a)
+
+    def draw_texture(self, texture_id, x, y, width, height, s=1.0, t=1.0):
+        '''
+        Draw a texture region (0, 0, s, t) on the gui rectangle given.
+        '''
+        gl.glBindTexture(gl.GL_TEXTURE_2D, texture_id)
+        gl.glEnable(gl.GL_TEXTURE_2D)
+
+        gl.glColor4f(1.0,1.0,1.0,1.0)
+
+        gl.glBegin(gl.GL_QUADS)
+        gl.glTexCoord2f(0.0, 0.0) ; gl.glVertex3f(x, y, 0)
+        gl.glTexCoord2f(s, 0.0) ; gl.glVertex3f(x+width, y, 0)
+        gl.glTexCoord2f(s, t) ; gl.glVertex3f(x+width , y+height, 0)
+        gl.glTexCoord2f(0.0, t) ; gl.glVertex3f(x, y+height, 0)
+        gl.glEnd()
+
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        gl.glDisable(gl.GL_TEXTURE_2D)
+        StateCache.invalidate_texture()
+
+GUI_VERTEX_SHADER = '''
+#version 120
+uniform mat4 projection;
+uniform vec2 translation;
+uniform float scale;
+varying vec2 gui_position;
+
+void main()
+{
+    gui_position = gl_Vertex.xy * scale + translation;
+    gl_FrontColor = gl_Color;
+    gl_TexCoord[0] = gl_MultiTexCoord0;
+    gl_Position = projection * vec4(gui_position, 0.0, 1.0);
+}
+'''
+
+GUI_FRAGMENT_SHADER = '''
+#version 120
+uniform sampler2D texture;
+uniform int texture_mode;
+uniform vec4 clip_rect;
+uniform vec4 tint;
+varying vec2 gui_position;
+
+void main()
+{
+    if (gui_position.x < clip_rect.x || gui_position.y < clip_rect.y ||
+        gui_position.x >= clip_rect.z || gui_position.y >= clip_rect.w)
+        discard;
+
+    vec4 color = gl_Color * tint;
+    if (texture_mode == 1)
+        color *= texture2D(texture, gl_TexCoord[0].st);
+    else if (texture_mode == 2)
+        color.a *= texture2D(texture, gl_TexCoord[0].st).a;
+
+    gl_FragColor = color;
+}
+'''
+
+NO_CLIP = (-1e9, -1e9, 1e9, 1e9)
+
+class ShaderProgramError(Exception):
+    pass
+
+class ShaderProgram(object):
+    '''
+    Minimal GLSL program wrapper with cached uniform locations.
+    '''
+    def __init__(self, vertex_source, fragment_source):
+        self.id = gl.glCreateProgram()
+        self._locations = {}
+
+        for source, shader_type in ((vertex_source, gl.GL_VERTEX_SHADER),
+                                    (fragment_source, gl.GL_FRAGMENT_SHADER)):
+            gl.glAttachShader(self.id, self._compile(source, shader_type))
+
+        gl.glLinkProgram(self.id)
+
+        status = gl.GLint(0)
+        gl.glGetProgramiv(self.id, gl.GL_LINK_STATUS, c.byref(status))
+        if not status.value:
+            raise ShaderProgramError("Shader program link failed: {0}".format(self._get_log(self.id, gl.glGetProgramiv, gl.glGetProgramInfoLog)))
+
+    @classmethod
+    def _compile(cls, source, shader_type):
+        shader = gl.glCreateShader(shader_type)
+
+        buffer = c.create_string_buffer(source.encode('ascii'))
+        source_ptr = c.cast(c.pointer(c.pointer(buffer)), c.POINTER(c.POINTER(gl.GLchar)))
+        gl.glShaderSource(shader, 1, source_ptr, None)
+        gl.glCompileShader(shader)
+
+        status = gl.GLint(0)
+        gl.glGetShaderiv(shader, gl.GL_COMPILE_STATUS, c.byref(status))
+        if not status.value:
+            raise ShaderProgramError("Shader compilation failed: {0}".format(cls._get_log(shader, gl.glGetShaderiv, gl.glGetShaderInfoLog)))
+
+        return shader
+
+    @staticmethod
+    def _get_log(obj, get_iv, get_log):
+        length = gl.GLint(0)
+        get_iv(obj, gl.GL_INFO_LOG_LENGTH, c.byref(length))
+        log = c.create_string_buffer(max(length.value, 1))
+        get_log(obj, length, None, log)
+        return log.value.decode('ascii', 'replace')
+
+    def get_location(self, name):
+        try:
+            return self._locations[name]
+        except KeyError:
+            location = self._locations[name] = gl.glGetUniformLocation(self.id, name.encode('ascii'))
+            return location
+
+    def use(self):
+        gl.glUseProgram(self.id)
+
+    @staticmethod
+    def stop():
+        gl.glUseProgram(0)
+
+    def delete(self):
+        gl.glDeleteProgram(self.id)
+        self.id = None
+
+class ShaderRenderer(object):
+    '''
+    Renderer keeping transform, clipping, texturing and tint state on the
+    python side and uploading it as uniforms of a single shader program,
+    so no attribute or matrix stack is used while drawing the gui.
+    Requires a compatibility profile context (see the module docstring).
+    '''
+    name = 'shader'
+
+    def __init__(self):
+        self.program = None
+        self._uploaded = {}
+        self._stack = []
+        self._target_stack = []
+        self._target = (0, 0, 1.0)
+        # GL_BLEND enable state, None when unknown (outside begin/end)
+        self._blend = None
+        self._reset()
+
+    def _reset(self):
+        self._translation = (0.0, 0.0)
+        self._offset = (0.0, 0.0)
+        self._scale = 1.0
+        self._clip = NO_CLIP
+        self._texture_mode = TEXTURE_NONE
+        self._tint = (1.0, 1.0, 1.0, 1.0)
+
+    def _upload(self, name, value, setter):
+        if self._uploaded.get(name) != value:
+            self._uploaded[name] = value
+            setter(self.program.get_location(name), *value)
+
+    def _upload_state(self):
+        self._upload('translation', self._translation, gl.glUniform2f)
+        self._upload('scale', (self._scale,), gl.glUniform1f)
+        self._upload('clip_rect', self._clip, gl.glUniform4f)
+        self._upload('texture_mode', (self._texture_mode,), gl.glUniform1i)
+        self._upload('tint', self._tint, gl.glUniform4f)
+
+    def _set_projection(self, left, right, bottom, top):
+        matrix = (gl.GLfloat * 16)(2.0/(right-left), 0, 0, 0,
+                                   0, 2.0/(top-bottom), 0, 0,
+                                   0, 0, -1.0, 0,
+                                   -(right+left)/(right-left), -(top+bottom)/(top-bottom), 0, 1.0)
+        gl.glUniformMatrix4fv(self.program.get_location('projection'), 1, gl.GL_FALSE, matrix)
+        self._projection = (left, right, bottom, top)
+
+    def begin(self, width, height):
+        if self.program is None:
+            self.program = ShaderProgram(GUI_VERTEX_SHADER, GUI_FRAGMENT_SHADER)
+
+        self.program.use()
+        self._uploaded.clear()
+        self._reset()
+        self._target = (0, 0, 1.0)
+        self._blend = bool(gl.glIsEnabled(gl.GL_BLEND))
+
+        gl.glUniform1i(self.program.get_location('texture'), 0)
+        self._set_projection(0, width, 0, height)
+        self._upload_state()
+
+    def end(self):
+        self.program.stop()
+        self._blend = None
+
+    def begin_target(self, x, y, width, height, scale=1.0):
+        viewport = (gl.GLint * 4)()
+        gl.glGetIntegerv(gl.GL_VIEWPORT, viewport)
+
+        self._target_stack.append((tuple(viewport), self._projection, self._clip, self._target))
+        self._target = (x, y, scale)
+        gl.glViewport(0, 0, int(round(width*scale)), int(round(height*scale)))
+        self._set_projection(x, x+width, y, y+height)
+        self._clip = NO_CLIP
+        self._upload_state()
+
+    def end_target(self):
+        viewport, projection, self._clip, self._target = self._target_stack.pop()
+        gl.glViewport(*viewport)
+        self._set_projection(*projection)
+        self._upload_state()
+
+    def _push(self):
+        if self._blend is None:
+            self._blend = bool(gl.glIsEnabled(gl.GL_BLEND))
+        self._stack.append((self._translation, self._offset, self._scale, self._clip, self._texture_mode, self._tint, self._blend))
+
+    def _pop(self):
+        blend = self._blend
+        self._translation, self._offset, self._scale, self._clip, self._texture_mode, self._tint, self._blend = self._stack.pop()
+        if blend and not self._blend:
+            gl.glDisable(gl.GL_BLEND)
+        self._upload_state()
+
+    def push_state(self):
+        self._push()
+
+    pop_state = _pop
+
+    def enable_blend(self):
+        if self._blend is None:
+            self._blend = bool(gl.glIsEnabled(gl.GL_BLEND))
+        if not self._blend:
+            gl.glEnable(gl.GL_BLEND)
+            self._blend = True
+
+    def clear(self):
+        '''
+        The clip rect only lives in the shader: scissor the clear to it.
+        '''
+        if self._clip == NO_CLIP:
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+            return
+
+        tx, ty, scale = self._target
+        cx0, cy0, cx1, cy1 = self._clip
+        x0, y0 = int(math.floor((cx0-tx)*scale)), int(math.floor((cy0-ty)*scale))
+        x1, y1 = int(math.ceil((cx1-tx)*scale)), int(math.ceil((cy1-ty)*scale))
+
+        gl.glEnable(gl.GL_SCISSOR_TEST)
+        gl.glScissor(x0, y0, max(x1-x0, 0), max(y1-y0, 0))
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+        gl.glDisable(gl.GL_SCISSOR_TEST)
+
+    def push_transform(self, tx, ty, scale=1.0):
+        self._push()
+        x, y = self._translation
+        self._translation = (x + tx*self._scale, y + ty*self._scale)
+        self._scale *= scale
+        self._upload_state()
+
+    pop_transform = _pop
+
+    def push_offset(self, tx, ty):
+        self.push_transform(tx, ty)
+        ox, oy = self._offset
+        self._offset = (ox + tx, oy + ty)
+
+    pop_offset = _pop
+
+    def push_clip(self, x, y, width, height, local=False):
+        self._push()
+        x0, y0, x1, y1 = x, y, x+width, y+height
+
+        if local:
+            tx, ty = self._translation
+            s = self._scale
+            x0, y0, x1, y1 = x0*s+tx, y0*s+ty, x1*s+tx, y1*s+ty
+        else:
+            ox, oy = self._offset
+            x0, y0, x1, y1 = x0+ox, y0+oy, x1+ox, y1+oy
+
+        cx0, cy0, cx1, cy1 = self._clip
+        self._clip = (max(x0, cx0), max(y0, cy0), min(x1, cx1), min(y1, cy1))
+        self._upload_state()
+
+    pop_clip = _pop
+
+    def set_texture_mode(self, mode):
+        self._texture_mode = mode
+        self._upload('texture_mode', (mode,), gl.glUniform1i)
+
+    def set_tint(self, r, g, b, a):
+        self._tint = (r, g, b, a)
+        self._upload('tint', self._tint, gl.glUniform4f)
+
+    def draw_texture(self, texture_id, x, y, width, height, s=1.0, t=1.0):
+        self.set_texture_mode(TEXTURE_RGBA)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, texture_id)
+
+        pyglet.graphics.draw(4, gl.GL_TRIANGLE_STRIP,
+            ('v2f', (x, y, x+width, y, x, y+height, x+width, y+height)),
+            ('t2f', (0.0, 0.0, s, 0.0, 0.0, t, s, t)),
+            ('c4B', (255,)*16))
+
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        StateCache.invalidate_texture()
+        self.set_texture_mode(TEXTURE_NONE)
+
+def CreateRenderer(name):
+    if   name == 'fixed':
+        return FixedFunctionRenderer()
+    elif name == 'shader':
+        return ShaderRenderer()
+    else:
+        raise ValueError("Unknown renderer '{0}'. Only 'fixed' and 'shader' are supported.".format(name))
+
+_renderer = FixedFunctionRenderer()
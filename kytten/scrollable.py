@@ -7,9 +7,9 @@
 from __future__ import unicode_literals, print_function, absolute_import, division
 from .compat import *
 import pyglet
-from pyglet import gl
 
-from .base import Virtual, CVars, minvalue, maxvalue
+from .base import Placement, CVars, minvalue, maxvalue
+from .renderer import GetRenderer
 from .dialog import DialogEventManager
 from .frame import Wrapper, GetRelativePoint, ANCHOR_CENTER
 from .scrollbar import HScrollbar, VScrollbar
@@ -34,36 +34,31 @@ class ScrollableGroup(pyglet.graphics.Group):
         pyglet.graphics.Group.__init__(self, parent)
         self.x, self.y, self.width, self.height = x, y, width, height
         self._scale = 1.0
-        self.was_scissor_enabled = False
 
     def set_scale(self, scale):
         self._scale = float(scale)
 
     def set_state(self):
         '''
-        Enables a scissor test on our region
+        Enables a scissor test on our region, within any enclosing one
+        (nested Scrollable or partial repaint of the gui buffer).
         '''
-        gl.glPushAttrib(gl.GL_ENABLE_BIT | gl.GL_TRANSFORM_BIT |
-                        gl.GL_CURRENT_BIT)
-        self.was_scissor_enabled = gl.glIsEnabled(gl.GL_SCISSOR_TEST)
-        gl.glEnable(gl.GL_SCISSOR_TEST)
-        gl.glScissor(int(self.x), int(self.y),
-                     int(self.width), int(self.height))
+        renderer = GetRenderer()
+        renderer.push_clip(int(self.x), int(self.y),
+                           int(self.width), int(self.height))
 
         if self._scale != 1.0:
-            gl.glPushMatrix(gl.GL_MODELVIEW_MATRIX)
-            gl.glScalef(self._scale,self._scale,1.0)
+            renderer.push_transform(0, 0, self._scale)
 
     def unset_state(self):
         '''
         Disables the scissor test
         '''
+        renderer = GetRenderer()
         if self._scale != 1.0:
-            gl.glPopMatrix(gl.GL_MODELVIEW_MATRIX)
+            renderer.pop_transform()
 
-        if not self.was_scissor_enabled:
-            gl.glDisable(gl.GL_SCISSOR_TEST)
-        gl.glPopAttrib()
+        renderer.pop_clip()
 
 class Scrollable(Wrapper, ScrollableAssert):
     '''
@@ -71,6 +66,8 @@ class Scrollable(Wrapper, ScrollableAssert):
     If the layout exceeds the viewable limits then it is truncated and
     scrollbars will be displayed so the user can pan around.
     '''
+    _virtual_content = None
+
     def __init__(self, content=None, width=None, height=None,
                  is_fixed_size=False, always_show_scrollbars=False, name=None, child_anchor=ANCHOR_CENTER):
         '''
@@ -113,28 +110,30 @@ class Scrollable(Wrapper, ScrollableAssert):
         self.highlight_group = None
         self.needs_layout = False
 
-    def _get_controls(self):
+    def _collect_controls(self, controls):
         '''
         We represent ourself as a Control to the Dialog, but we pass through
         the events we receive from Dialog.
         '''
-        base_controls = Wrapper._get_controls(self)
-        controls = []
+        start = len(controls)
+        Wrapper._collect_controls(self, controls)
         our_left = self.content_x
         our_right = our_left + self.ct_view_width
         our_bottom = self.content_y
         our_top = our_bottom + self.ct_view_height
-        for control, left, right, top, bottom in base_controls:
-            controls.append((control,
-                             max(left, our_left),
-                             min(right, our_right),
-                             min(top, our_top),
-                             max(bottom, our_bottom)))
+        # Clip the areas to our view; entries fully inside are kept as is
+        for index in range(start, len(controls)):
+            control, left, right, top, bottom = controls[index]
+            if left < our_left or right > our_right or top > our_top or bottom < our_bottom:
+                controls[index] = (control,
+                                   max(left, our_left),
+                                   min(right, our_right),
+                                   min(top, our_top),
+                                   max(bottom, our_bottom))
         if self.hscrollbar is not None:
-            controls += self.hscrollbar._get_controls()
+            self.hscrollbar._collect_controls(controls)
         if self.vscrollbar is not None:
-            controls += self.vscrollbar._get_controls()
-        return controls
+            self.vscrollbar._collect_controls(controls)
 
     def delete(self):
         '''
@@ -215,7 +214,10 @@ class Scrollable(Wrapper, ScrollableAssert):
         '''
         self.x, self.y = x, y
 
-        virtual_content = Virtual(width=self.ct_view_width, height=self.ct_view_height)
+        virtual_content = self._virtual_content
+        if virtual_content is None:
+            virtual_content = self._virtual_content = Placement()
+        virtual_content.width, virtual_content.height = self.ct_view_width, self.ct_view_height
 
         if self.content is not None:
             cx, cy = GetRelativePoint(  self, self.child_anchor,
@@ -20,6 +20,8 @@ class HScrollbar(Control):
     IMAGE_RIGHT = ['hscrollbar', 'right']
     IMAGE_LEFTMAX = ['hscrollbar', 'leftmax']
     IMAGE_RIGHTMAX = ['hscrollbar', 'rightmax']
+    # Updates are only needed while an arrow is held
+    scheduled_updates = True
 
     def __init__(self, width):
         '''
@@ -214,6 +216,7 @@ class HScrollbar(Control):
                y >= left_y and y < left_y + left_height:
                 self.is_scrolling = True
                 self.scroll_delta = -1
+                self.schedule_update()
             else:
                 right_x, right_y, right_width, right_height = \
                        self._get_right_region()
@@ -221,6 +224,7 @@ class HScrollbar(Control):
                    y >= right_y and y < right_y + right_height:
                     self.is_scrolling = True
                     self.scroll_delta = 1
+                    self.schedule_update()
 
     def on_mouse_release(self, x, y, button, modifiers):
         '''
@@ -234,6 +238,7 @@ class HScrollbar(Control):
         self.is_dragging = False
         self.is_scrolling = False
         self.scroll_delta = 0
+        self.unschedule_update()
 
     def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
         '''
@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+# *-* coding: UTF-8 *-*
+
+# kytten/spatial.py
+# Copyrighted (C) 2013 by "Parashurama"
+'''
+Spatial index of the controls of a dialog, so that finding the control
+under the mouse doesn't need to test every control.
+'''
+from __future__ import unicode_literals, print_function, absolute_import, division
+from .compat import *
+import weakref
+from math import floor
+
+class ControlGrid(object):
+    '''
+    Uniform grid over the areas of a set of controls. Each cell lists the
+    controls overlapping it, so a point query only tests the controls of
+    a single cell. Built once per layout.
+    '''
+    MIN_CELL_SIZE = 16
+    MAX_CELL_SIZE = 256
+    # Controls covering more cells than this are tested on every query
+    MAX_CELLS = 256
+
+    def __init__(self, controls=()):
+        '''
+        @param controls List of (control, left, right, top, bottom) as
+                        returned by _get_controls
+        '''
+        self.entries = []
+        self.cells = {}
+        self.large = []
+        self.cell_size = cell_size = self._get_cell_size(controls)
+
+        cells = self.cells
+        for index, (control, left, right, top, bottom) in enumerate(controls):
+            self.entries.append((weakref.ref(control), left, right, top, bottom))
+            if right <= left or top <= bottom:
+                continue
+
+            x0, x1 = int(floor(left / cell_size)), int(floor(right / cell_size))
+            y0, y1 = int(floor(bottom / cell_size)), int(floor(top / cell_size))
+            if (x1 - x0 + 1) * (y1 - y0 + 1) > self.MAX_CELLS:
+                self.large.append(index)
+                continue
+
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    key = (cx, cy)
+                    if key in cells:
+                        cells[key].append(index)
+                    else:
+                        cells[key] = [index]
+
+    def _get_cell_size(self, controls):
+        '''
+        Cells about the size of an average control.
+        '''
+        if not controls:
+            return self.MIN_CELL_SIZE
+        total = sum(max(right - left, top - bottom) for control, left, right, top, bottom in controls)
+        return min(max(total / len(controls), self.MIN_CELL_SIZE), self.MAX_CELL_SIZE)
+
+    def query(self, x, y):
+        '''
+        Returns the controls whose area contains (x, y), in the order they
+        were given.
+        '''
+        cell_size = self.cell_size
+        indices = self.cells.get((int(floor(x / cell_size)), int(floor(y / cell_size))), ())
+        if self.large:
+            indices = sorted(list(indices) + self.large)
+
+        entries = self.entries
+        result = []
+        for index in indices:
+            ref, left, right, top, bottom = entries[index]
+            if left <= x < right and bottom <= y < top:
+                control = ref()
+                if control is not None:
+                    result.append(control)
+        return result
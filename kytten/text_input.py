@@ -214,8 +214,7 @@ class Input(Control):
         elif self.label  is not None:
             self.label.text = text
 
-        if self.saved_dialog is not None:
-            self.saved_dialog.set_needs_layout()
+        self.invalidate_layout()
 
     def size(self, dialog, scale):
         if dialog is None:
@@ -315,8 +314,7 @@ class MultilineInput(Input):
         if self.caret:
             self.caret.mark = self.caret.position = len(self.document.text)
 
-        if self.saved_dialog is not None:
-            self.saved_dialog.set_needs_layout()
+        self.invalidate_layout()
 
     def on_text(self, text):
         if not self.is_disabled() and self.caret is not None:
@@ -7,11 +7,14 @@
 from __future__ import unicode_literals, print_function, absolute_import, division
 from .compat import *
 import os
+import weakref
 
 import pyglet
 import ctypes as c
 from pyglet import gl
 from .tools import wrapper, yield_single_value, iteritems
+from .renderer import GetRenderer, StateCache, TEXTURE_NONE, TEXTURE_RGBA
+from .atlas import TextureAtlas
 
 try:
     import json
@@ -46,15 +49,18 @@ class ThemeTextureGroup(pyglet.graphics.TextureGroup):
     texels.  This prevents 'blooming' along the edges.
     '''
     def set_state(self):
-        pyglet.graphics.TextureGroup.set_state(self)
-        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER,
-                           gl.GL_NEAREST)
-        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER,
-                           gl.GL_NEAREST)
+        gl.glEnable(self.texture.target)
+        StateCache.bind_texture(self.texture.target, self.texture.id)
+        StateCache.texture_filter(self.texture.id, gl.GL_NEAREST)
 
         # To Allow Normal Rendering when Buffering with FrameBufferObject
         # Without this option : problem with alpha blending when rendering buffered GUI textures
-        gl.glBlendFuncSeparate(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA, gl.GL_ONE, gl.GL_ONE_MINUS_SRC_ALPHA)
+        StateCache.blend_func_separate(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA, gl.GL_ONE, gl.GL_ONE_MINUS_SRC_ALPHA)
+        GetRenderer().set_texture_mode(TEXTURE_RGBA)
+
+    def unset_state(self):
+        GetRenderer().set_texture_mode(TEXTURE_NONE)
+        pyglet.graphics.TextureGroup.unset_state(self)
 
 
 class CustomGraphicTextureGroup(pyglet.graphics.TextureGroup):
@@ -64,11 +70,17 @@ class CustomGraphicTextureGroup(pyglet.graphics.TextureGroup):
     '''
 
     def set_state(self):
-        pyglet.graphics.TextureGroup.set_state(self)
-        gl.glBlendFuncSeparate(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA, gl.GL_ONE, gl.GL_ONE_MINUS_SRC_ALPHA)
+        gl.glEnable(self.texture.target)
+        StateCache.bind_texture(self.texture.target, self.texture.id)
+        StateCache.blend_func_separate(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA, gl.GL_ONE, gl.GL_ONE_MINUS_SRC_ALPHA)
         # To Allow Normal Rendering when Buffering with FrameBufferObject
         # Without this option : problem with alpha blending when rendering buffered GUI textures
         #Also in context.glContext
+        GetRenderer().set_texture_mode(TEXTURE_RGBA)
+
+    def unset_state(self):
+        GetRenderer().set_texture_mode(TEXTURE_NONE)
+        pyglet.graphics.TextureGroup.unset_state(self)
 
 class UntexturedGroup(pyglet.graphics.Group):
     '''
@@ -78,11 +90,47 @@ class UntexturedGroup(pyglet.graphics.Group):
 
     def set_state(self):
         pyglet.graphics.Group.set_state(self)
-        gl.glBlendFuncSeparate(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA, gl.GL_ONE, gl.GL_ONE_MINUS_SRC_ALPHA)
+        StateCache.blend_func_separate(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA, gl.GL_ONE, gl.GL_ONE_MINUS_SRC_ALPHA)
+        GetRenderer().set_texture_mode(TEXTURE_NONE)
         # To Allow Normal Rendering when Buffering with FrameBufferObject
         # Without this option : problem with alpha blending when rendering buffered GUI textures
         #Also in context.glContext
 
+    def __eq__(self, other):
+        return (self.__class__ is other.__class__ and
+                self.parent == other.parent)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self.__class__, self.parent))
+
+# Canonical instances of the groups above, keyed on what makes them
+# equivalent (group class, texture, parent). Elements sharing a texture
+# under the same parent share a single group, so the batch sorts them
+# together and sets their state once.
+_CANONICAL_GROUPS = weakref.WeakValueDictionary()
+
+def GetTextureGroup(group_class, texture, parent=None):
+    '''
+    Return the canonical group_class(texture, parent) instance.
+    '''
+    key = (group_class, texture.id, texture.target, parent)
+    group = _CANONICAL_GROUPS.get(key)
+    if group is None:
+        group = _CANONICAL_GROUPS[key] = group_class(texture, parent)
+    return group
+
+def GetUntexturedGroup(parent=None):
+    '''
+    Return the canonical UntexturedGroup(parent) instance.
+    '''
+    key = (UntexturedGroup, parent)
+    group = _CANONICAL_GROUPS.get(key)
+    if group is None:
+        group = _CANONICAL_GROUPS[key] = UntexturedGroup(parent)
+    return group
 
 
 class UndefinedGraphicElementTemplate:
@@ -213,15 +261,95 @@ class FrameRepeatTextureGraphicElementTemplate(TextureGraphicElementTemplate):
         f.write('\n' + ' ' * indent + '}')
 
 
-class TextureIconElement:
+class VertexWriteQueue(object):
+    '''
+    Vertex writes of graphic elements.  Writes of unchanged vertices are
+    skipped, and writes are postponed while the queue is held (with
+    VertexWrites: ...), e.g. during a dialog layout: the layout only
+    computes positions, then the vertices of the elements which actually
+    moved are written once each, when the queue is released.
+    '''
+    def __init__(self):
+        self.depth = 0
+        self.pending = []
+        self.written = 0
+        self.skipped = 0
+
+    def __enter__(self):
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        if not self.depth:
+            self.flush()
+
+    def write(self, element):
+        '''
+        Write the vertices of element, now or when the queue is released.
+        '''
+        if self.depth:
+            # Elements are queued once, however often they are updated
+            if not element._write_pending:
+                element._write_pending = True
+                self.pending.append(element)
+        else:
+            self._write(element)
+
+    def _write(self, element):
+        if element._write_vertices():
+            self.written += 1
+        else:
+            self.skipped += 1
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        for element in pending:
+            element._write_pending = False
+            self._write(element)
+
+    def reset_counts(self):
+        self.written = self.skipped = 0
+
+VertexWrites = VertexWriteQueue()
+
+class VertexListElement(object):
+    '''
+    Writes the vertices of a graphic element to its vertex list for the
+    VertexWrites queue, unless they are unchanged since the last write.
+    Elements name their vertex list attribute with vertex_list_name.
+    '''
+    _vertices = None
+    _write_pending = False
+    vertex_list_name = 'vertex_list'
+
+    def _write_vertex_list(self, vertex_list_name, vertices_name, get_vertices):
+        vertex_list = getattr(self, vertex_list_name)
+        if vertex_list is None:
+            return False
+
+        vertices = get_vertices()
+        if vertices == getattr(self, vertices_name):
+            return False
+
+        vertex_list.vertices = vertices
+        setattr(self, vertices_name, vertices)
+        return True
+
+    def _write_vertices(self):
+        return self._write_vertex_list(self.vertex_list_name, '_vertices', self._get_vertices)
+
+class TextureIconElement(VertexListElement):
+    _ivertices = None
+
     def __init__(self, theme, texture, icon, color, batch, group, igroup,
                  no_label):
         self.x = self.y = 0
         self.no_label = no_label
         self.width, self.height = texture.width, texture.height
         self.iwidth, self.iheight = icon.width, icon.height
-        self.group = ThemeTextureGroup(texture, group)
-        self.igroup = ThemeTextureGroup(icon, igroup)
+        self.group = GetTextureGroup(ThemeTextureGroup, texture, group)
+        self.igroup = GetTextureGroup(ThemeTextureGroup, icon, igroup)
         self.vertex_list = batch.add(4, gl.GL_QUADS, self.group,
                                      ('v2i', self._get_vertices()),
                                      ('c4B', color * 4),
@@ -263,19 +391,22 @@ class TextureIconElement:
 
     def update(self, x, y, width, height):
         self.x, self.y, self.width, self.height = x, y, width, height
-        if self.vertex_list is not None:
-            self.vertex_list.vertices = self._get_vertices()
-        if self.ivertex_list is not None:
-            self.ivertex_list.vertices = self._get_ivertices()
+        if self.vertex_list is not None or self.ivertex_list is not None:
+            VertexWrites.write(self)
+
+    def _write_vertices(self):
+        # Both lists are written, no short-circuit
+        return (self._write_vertex_list('vertex_list', '_vertices', self._get_vertices) |
+                self._write_vertex_list('ivertex_list', '_ivertices', self._get_ivertices))
 
-class TextureSkewedElement:
+class TextureSkewedElement(VertexListElement):
     def __init__(self, theme, texture, color, batch, group, skewed, skew=0):
         self.x = self.y = 0
         self.skewed = skewed
         self.skew = skew
         self.tilt = .5
         self.width, self.height = texture.width, texture.height
-        self.group = ThemeTextureGroup(texture, group)
+        self.group = GetTextureGroup(ThemeTextureGroup, texture, group)
         self.vertex_list = batch.add(4, gl.GL_QUADS, self.group,
                                      ('v2i', self._get_vertices()),
                                      ('c4B', color * 4),
@@ -311,13 +442,13 @@ class TextureSkewedElement:
         self.x, self.y, self.width, self.height = x, y, width, height
         self.skew, self.tilt = skew, tilt
         if self.vertex_list is not None:
-            self.vertex_list.vertices = self._get_vertices()
+            VertexWrites.write(self)
 
-class TextureGraphicElement:
+class TextureGraphicElement(VertexListElement):
     def __init__(self, theme, texture, color, batch, group):
         self.x = self.y = 0
         self.width, self.height = texture.width, texture.height
-        self.group = ThemeTextureGroup(texture, group)
+        self.group = GetTextureGroup(ThemeTextureGroup, texture, group)
         self.vertex_list = batch.add(4, gl.GL_QUADS, self.group,
                                      ('v2i', self._get_vertices()),
                                      ('c4B', color * 4),
@@ -345,14 +476,14 @@ class TextureGraphicElement:
     def update(self, x, y, width, height):
         self.x, self.y, self.width, self.height = x, y, width, height
         if self.vertex_list is not None:
-            self.vertex_list.vertices = self._get_vertices()
+            VertexWrites.write(self)
 
-class FrameTextureGraphicElement:
+class FrameTextureGraphicElement(VertexListElement):
     def __init__(self, theme, texture, inner_texture, margins, padding,
                  color, fixed_minsize, batch, group):
         self.x = self.y = 0
         self.width, self.height = texture.width, texture.height
-        self.group = ThemeTextureGroup(texture, group)
+        self.group = GetTextureGroup(ThemeTextureGroup, texture, group)
         self.outer_texture = texture
         self.inner_texture = inner_texture
         self.margins = margins
@@ -418,11 +549,12 @@ class FrameTextureGraphicElement:
     def update(self, x, y, width, height):
         self.x, self.y, self.width, self.height = x, y, width, height
         if self.vertex_list is not None:
-            self.vertex_list.vertices = self._get_vertices()
+            VertexWrites.write(self)
 
 
 
-class Stretch_NinePatchTextureGraphicElement(object):
+class Stretch_NinePatchTextureGraphicElement(VertexListElement):
+    vertex_list_name = '_vertex_list'
 
     def __init__(self, texture, color=None, size=(0,0), position=(0,0), batch=None, group=None):
 
@@ -433,7 +565,7 @@ class Stretch_NinePatchTextureGraphicElement(object):
         self._batch = batch
         self._texture = texture
         self._texture.target=gl.GL_TEXTURE_2D
-        self._group = CustomGraphicTextureGroup(self._texture, parent=group)
+        self._group = GetTextureGroup(CustomGraphicTextureGroup, self._texture, group)
 
         #self.padding = texture.border_padding
         self._header_bar = texture.header_bar
@@ -515,9 +647,10 @@ class Stretch_NinePatchTextureGraphicElement(object):
         self.width, self.height = self.size = (width, height)
 
         if self._vertex_list is not None:
-            self._vertex_list.vertices = self._get_vertices()
+            VertexWrites.write(self)
 
-class Repeat_NinePatchTextureGraphicElement(object):
+class Repeat_NinePatchTextureGraphicElement(VertexListElement):
+    vertex_list_name = '_vertex_list'
 
     def __init__(self, texture, color=None, size=(0,0), position=(0,0), batch=None, group=None):
 
@@ -530,7 +663,7 @@ class Repeat_NinePatchTextureGraphicElement(object):
         self._texture = texture
         self._texture.target=gl.GL_TEXTURE_2D
         self._vertex_list = None
-        self._group = CustomGraphicTextureGroup(self._texture, parent=group)
+        self._group = GetTextureGroup(CustomGraphicTextureGroup, self._texture, group)
         self._header_bar = texture.header_bar
 
         #self.padding = texture.padding
@@ -569,7 +702,7 @@ class Repeat_NinePatchTextureGraphicElement(object):
         height= self.height if height is None else height
 
         if self._vertex_list is not None and (self.width == width) and (self.height == height):
-            self._vertex_list.vertices = self._get_vertices()
+            VertexWrites.write(self)
 
         else:
             if self._vertex_list is not None:
@@ -584,12 +717,13 @@ class Repeat_NinePatchTextureGraphicElement(object):
                                                 ('c4B', self._color*n_vertexes ),
                                                 ('t2f', self._get_texcoords())
                                                 )
+            self._vertices = vertices
 
-class UntexturedGraphicElement(object):
+class UntexturedGraphicElement(VertexListElement):
     def __init__(self, color, batch, group):
         self.x = self.y = 0
         self.width, self.height = 0, 0
-        self.group = UntexturedGroup(group)
+        self.group = GetUntexturedGroup(group)
         self.vertex_list = batch.add(4, gl.GL_QUADS, self.group,
                                      ('v2i', self._get_vertices()),
                                      ('c4B', color * 4))
@@ -616,10 +750,11 @@ class UntexturedGraphicElement(object):
     def update(self, x, y, width, height):
         self.x, self.y, self.width, self.height = x, y, width, height
         if self.vertex_list is not None:
-            self.vertex_list.vertices = self._get_vertices()
+            VertexWrites.write(self)
 
 
-class DefaultTextureGraphicElement(object):
+class DefaultTextureGraphicElement(VertexListElement):
+    vertex_list_name = '_vertex_list'
 
     def __init__(self, texture, color=None, size=(0,0), position=(0,0), batch=None, group=None):
         self._x, self._y = self.position = position
@@ -627,7 +762,7 @@ class DefaultTextureGraphicElement(object):
 
         self._texture = texture
         self._texture.target=gl.GL_TEXTURE_2D
-        self._group = CustomGraphicTextureGroup(self._texture, parent=group)
+        self._group = GetTextureGroup(CustomGraphicTextureGroup, self._texture, group)
 
         self._color = get_color_value(color)
 
@@ -666,7 +801,149 @@ class DefaultTextureGraphicElement(object):
     def update(self, x, y, width=None, height=None):
         self._x, self._y, self.width, self.height = x, y, width or self.width, height or self.height
         if self._vertex_list is not None:
-            self._vertex_list.vertices = self._get_vertices()
+            VertexWrites.write(self)
+
+class SharedQuadList(object):
+    '''
+    Draws many textured quads sharing the same texture from a single vertex
+    list. Quads are handed out as SharedQuadGraphicElement, which behave
+    like DefaultTextureGraphicElement but only record their changes; flush()
+    then writes all of them to the vertex list at once.
+    '''
+    _write_pending = False
+
+    def __init__(self, texture, batch, group):
+        self._batch = batch
+        self._group = GetTextureGroup(CustomGraphicTextureGroup, texture, group)
+        self._vertex_list = None
+        self._elements = []
+        self._dirty_vertices = False
+        self._dirty_content = False
+
+    def add(self, texture, color=None, size=(0,0), position=(0,0)):
+        '''
+        Returns a new quad drawn with texture, which must share the texture
+        id of the list.
+        '''
+        element = SharedQuadGraphicElement(self, texture, color, size, position)
+        self._elements.append(element)
+        self._dirty_content = True
+        return element
+
+    def remove(self, element):
+        self._elements.remove(element)
+        self._dirty_content = True
+
+    def invalidate_vertices(self):
+        '''
+        Called when a quad moved.  During a layout the list is flushed when
+        the vertex writes are released, so quads re-laid out without their
+        layout (partial layouts) are written too; otherwise the owning
+        layout flushes it.
+        '''
+        self._dirty_vertices = True
+        if VertexWrites.depth:
+            VertexWrites.write(self)
+
+    def _write_vertices(self):
+        dirty = self._dirty_vertices or self._dirty_content
+        self.flush()
+        return dirty
+
+    def flush(self):
+        '''
+        Write pending changes to the vertex list, (re)allocating it only
+        when the number of quads changed.
+        '''
+        if not (self._dirty_vertices or self._dirty_content):
+            return
+
+        count = 4 * len(self._elements)
+        if not count:
+            if self._vertex_list is not None:
+                self._vertex_list.delete()
+                self._vertex_list = None
+            self._dirty_vertices = self._dirty_content = False
+            return
+
+        vertices = []
+        for element in self._elements:
+            vertices.extend(element._get_vertices())
+
+        if self._vertex_list is None:
+            self._vertex_list = self._batch.add(count, gl.GL_QUADS, self._group,
+                                                ('v2i/dynamic', vertices),
+                                                ('c4B', self._get_colors()),
+                                                ('t2f', self._get_texcoords()))
+        else:
+            if self._vertex_list.get_size() != count:
+                self._vertex_list.resize(count)
+            self._vertex_list.vertices = vertices
+            if self._dirty_content:
+                self._vertex_list.colors = self._get_colors()
+                self._vertex_list.tex_coords = self._get_texcoords()
+
+        self._dirty_vertices = self._dirty_content = False
+
+    def _get_colors(self):
+        colors = []
+        for element in self._elements:
+            colors.extend(element._color * 4)
+        return colors
+
+    def _get_texcoords(self):
+        texcoords = []
+        for element in self._elements:
+            s0,t0,s1,t1 = element._texture.texcoords
+            texcoords.extend((s0,t0,s1,t0,s1,t1,s0,t1))
+        return texcoords
+
+    def delete(self):
+        if self._vertex_list is not None:
+            self._vertex_list.delete()
+            self._vertex_list = None
+        for element in self._elements:
+            element._owner = None
+        self._elements = []
+        self._group = None
+
+class SharedQuadGraphicElement(object):
+    '''
+    A single quad of a SharedQuadList.
+    '''
+    __slots__ = ('_owner', '_texture', '_color', '_x', '_y', 'position', 'width', 'height', 'size')
+
+    def __init__(self, owner, texture, color=None, size=(0,0), position=(0,0)):
+        self._owner = owner
+        self._texture = texture
+        self._color = get_color_value(color)
+        self._x, self._y = self.position = position
+        self.width, self.height = self.size = size
+
+    def _get_vertices(self):
+        x1, y1 = int(self._x), int(self._y)
+        x2, y2 = x1 + int(self.width), y1 + int(self.height)
+        return (x1, y1, x2, y1, x2, y2, x1, y2)
+
+    def delete(self):
+        if self._owner is not None:
+            self._owner.remove(self)
+            self._owner = None
+        self._texture = None
+
+    def get_content_region(self):
+        return (self._x, self._y, self.width, self.height)
+
+    def get_content_size(self, width, height):
+        return width, height
+
+    def get_needed_size(self, content_width, content_height):
+        return content_width, content_height
+
+    def update(self, x, y, width=None, height=None):
+        self._x, self._y, self.width, self.height = x, y, width or self.width, height or self.height
+        if self._owner is not None:
+            self._owner.invalidate_vertices()
 
 
 
@@ -798,7 +1075,7 @@ class Theme(ScopedDict):
     both simple textures and 9-patch textures, and more complex elements.
     '''
     def __init__(self, arg, override={}, default=DEFAULT_THEME_SETTINGS,
-                 allow_empty_theme=False, name='theme.json'):
+                 allow_empty_theme=False, name='theme.json', use_atlas=True):
         '''
         Creates a new Theme.
 
@@ -811,6 +1088,8 @@ class Theme(ScopedDict):
         @param override Replace some dictionary entries with these
         @param default Initial dictionary entries before handling input
         @param allow_empty_theme True if we should allow creating a new theme
+        @param use_atlas True if theme images should be packed together in
+                         a few atlas textures instead of one texture each
         '''
         ScopedDict.__init__(self, default, None)
 
@@ -818,6 +1097,7 @@ class Theme(ScopedDict):
 
         if isinstance(arg, Theme):
             self.textures = arg.textures
+            self.atlas = arg.atlas
             for k, v in iteritems(arg):
                 self.__setitem__(k, v)
             self.update(override)
@@ -838,6 +1118,7 @@ class Theme(ScopedDict):
             raise IOError("Invalid path. Theme folder '{}' couldn't be found!".format(os.path.abspath(arg)))
 
         self.textures = {}
+        self.atlas = TextureAtlas() if use_atlas else None
         self._update_with_images(self, input)
         self.update(override)
 
@@ -858,11 +1139,32 @@ class Theme(ScopedDict):
         @param filename The filename of the texture
         '''
         if filename not in self.textures:
-            texture = self.loader.texture(filename)
+            if self.atlas is not None:
+                texture = self._get_atlas_texture(filename)
+            else:
+                texture = self.loader.texture(filename)
             texture.src = filename
             self.textures[filename] = texture
         return self.textures[filename]
 
+    def _get_atlas_texture(self, filename):
+        '''
+        Loads an image and packs it in the theme atlas. Images too large
+        for an atlas page get their own texture.
+
+        @param filename The filename of the texture
+        '''
+        image_file = self.loader.file(filename)
+        try:
+            image = pyglet.image.load(filename, file=image_file)
+        finally:
+            image_file.close()
+
+        texture = self.atlas.add(image)
+        if texture is None:
+            texture = image.get_texture()
+        return texture
+
     def _get_texture_region(self, filename, x, y, width, height):
         '''
         Returns a texture region.
@@ -27,6 +27,74 @@ from .theme import DefaultTextureGraphicElement
 
 BOOLEANS = set([True, False])
 
+def CreateImageGraphic(image, dialog, parent, position=(0,0)):
+    '''
+    Create the graphic element of an Image (or ProxyImage of an Image).
+    Layouts drawing their images from shared vertex lists (they define
+    _get_shared_quads) get a quad in those, otherwise the image gets its
+    own DefaultTextureGraphicElement.
+    '''
+    get_shared_quads = getattr(parent, '_get_shared_quads', None)
+    if get_shared_quads is not None:
+        return get_shared_quads(image.texture, dialog).add(texture=image.texture, color=image.color, size=(image.width, image.height), position=position)
+
+    return DefaultTextureGraphicElement(texture=image.texture, color=image.color, size=(image.width, image.height), position=position,  batch=dialog.batch,  group=dialog.bg_group)
+
+def SizeWidget(widget, dialog, scale):
+    '''
+    Size a child widget of a layout.  During an incremental layout (see
+    Dialog.do_partial_layout), a widget which was not invalidated and
+    can't be expanded keeps its last measured size instead of sizing its
+    whole subtree again.
+    '''
+    if FLAGS['incremental_layout']:
+        if not widget.layout_dirty and widget.measured_size is not None and not widget.is_expandable():
+            widget.width, widget.height = widget.measured_size
+            return
+        widget.layout_dirty = True
+
+    widget.size(dialog, scale)
+
+    # Keep the recorded tuples while they hold, a steady relayout then
+    # allocates nothing per widget.
+    measured = widget.measured_size
+    if measured is None or measured[0] != widget.width or measured[1] != widget.height:
+        widget.measured_size = (widget.width, widget.height)
+    context = widget.size_context
+    if context is None or context[0] is not dialog or context[1] != scale:
+        widget.size_context = (dialog, scale)
+
+def ControlEntry(control, left, right, top, bottom):
+    '''
+    The (control, left, right, top, bottom) entry of a control for its
+    dialog.  The previous entry is returned while the area is unchanged,
+    so a steady relayout allocates no entry.
+    '''
+    entry = control._control_entry
+    if entry is None or entry[1] != left or entry[2] != right or entry[3] != top or entry[4] != bottom:
+        entry = control._control_entry = (control, left, right, top, bottom)
+    return entry
+
+def LayoutWidget(widget, x, y):
+    '''
+    Lay out a child widget of a layout.  During an incremental layout, a
+    widget which was not sized again and keeps its place is skipped.
+    '''
+    width, height = widget.width, widget.height
+    rect = widget.layout_rect
+    moved = rect is None or rect[0] != x or rect[1] != y or rect[2] != width or rect[3] != height
+    if FLAGS['incremental_layout'] and not widget.layout_dirty and not moved:
+        return
+
+    geometry = FLAGS['layout_geometry']
+    if geometry is not None:
+        geometry.append((widget, x, y, width, height))
+
+    widget.layout(x, y)
+    if moved:
+        widget.layout_rect = (x, y, width, height)
+    widget.layout_dirty = False
+
 class Widget(object):
     '''
     The base of all Kytten GUI elements.  Widgets correspond to areas on the
@@ -49,6 +117,11 @@ class Widget(object):
     _scale=1.0
     name=None
     x=y=0
+    # Incremental layout state, see SizeWidget and LayoutWidget
+    layout_dirty=False
+    measured_size=None
+    layout_rect=None
+    size_context=None
     def __init__(self, width=0, height=0, name=None, group=None, spacer=False):
         '''
         Creates a new Widget.
@@ -80,7 +153,16 @@ class Widget(object):
         Return this widget if it is a Control, or any children which
         are Controls.
         '''
-        return []
+        controls = []
+        self._collect_controls(controls)
+        return controls
+
+    def _collect_controls(self, controls):
+        '''
+        Append the entries of _get_controls to controls.  Layouts pass the
+        same list to their children instead of joining a list per child.
+        '''
+        pass
 
     def __or__(self, other):
         '''
@@ -114,6 +196,16 @@ class Widget(object):
         if self.saved_dialog is not None:
             self.saved_dialog.set_needs_layout()
 
+    def invalidate_layout(self):
+        '''
+        Request a new size and layout of this widget only.  Its parents are
+        sized again only while its size change affects them, and only the
+        widgets whose place or size changed are laid out again.
+        '''
+        if self.saved_dialog is not None:
+            self.layout_dirty = True
+            self.saved_dialog.set_needs_layout(self)
+
     def ensure_visible(self):
         '''
         Ensure that the widget is visible in scrollable parent.
@@ -154,6 +246,13 @@ class Widget(object):
         '''
         return False
 
+    def _has_child(self, item):
+        '''
+        True if item is a shown child of this widget, False if not, None if
+        the widget doesn't know (used by incremental layouts).
+        '''
+        return None
+
     def is_input(self):
         '''
         Returns true if the widget accepts an input and can return a value
@@ -199,6 +298,7 @@ class Widget(object):
         '''
         self.delete()
         self.saved_dialog = None
+        self.size_context = None
         self._parent=None
 
         if self.destroyed is False:
@@ -287,6 +387,14 @@ class Control(Widget, KyttenEventDispatcher):
     hover_flag=False
     hover_disabled=False
     tooltip=None
+    # True for controls which request on_update events themselves with
+    # schedule_update, only while they need them.
+    scheduled_updates=False
+    # Explicit position in the dialog TAB order; controls without one come
+    # after, ordered top to bottom and left to right.
+    tab_index=None
+    # Last (control, left, right, top, bottom) entry, see ControlEntry
+    _control_entry=None
     def __init__(self, name=None, on_gain_hover=None, on_lose_hover=None, value=None, width=0, height=0, disabled=False, noId=False, group=None):
         '''
         Creates a new Control.
@@ -314,12 +422,12 @@ class Control(Widget, KyttenEventDispatcher):
         if on_lose_hover is not None:
             self.on_lose_hover_func=self._wrap_method(on_lose_hover)
 
-    def _get_controls(self):
-        '''
-        Creates a new Control.
-        '''
-        return [(self, self.x*self._scale, self.x*self._scale + self.width*self._scale,    # control, left, right,
-                       self.y*self._scale + self.height*self._scale, self.y*self._scale)]  # top, bottom
+    def _collect_controls(self, controls):
+        scale = self._scale
+        left, bottom = self.x*scale, self.y*scale
+        controls.append(ControlEntry(self, left, left + self.width*scale,       # control, left, right,
+                                           bottom + self.height*scale, bottom)) # top, bottom
+
     def disable(self):
         '''
         Disable Control.
@@ -381,10 +489,54 @@ class Control(Widget, KyttenEventDispatcher):
     def on_mouse_double_click(self, x, y, button, modifiers):
         pass
 
+    def set_tab_index(self, tab_index):
+        '''
+        Set our position in the dialog TAB order, or None for the layout
+        order.
+        '''
+        self.tab_index = tab_index
+        if self.saved_dialog is not None:
+            # The focus chain is only rebuilt when the controls change
+            self.saved_dialog.invalidate_controls()
+            self.saved_dialog.set_needs_layout()
+
+    def schedule_update(self):
+        '''
+        Receive on_update events from our dialog until unschedule_update
+        is called.
+        '''
+        if self.saved_dialog is not None:
+            self.saved_dialog.add_update_subscriber(self)
+
+    def unschedule_update(self):
+        '''
+        Stop receiving on_update events from our dialog.
+        '''
+        if self.saved_dialog is not None:
+            self.saved_dialog.remove_update_subscriber(self)
+
+    def set_handler(self, name, handler):
+        KyttenEventDispatcher.set_handler(self, name, handler)
+        # Dialogs only look for on_update handlers when their controls change
+        if name == 'on_update' and not self.scheduled_updates:
+            self.schedule_update()
+
+    def wants_all_updates(self):
+        '''
+        True for controls handling on_update without scheduling their
+        updates: they receive every update of their dialog.
+        '''
+        if self.scheduled_updates:
+            return False
+        if hasattr(self, 'on_update'):
+            return True
+        return bool(self._event_stack) and any('on_update' in frame for frame in self._event_stack)
+
     def teardown(self):
         Widget.teardown(self)
         self.on_gain_hover_func = None
         self.on_lose_hover_func = None
+        self._control_entry = None
 
 # Controls can potentially accept most of the events defined for the window,
 # but in practice we'll only pass selected events from Dialog.  This avoids
@@ -583,7 +735,7 @@ class Image(Widget):
         Widget.size(self, dialog, scale)
         if self.graphic is None:
 
-            self.graphic =  DefaultTextureGraphicElement( texture=self.texture, color=self.color, size=(self.width, self.height), position=(self.x,self.y),  batch=dialog.batch,  group=dialog.bg_group)
+            self.graphic = CreateImageGraphic(self, dialog, self._parent, position=(self.x,self.y))
 
             self.min_width = self.graphic.width
             self.min_height = self.graphic.height
@@ -591,7 +743,8 @@ class Image(Widget):
         self.width, self.height = self.min_width, self.min_height
 
 class ProxyImage(object):
-    __slots__=('x','y', 'width', 'height', 'bitmap', 'visible', '_image', '_parent')
+    __slots__=('x','y', 'width', 'height', 'bitmap', 'visible', '_image', '_parent',
+               'layout_dirty', 'measured_size', 'layout_rect', 'size_context')
 
     def __init__(self, image):
         assert isinstance(image, Image), "Not Image Instance"
@@ -601,6 +754,10 @@ class ProxyImage(object):
         self.width=0
         self.height=0
         self.bitmap=None
+        self.layout_dirty=False
+        self.measured_size=None
+        self.layout_rect=None
+        self.size_context=None
 
     def delete(self):
         if self.bitmap is not None:
@@ -617,8 +774,7 @@ class ProxyImage(object):
         if dialog is None:
             return
         if self.bitmap is None:
-            image = self._image
-            self.bitmap = DefaultTextureGraphicElement(texture=image.texture, color=image.color, size=(image.width, image.height), position=(0,0),  batch=dialog.batch,  group=dialog.bg_group)
+            self.bitmap = CreateImageGraphic(self._image, dialog, getattr(self, '_parent', None))
         self.width = self.bitmap.width
         self.height = self.bitmap.height
 
@@ -636,16 +792,21 @@ class ProxyImage(object):
     def _get_controls(self):
         return []
 
+    def _collect_controls(self, controls):
+        pass
+
     def teardown(self):
         self.delete()
         self._parent=None
         self._image=None
+        self.size_context=None
 
 class Label(Widget):
     '''
     A wrapper around a simple text label.
     '''
     label=None
+    _font=None
     def __init__(self, text="", name=None, style=None, bold=None, italic=None,
                  font_name=None, font_size=None, color=None, multiline=False, width=None, autoclampwidth=False, path=[], group=None):
         Widget.__init__(self, name=name, group=group)
@@ -670,9 +831,8 @@ class Label(Widget):
 
     def layout(self, x, y):
         Widget.layout(self, x, y)
-        font = self.label.document.get_font()
         self.label.x = int(x)
-        self.label.y = int(y + self.height - font.ascent)
+        self.label.y = int(y + self.height - self._font.ascent)
 
 
     def set_text(self, text):
@@ -680,7 +840,11 @@ class Label(Widget):
         Set Label text
         '''
         self.text = tostring(text)
-        self._force_refresh()
+        if self.label is not None and not self.autoclampwidth:
+            self.label.text = self.text
+        else:
+            self.delete()
+        self.invalidate_layout()
 
     def set_text_style(self, style):
         '''
@@ -725,8 +889,10 @@ class Label(Widget):
                 batch = dialog.batch, group=dialog.fg_group,
                 multiline = self.is_multiline,
                 width = self.label_width)
+            # A style change deletes the label, the font holds until then
+            self._font = self.label.document.get_font()
 
-        font = self.label.document.get_font()
+        font = self._font
         self.width = self.label.content_width
 
         if not self.is_multiline: